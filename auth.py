@@ -2,6 +2,8 @@ import streamlit as st
 import re
 import time
 
+from config import ADMIN_USERNAMES
+
 # Importok megfelelő hibakezeléssel
 try:
     from database import create_user, authenticate_user
@@ -169,6 +171,16 @@ def require_login():
         return False
     return True
 
+def require_admin():
+    """Bejelentkezés + adminisztrátori jog ellenőrzése (config.ADMIN_USERNAMES)"""
+    if not require_login():
+        return False
+    if st.session_state.get('username') not in ADMIN_USERNAMES:
+        st.error("⛔ Ez az oldal csak adminisztrátoroknak érhető el!")
+        st.stop()
+        return False
+    return True
+
 def get_current_user():
     """Aktuális felhasználó adatainak lekérése"""
     if st.session_state.get('logged_in', False):
@@ -0,0 +1,134 @@
+"""
+Folyamat szintű autocomplete index a kártyaválasztóhoz
+
+Sorozatonként egyszer töltjük be az alapkártyákat, a normalizált névszavakat
+rendezett listában tartjuk, és minden leütésnél bisect-tel keressük a prefix
+tartományt - a sorozatot nem olvassuk újra. Az index minden session között
+közös; a frissességet a sorozat katalógus verziója dönti el (catalog_versions,
+a base_cards triggerei növelik minden beszúrásnál, módosításnál és törlésnél,
+bármelyik folyamatból). Verzióváltáskor a sorozat indexét újraépítjük.
+"""
+
+import bisect
+import threading
+
+import database
+from text_search import normalize_text, rank_names
+
+_indexes = {}  # (adatbázis, series_id) -> _SeriesIndex
+_lock = threading.Lock()
+
+AUTOCOMPLETE_STATS = {'builds': 0, 'refreshes': 0, 'lookups': 0}
+
+class _SeriesIndex:
+    """Egy sorozat kártyái + rendezett (szó, kártyaszám, kártya id) lista"""
+
+    def __init__(self):
+        self.cards = {}  # id -> (id, card_number, player_name, team, position, description)
+        self.names = {}  # id -> normalizált név
+        self.tokens = []
+        self.version = 0  # a betöltés előtt látott katalógus verzió
+
+    def add(self, card):
+        card_id = card[0]
+        if card_id in self.cards:
+            return
+        self.cards[card_id] = card
+        self.names[card_id] = normalize_text(card[2])
+        for word in set(self.names[card_id].split()):
+            bisect.insort(self.tokens, (word, card[1], card_id))
+
+    def prefix_matches(self, prefix):
+        """Kártya id-k, amelyek nevének valamelyik szava a prefixszel kezdődik"""
+        position = bisect.bisect_left(self.tokens, (prefix,))
+        matches = set()
+        while position < len(self.tokens) and self.tokens[position][0].startswith(prefix):
+            matches.add(self.tokens[position][2])
+            position += 1
+        return matches
+
+def _load_cards(series_id):
+    """Sorozat kártyái (a get_base_cards_by_series formátumában)"""
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, card_number, player_name, team, position, description
+            FROM base_cards
+            WHERE series_id = ?
+            ORDER BY card_number
+        """, (series_id,))
+        return [tuple(row) for row in cursor.fetchall()]
+
+def _catalog_version(series_id):
+    """A sorozat katalógus verziója (0, ha még nem volt írás a migráció óta)"""
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM catalog_versions WHERE series_id = ?", (series_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+def _series_index(series_id):
+    """A sorozat indexe - első használatkor és minden katalógus változás után felépítve"""
+    key = (database.DATABASE_NAME, series_id)
+    index = _indexes.get(key)
+
+    # Olcsó frissesség-ellenőrzés: egy PK keresés a catalog_versions táblában
+    version = _catalog_version(series_id)
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None and index.version == version:
+            return index
+        AUTOCOMPLETE_STATS['builds' if index is None else 'refreshes'] += 1
+
+        # Az új index a verzió után olvasott kártyákból épül: ha közben változott
+        # a katalógus, a következő hívás újra eltérő verziót lát és újraépít
+        index = _SeriesIndex()
+        index.version = version
+        for card in _load_cards(series_id):
+            index.add(card)
+        _indexes[key] = index
+    return index
+
+def series_card_count(series_id):
+    """A sorozat kártyáinak száma (az indexből)"""
+    return len(_series_index(series_id).cards)
+
+def suggest(series_id, query, limit=20):
+    """Legjobb `limit` kártya a keresőszöveghez, rangsorolva.
+
+    Minden beírt szónak valamelyik névszó elejére kell illeszkednie (ékezet és
+    kisbetű független). Elöl azok, ahol a teljes név a keresőszöveggel kezdődik,
+    azon belül kártyaszám szerint. Prefix találat híján elírástűrő keresésre vált.
+    """
+    index = _series_index(series_id)
+    AUTOCOMPLETE_STATS['lookups'] += 1
+
+    normalized = normalize_text(query)
+    if not normalized:
+        return sorted(list(index.cards.values()), key=lambda card: card[1])[:limit]
+
+    words = normalized.split()
+    # A leghosszabb szó adja a legszűkebb tartományt, a többit halmazművelettel szűrjük
+    words.sort(key=len, reverse=True)
+    matches = index.prefix_matches(words[0])
+    for word in words[1:]:
+        if not matches:
+            break
+        matches &= index.prefix_matches(word)
+
+    if not matches:
+        return rank_names(query, list(index.cards.values()), key=lambda card: card[2])[:limit]
+
+    ranked = sorted(
+        matches,
+        key=lambda card_id: (not index.names[card_id].startswith(normalized), index.cards[card_id][1])
+    )
+    return [index.cards[card_id] for card_id in ranked[:limit]]
+
+def clear_autocomplete_index():
+    """Az összes betöltött index eldobása (pl. adatbázis csere után)"""
+    with _lock:
+        _indexes.clear()
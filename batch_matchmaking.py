@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Offline matchmaking batch - minden felhasználó top-N találatának előszámolása
+Használat: python batch_matchmaking.py [--workers N] [--chunk-size N] [--db fájl]
+
+A workerek csak olvasható SQLite kapcsolaton számolnak, az eredményeket a fő
+folyamat írja tömegesen a match_cache táblába (source='batch'). Az online
+find_potential_matches innen olvas, az elavult felhasználókra élőben számol.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import database
+from config import (
+    DB_TIMEOUT_SECONDS, MATCH_CACHE_SIZE, MATCH_BATCH_TTL_SECONDS,
+    MATCH_BATCH_WORKERS, MATCH_BATCH_CHUNK_SIZE
+)
+
+# =================== WORKER ===================
+
+_worker_conn = None
+
+def _init_worker(database_path):
+    """Worker folyamat saját, csak olvasható kapcsolata"""
+    global _worker_conn
+    uri = f"{Path(database_path).resolve().as_uri()}?mode=ro"
+    _worker_conn = sqlite3.connect(uri, uri=True, timeout=DB_TIMEOUT_SECONDS)
+
+def _compute_chunk(user_ids, limit):
+    """Egy felhasználó csomag találatai egy olvasási pillanatképből"""
+    cursor = _worker_conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        return [
+            (user_id, json.dumps(database._query_potential_matches(cursor, user_id, limit)))
+            for user_id in user_ids
+        ]
+    finally:
+        _worker_conn.rollback()
+
+# =================== FŐ FOLYAMAT ===================
+
+def _claim_users(cursor, run_id, user_ids):
+    """Felhasználók lefoglalása a futásnak a számolás megkezdése előtt.
+
+    A meglévő cache sorok érvényesek maradnak, csak megjelöljük őket; akinek
+    nincs sora, lejárt helyőrzőt kap. Ha közben változnak az adatai, a trigger
+    törli a sort, és a futás nem írja vissza az elavult eredményt.
+    """
+    cursor.executemany("""
+        INSERT INTO match_cache (user_id, match_limit, payload, expires_at, source, batch_run)
+        VALUES (?, 0, '[]', 0, 'pending', ?)
+        ON CONFLICT(user_id) DO UPDATE SET batch_run = excluded.batch_run
+    """, ((user_id, run_id) for user_id in user_ids))
+
+def _store_results(cursor, run_id, results, limit, expires_at):
+    """Csomag eredményeinek kiírása - csak a még mindig lefoglalt felhasználókra"""
+    cursor.executemany("""
+        UPDATE match_cache
+        SET match_limit = ?, payload = ?, computed_at = CURRENT_TIMESTAMP,
+            expires_at = ?, source = 'batch', batch_run = NULL
+        WHERE user_id = ? AND batch_run = ?
+    """, ((limit, payload, expires_at, user_id, run_id) for user_id, payload in results))
+    return cursor.rowcount
+
+def run_batch(workers=MATCH_BATCH_WORKERS, chunk_size=MATCH_BATCH_CHUNK_SIZE,
+              limit=MATCH_CACHE_SIZE, ttl_seconds=MATCH_BATCH_TTL_SECONDS):
+    """Matchmaking előszámolás az összes felhasználóra.
+
+    Visszatérés: statisztika dict (felhasználók, kiírt, kihagyott, idő, áteresztőképesség).
+    """
+    started = time.perf_counter()
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("INSERT INTO match_batch_runs (workers) VALUES (?)", (workers,))
+            run_id = cursor.lastrowid
+            user_ids = [row[0] for row in cursor.execute("SELECT id FROM users ORDER BY id")]
+            _claim_users(cursor, run_id, user_ids)
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        written = 0
+
+        # spawn: a workerek nem öröklik a szülő nyitott SQLite kapcsolatait
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(database.DATABASE_NAME,)) as executor:
+            for results in executor.map(_compute_chunk, chunks, repeat(limit)):
+                # Csomagonként rövid írási tranzakció, hogy az alkalmazás közben is írhasson
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    written += _store_results(cursor, run_id, results, limit, time.time() + ttl_seconds)
+                    conn.commit()
+                except:
+                    conn.rollback()
+                    raise
+
+        duration = time.perf_counter() - started
+        stats = {
+            'run_id': run_id,
+            'users': len(user_ids),
+            'written': written,
+            'skipped': len(user_ids) - written,
+            'chunks': len(chunks),
+            'workers': workers,
+            'duration_seconds': duration,
+            'users_per_second': len(user_ids) / duration if duration else 0.0
+        }
+
+        cursor.execute("""
+            UPDATE match_batch_runs
+            SET finished_at = CURRENT_TIMESTAMP, users = ?, written = ?, skipped = ?, duration_seconds = ?
+            WHERE id = ?
+        """, (stats['users'], written, stats['skipped'], duration, run_id))
+        conn.commit()
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline matchmaking batch")
+    parser.add_argument('--workers', type=int, default=MATCH_BATCH_WORKERS, help="worker folyamatok száma")
+    parser.add_argument('--chunk-size', type=int, default=MATCH_BATCH_CHUNK_SIZE, help="felhasználók feladatonként")
+    parser.add_argument('--db', default=None, help="adatbázis fájl (alapból az alkalmazásé)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DATABASE_NAME = args.db
+    database.bootstrap_database()
+
+    print(f"🔄 Matchmaking batch indítása ({args.workers} worker)...")
+    stats = run_batch(workers=args.workers, chunk_size=args.chunk_size)
+    print(f"👥 {stats['users']} felhasználó, {stats['chunks']} csomag")
+    print(f"💾 Kiírva: {stats['written']} | kihagyva (futás közben változott): {stats['skipped']}")
+    print(f"⏱️  {stats['duration_seconds']:.1f} s - {stats['users_per_second']:.0f} felhasználó/s")
+
+if __name__ == "__main__":
+    main()
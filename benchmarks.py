@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Teljesítmény mérések és paritás ellenőrzések szintetikus adatokon
+Használat: python benchmarks.py <mérés> [--users N] [--db fájl]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+from text_search import rebuild_trigram_index
+
+# =================== SZINTETIKUS ADATOK ===================
+
+SAMPLE_FIRST_NAMES = ["Lionel", "Kylian", "Luka", "Sergio", "Erling", "Kevin", "Max", "Lewis",
+                      "Charles", "Carlos", "Stephen", "Giannis", "Nikola", "Dominik", "Zoltán"]
+SAMPLE_LAST_NAMES = ["Messi", "Mbappé", "Dončić", "Pérez", "Haaland", "De Bruyne", "Verstappen",
+                     "Hamilton", "Leclerc", "Sainz", "Curry", "Antetokounmpo", "Jokić", "Szoboszlai"]
+SAMPLE_TEAMS = ["PSG", "Real Madrid", "Mavericks", "Red Bull", "Man City", "Ferrari", "Warriors",
+                "Bucks", "Nuggets", "Liverpool", "Mercedes", "Lakers"]
+
+# Generált vezetéknevek szótagokból - nagy katalógusban is változatos nevek legyenek
+NAME_SYLLABLES = ["ka", "lo", "mer", "ti", "va", "ron", "sza", "bo", "de", "li", "ne", "gor",
+                  "ri", "tas", "mi", "ko", "vics", "an", "zo", "pe", "ler", "ba", "nyi", "ros"]
+
+def _player_name():
+    if random.random() < 0.1:
+        last_name = random.choice(SAMPLE_LAST_NAMES)
+    else:
+        last_name = "".join(random.choice(NAME_SYLLABLES) for _ in range(random.randint(2, 4))).capitalize()
+    return f"{random.choice(SAMPLE_FIRST_NAMES)} {last_name}"
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def create_synthetic_database(path, users=1000, series=5, cards_per_series=400,
+                              listings_per_user=30, wishes_per_user=20, seed=42):
+    """Szintetikus adatbázis létrehozása a teljes sémával (triggerekkel együtt).
+
+    A database modul ezután erre az adatbázisra mutat.
+    """
+    random.seed(seed)
+    database.DATABASE_NAME = str(path)
+    database.bootstrap_database()
+
+    now = datetime.now(timezone.utc)
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        variant_ids = [row[0] for row in cursor.execute("SELECT id FROM card_variants")]
+
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+            ((f"user{i}", f"user{i}@example.com", "x") for i in range(users))
+        )
+        cursor.executemany(
+            "INSERT INTO series (name, year, sport) VALUES (?, ?, ?)",
+            ((f"Benchmark sorozat {i}", 2000 + i % 25, "Futball") for i in range(series))
+        )
+        series_ids = [row[0] for row in cursor.execute("SELECT id FROM series WHERE name LIKE 'Benchmark%'")]
+        cursor.executemany(
+            """INSERT INTO base_cards (series_id, card_number, player_name, team, position)
+               VALUES (?, ?, ?, ?, ?)""",
+            (
+                (series_id, number,
+                 _player_name(),
+                 random.choice(SAMPLE_TEAMS), "")
+                for series_id in series_ids for number in range(1, cards_per_series + 1)
+            )
+        )
+        # A trigram indexet az add_base_card vezeti - tömeges beszúrás után újraépítjük
+        rebuild_trigram_index(cursor)
+        card_ids = [row[0] for row in cursor.execute("SELECT id FROM base_cards")]
+        user_ids = [row[0] for row in cursor.execute("SELECT id FROM users")]
+
+        def user_cards():
+            for user_id in user_ids:
+                for base_card_id, variant_id in {(random.choice(card_ids), random.choice(variant_ids))
+                                                 for _ in range(listings_per_user)}:
+                    status = random.choice(('owned', 'trade', 'sell'))
+                    price = random.choice((500, 1000, 1500, 2500)) if status == 'sell' else None
+                    added_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 60))
+                    yield (user_id, base_card_id, variant_id, status, price, _timestamp(added_at))
+
+        def wishes():
+            for user_id in user_ids:
+                for base_card_id, variant_id in {(random.choice(card_ids), random.choice(variant_ids))
+                                                 for _ in range(wishes_per_user)}:
+                    max_price = random.choice((None, 800, 1200, 2000))
+                    yield (user_id, base_card_id, variant_id, max_price, random.randint(1, 4))
+
+        cursor.executemany(
+            """INSERT OR IGNORE INTO user_cards (user_id, base_card_id, variant_id, status, price, added_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            user_cards()
+        )
+        cursor.executemany(
+            """INSERT OR IGNORE INTO wishlists (user_id, base_card_id, variant_id, max_price, priority)
+               VALUES (?, ?, ?, ?, ?)""",
+            wishes()
+        )
+        conn.commit()
+        cursor.execute("ANALYZE")
+
+    return user_ids
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+# =================== MÉRÉSEK ===================
+
+def bench_parity(args):
+    """NumPy pontozó motor vs. SQL CASE kifejezés (eredmény és sebesség)"""
+    import scoring
+
+    print(f"🏗️  Szintetikus adatbázis: {args.users} felhasználó...")
+    user_ids, build_ms = _timed(create_synthetic_database, args.db, users=args.users)
+    print(f"   kész: {build_ms:.0f} ms")
+
+    sample = random.sample(user_ids, min(args.sample, len(user_ids)))
+    mismatches, parity_ms = _timed(scoring.check_sql_parity, sample)
+    print(f"🔍 Paritás {len(sample)} felhasználón: {len(mismatches)} eltérés ({parity_ms:.0f} ms)")
+    for mismatch in mismatches[:10]:
+        print(f"   ❌ user={mismatch[0]} card={mismatch[1]} sql={mismatch[2]} numpy={mismatch[3]}")
+
+    sql_total = numpy_total = 0.0
+    for user_id in sample:
+        _, sql_ms = _timed(database.find_potential_matches, user_id, limit=50, use_cache=False)
+        _, numpy_ms = _timed(scoring.find_potential_matches_vectorized, user_id, limit=50)
+        sql_total += sql_ms
+        numpy_total += numpy_ms
+    print(f"⏱️  SQL: {sql_total / len(sample):.2f} ms/felhasználó | "
+          f"NumPy: {numpy_total / len(sample):.2f} ms/felhasználó")
+
+    return 1 if mismatches else 0
+
+def bench_cycles(args):
+    """Csere kör kereső batch futásideje nagy felhasználószámon
+
+    Mért az alapértelmezett vágással (prioritás >= 2, ritkaság >= 2; --users 100000,
+    1 CPU, SQLite 3.40): 96 188 felhasználó / 577 128 él a gráfban (8.6 s), 371 kör
+    1338 felhasználónak (8.5 s), batch összesen 17.1 s.
+    """
+    import trade_cycles
+
+    print(f"🏗️  Szintetikus adatbázis: {args.users} felhasználó...")
+    _, build_ms = _timed(create_synthetic_database, args.db, users=args.users,
+                         listings_per_user=10, wishes_per_user=10)
+    print(f"   kész: {build_ms / 1000:.1f} s")
+
+    stats = trade_cycles.refresh_trade_cycles()
+    print(f"👥 Gráf: {stats['users_in_graph']} felhasználó, {stats['edges']} él "
+          f"({stats['graph_seconds']:.1f} s)")
+    print(f"🔁 {stats['cycles_found']} kör, {stats['users_with_cycles']} felhasználónak "
+          f"({stats['search_seconds']:.1f} s)")
+    print(f"⏱️  Batch összesen: {stats['total_seconds']:.1f} s")
+    return 0
+
+SEARCH_QUERIES = ["mes", "Messi", "real mad", "haal", "Jok", "Curry Warriors", "de bru",
+                  "Szobo", "ferrari", "Benchmark 12", "lec", "Antetokounmpo Bucks"]
+
+def bench_search(args):
+    """Katalógus keresés: FTS5 (bm25, prefix) vs. LIKE '%q%' nagy katalóguson"""
+    series_count = max(1, args.cards // 400)
+    print(f"🏗️  Szintetikus katalógus: {series_count * 400} kártya...")
+    _, build_ms = _timed(create_synthetic_database, args.db, users=args.users, series=series_count,
+                         cards_per_series=400, listings_per_user=5, wishes_per_user=5)
+    print(f"   kész: {build_ms / 1000:.1f} s")
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        if not database._has_catalog_fts(cursor):
+            print("❌ Az SQLite build nem támogatja az FTS5-öt")
+            return 1
+
+        fts_total = like_total = 0.0
+        for query in SEARCH_QUERIES:
+            fts_rows, fts_ms = _timed(database.search_base_cards, query, limit=20)
+            like_rows, like_ms = _timed(database._search_base_cards_like, cursor, query, None, 20, 0)
+            fts_total += fts_ms
+            like_total += like_ms
+            print(f"   {query!r:24} FTS5: {fts_ms:8.2f} ms ({len(fts_rows)} sor) | "
+                  f"LIKE: {like_ms:8.2f} ms ({len(like_rows)} sor)")
+
+    count = len(SEARCH_QUERIES)
+    print(f"⏱️  FTS5: {fts_total / count:.2f} ms/keresés | LIKE: {like_total / count:.2f} ms/keresés")
+    return 0
+
+# Ékezet nélkül, kisbetűvel, elgépelve - ahogy a felhasználók beírják
+FUZZY_QUERIES = ["doncic", "mbape", "luka doncic", "jokic", "antetokounpo", "szoboszlay",
+                 "verstapen", "kylian mbappe", "haland", "lecler", "zoltan", "de bruine"]
+
+def bench_trigram(args):
+    """Elírástűrő, ékezet-független névkeresés (trigram index) késleltetése nagy katalóguson"""
+    series_count = max(1, args.cards // 400)
+    print(f"🏗️  Szintetikus katalógus: {series_count * 400} kártya...")
+    _, build_ms = _timed(create_synthetic_database, args.db, users=args.users, series=series_count,
+                         cards_per_series=400, listings_per_user=5, wishes_per_user=5)
+    print(f"   kész: {build_ms / 1000:.1f} s")
+
+    timings = []
+    for query in FUZZY_QUERIES:
+        database.search_player_names(query, limit=20)  # bemelegítés (lapgyorsítótár)
+        rows, elapsed_ms = _timed(database.search_player_names, query, limit=20)
+        timings.append(elapsed_ms)
+        best = rows[0][2] if rows else "-"
+        print(f"   {query!r:18} {elapsed_ms:7.2f} ms ({len(rows)} sor, legjobb: {best})")
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"⏱️  medián: {timings[len(timings) // 2]:.2f} ms | p95: {p95:.2f} ms | max: {timings[-1]:.2f} ms")
+    return 0
+
+AUTOCOMPLETE_QUERIES = ["m", "me", "mes", "lionel me", "hamil", "donc", "zolt", "szob", "xq"]
+
+def bench_autocomplete(args):
+    """Kártyaválasztó autocomplete: leütésenkénti késleltetés + frissesség katalógus változás után"""
+    import autocomplete
+
+    print("🏗️  Szintetikus katalógus: 400 kártyás sorozatok...")
+    _, build_ms = _timed(create_synthetic_database, args.db, users=min(args.users, 200),
+                         listings_per_user=5, wishes_per_user=5)
+    print(f"   kész: {build_ms / 1000:.1f} s")
+
+    with database.get_db_connection() as conn:
+        series_id = conn.execute("""
+            SELECT series_id FROM base_cards GROUP BY series_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()[0]
+    autocomplete.suggest(series_id, "")  # index felépítése
+    timings = []
+    for query in AUTOCOMPLETE_QUERIES:
+        rows, elapsed_ms = _timed(autocomplete.suggest, series_id, query)
+        timings.append(elapsed_ms)
+        print(f"   {query!r:14} {elapsed_ms:7.3f} ms ({len(rows)} sor)")
+    print(f"⏱️  max: {max(timings):.3f} ms | indexépítés: {autocomplete.AUTOCOMPLETE_STATS['builds']}")
+
+    # Frissesség: új kártya, átnevezés és törlés (nyers SQL is) azonnal látszik
+    def names(query):
+        return {card[2] for card in autocomplete.suggest(series_id, query, limit=400)}
+
+    failures = []
+    cards = database.get_base_cards_by_series.__wrapped__(series_id)
+    renamed_id, renamed_name = cards[0][0], cards[0][2]
+    deleted_id, deleted_name = cards[1][0], cards[1][2]
+
+    database.add_base_card(series_id, 999, "Quentin Újonc")
+    if "Quentin Újonc" not in names("quen"):
+        failures.append("új kártya")
+
+    database.update_base_card(renamed_id, "Zlatan Ibrahimovic")
+    if "Zlatan Ibrahimovic" not in names("zla") or renamed_name in names(renamed_name):
+        failures.append("átnevezés")
+
+    with database.get_db_connection() as conn:
+        conn.execute("DELETE FROM base_cards WHERE id = ?", (deleted_id,))
+        conn.commit()
+    if any(card[0] == deleted_id for card in autocomplete.suggest(series_id, deleted_name, limit=400)):
+        failures.append("törlés")
+
+    for failure in failures:
+        print(f"   ❌ elavult javaslat: {failure}")
+    print(f"🔄 Frissesség: {'hibás' if failures else 'rendben'} "
+          f"(újraépítés: {autocomplete.AUTOCOMPLETE_STATS['refreshes']})")
+    return 1 if failures else 0
+
+def bench_export(args):
+    """Gyűjtemény CSV export nagy gyűjteményen: darabolt export vs. a régi összefűzéses export"""
+    import tracemalloc
+    import utils
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    # A katalógus méretét a változatok számához igazítjuk (kártya+változat páronként egy sor)
+    database.DATABASE_NAME = str(args.db)
+    database.bootstrap_database()
+    variant_count = len(database.get_all_variants())
+    series_count = -(-args.collection // (400 * variant_count))
+    print(f"🏗️  Szintetikus katalógus: {series_count * 400} kártya, {args.collection} kártyás gyűjtemény...")
+    _, build_ms = _timed(create_synthetic_database, args.db, users=10, series=series_count,
+                         cards_per_series=400, listings_per_user=5, wishes_per_user=5)
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, email, password_hash) VALUES ('collector', 'c@example.com', 'x')")
+        collector_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT INTO user_cards (user_id, base_card_id, variant_id, status, price, notes)
+            SELECT ?, bc.id, cv.id, 'sell', 1500, 'megjegyzés, "idézőjellel"'
+            FROM base_cards bc CROSS JOIN card_variants cv
+            LIMIT ?
+        """, (collector_id, args.collection))
+        conn.commit()
+    print(f"   kész: {build_ms / 1000:.1f} s")
+
+    def streamed():
+        # Ugyanazon az úton, ahogy a letöltés gomb (deferred callable) átadja a Streamlitnek
+        export = utils.export_user_collection(collector_id)
+        payload, _ = convert_data_to_bytes_and_infer_mime(
+            export, unsupported_error=TypeError(f"nem támogatott típus: {type(export)}"))
+        return len(payload)
+
+    def legacy():
+        return len(_legacy_collection_csv(collector_id).encode("utf-8"))
+
+    for label, export in (("darabolt", streamed), ("régi (+= összefűzés)", legacy)):
+        size, elapsed_ms = _timed(export)
+        tracemalloc.start()
+        export()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"   {label:22} {elapsed_ms / 1000:6.2f} s | {size / 2**20:7.1f} MiB | "
+              f"csúcs memória: {peak / 2**20:7.1f} MiB")
+    return 0
+
+def _legacy_collection_csv(user_id):
+    """A korábbi export_user_collection (fetchall + sztring összefűzés) az összehasonlításhoz"""
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.name, bc.card_number, bc.player_name, bc.team, cv.name,
+                   uc.status, uc.price, uc.condition, uc.notes, uc.added_at
+            FROM user_cards uc
+            JOIN base_cards bc ON uc.base_card_id = bc.id
+            JOIN card_variants cv ON uc.variant_id = cv.id
+            JOIN series s ON bc.series_id = s.id
+            WHERE uc.user_id = ?
+            ORDER BY s.name, bc.card_number, cv.rarity_level
+        """, (user_id,))
+        cards = cursor.fetchall()
+
+    csv_data = "Sorozat,Szám,Játékos,Csapat,Változat,Státusz,Ár,Állapot,Megjegyzés,Hozzáadva\n"
+    for card in cards:
+        row = []
+        for item in card:
+            if item is None:
+                row.append("")
+            else:
+                item_str = str(item).replace('"', '""')
+                if ',' in item_str or '"' in item_str:
+                    item_str = f'"{item_str}"'
+                row.append(item_str)
+        csv_data += ",".join(row) + "\n"
+    return csv_data
+
+BENCHMARKS = {
+    'parity': bench_parity,
+    'cycles': bench_cycles,
+    'search': bench_search,
+    'trigram': bench_trigram,
+    'autocomplete': bench_autocomplete,
+    'export': bench_export,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Kártya Csere Platform mérések")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--users', type=int, default=2000, help="szintetikus felhasználók száma")
+    parser.add_argument('--sample', type=int, default=200, help="mintavételezett felhasználók száma")
+    parser.add_argument('--cards', type=int, default=1_000_000, help="katalógus mérete (search / trigram mérés)")
+    parser.add_argument('--collection', type=int, default=500_000, help="gyűjtemény mérete (export mérés)")
+    parser.add_argument('--db', default=None, help="adatbázis fájl (alapból ideiglenes)")
+    args = parser.parse_args()
+
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(prefix="cards_bench_"), "bench.db")
+    elif os.path.exists(args.db):
+        sys.exit(f"❌ A(z) {args.db} már létezik - a mérés új adatbázist épít.")
+
+    sys.exit(BENCHMARKS[args.benchmark](args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Sorozat teljesítettség bitképek
+
+Felhasználónként és sorozatonként egy bitkép: a (kártyaszám, változat) páros
+bitje 1, ha a felhasználónak megvan. 400 kártya × 6 változat = 2400 bit.
+Bit pozíció: (card_number - 1) * VARIANT_SLOTS + card_variants.bitmap_slot
+
+A bitkép WORD_BITS bites INTEGER szavakban van tárolva (user_series_bitmaps:
+user_id, series_id, word, bits), így a user_cards triggerei SQL bitműveletekkel
+tartják karban - bármelyik író útvonalon. Csupa nulla szó nem tárolódik.
+"""
+
+VARIANT_SLOTS = 6  # kártyánként ennyi változat fér el (card_variants.bitmap_slot: 0 .. VARIANT_SLOTS - 1)
+WORD_BITS = 63  # szavanként ennyi bit (az előjelbitet nem használjuk)
+
+def bit_index(card_number, slot):
+    """Kártya + változat (bitmap_slot) bit pozíciója a sorozat bitképében"""
+    return (card_number - 1) * VARIANT_SLOTS + slot
+
+def words_to_int(words):
+    """(word, bits) sorok -> a bitkép egész számként"""
+    value = 0
+    for word, bits in words:
+        value |= bits << (word * WORD_BITS)
+    return value
+
+def int_to_words(value):
+    """Bitkép egész számként -> nem nulla (word, bits) párok"""
+    mask = (1 << WORD_BITS) - 1
+    word = 0
+    while value:
+        if value & mask:
+            yield word, value & mask
+        value >>= WORD_BITS
+        word += 1
+
+def popcount(value):
+    """Beállított bitek száma (megszerzett kártya+változat párosok)"""
+    return value.bit_count()
+
+def load_series_bitmap(cursor, user_id, series_id):
+    """Egy felhasználó egy sorozatának bitképe egész számként"""
+    cursor.execute("""
+        SELECT word, bits FROM user_series_bitmaps WHERE user_id = ? AND series_id = ?
+    """, (user_id, series_id))
+    return words_to_int(cursor.fetchall())
+
+def compute_series_bitmaps(cursor):
+    """Összes bitkép kiszámolása a user_cards táblából: {(user_id, series_id): egész szám}"""
+    values = {}
+    cursor.execute("""
+        SELECT uc.user_id, bc.series_id, bc.card_number, cv.bitmap_slot
+        FROM user_cards uc
+        JOIN base_cards bc ON uc.base_card_id = bc.id
+        JOIN card_variants cv ON uc.variant_id = cv.id
+    """)
+    for user_id, series_id, card_number, slot in cursor.fetchall():
+        key = (user_id, series_id)
+        values[key] = values.get(key, 0) | (1 << bit_index(card_number, slot))
+    return values
+
+def load_series_bitmaps(cursor):
+    """Összes tárolt bitkép: {(user_id, series_id): egész szám}"""
+    values = {}
+    cursor.execute("SELECT user_id, series_id, word, bits FROM user_series_bitmaps")
+    for user_id, series_id, word, bits in cursor.fetchall():
+        key = (user_id, series_id)
+        values[key] = values.get(key, 0) | (bits << (word * WORD_BITS))
+    return {key: value for key, value in values.items() if value}
+
+def rebuild_series_bitmaps(cursor):
+    """Bitkép tábla teljes újraépítése (backfill / javítás)"""
+    bitmaps = compute_series_bitmaps(cursor)
+    cursor.execute("DELETE FROM user_series_bitmaps")
+    cursor.executemany(
+        "INSERT INTO user_series_bitmaps (user_id, series_id, word, bits) VALUES (?, ?, ?, ?)",
+        ((user_id, series_id, word, bits)
+         for (user_id, series_id), value in bitmaps.items()
+         for word, bits in int_to_words(value))
+    )
+    return len(bitmaps)
@@ -19,6 +19,36 @@ PAGE_CONFIG = {
 SECRET_KEY = os.environ.get('SECRET_KEY', 'development-key-change-in-production')
 PASSWORD_SALT_ROUNDS = 100000  # PBKDF2 iterációk száma
 
+# Adatbázis kapcsolat pool
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))  # max. tétlen kapcsolatok száma
+DB_TIMEOUT_SECONDS = 30.0
+DB_HEALTH_CHECK_INTERVAL = 60  # másodperc, ennyi tétlenség után SELECT 1 ellenőrzés
+
+# Matchmaking cache
+MATCH_CACHE_TTL_SECONDS = int(os.environ.get('MATCH_CACHE_TTL_SECONDS', '600'))  # frissességi bónusz miatt
+MATCH_CACHE_SIZE = 100  # ennyi találatot számolunk és tárolunk felhasználónként
+
+# Offline matchmaking batch (batch_matchmaking.py)
+MATCH_BATCH_TTL_SECONDS = int(os.environ.get('MATCH_BATCH_TTL_SECONDS', '3600'))  # óránkénti futtatáshoz
+MATCH_BATCH_WORKERS = int(os.environ.get('MATCH_BATCH_WORKERS', str(os.cpu_count() or 2)))
+MATCH_BATCH_CHUNK_SIZE = 500  # felhasználók száma worker feladatonként
+
+# Rendszer statisztika pillanatképek
+SYSTEM_STATS_INTERVAL_SECONDS = int(os.environ.get('SYSTEM_STATS_INTERVAL_SECONDS', '300'))  # háttérfrissítés
+SYSTEM_STATS_HISTORY_DAYS = 90  # ennyi napnyi előzmény marad meg a trend grafikonokhoz
+
+# Felhasználó kereső (címzett választás, profilok)
+USER_SEARCH_LIMIT = 20  # alapértelmezett találatszám
+USER_SEARCH_MAX_LIMIT = 100  # ennél több találatot sosem adunk vissza
+
+# CSV exportok (gyűjtemény, üzenetek)
+EXPORT_CHUNK_ROWS = 1000  # ennyi sort olvasunk és írunk ki egyszerre
+
+# Adminisztrátorok (rendszer statisztika oldal) - vesszővel elválasztott felhasználónevek
+ADMIN_USERNAMES = frozenset(
+    name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()
+)
+
 # Rate limiting
 MAX_LOGIN_ATTEMPTS = 5
 LOGIN_TIMEOUT_SECONDS = 300  # 5 perc
@@ -1,170 +1,210 @@
 import sqlite3
+import functools
 import hashlib
+import json
+import threading
 from datetime import datetime
 import streamlit as st
 import time
 from contextlib import contextmanager
 
+from config import (
+    DB_POOL_SIZE, DB_TIMEOUT_SECONDS, DB_HEALTH_CHECK_INTERVAL,
+    MATCH_CACHE_TTL_SECONDS, MATCH_CACHE_SIZE,
+    SYSTEM_STATS_INTERVAL_SECONDS, SYSTEM_STATS_HISTORY_DAYS,
+    USER_SEARCH_LIMIT, USER_SEARCH_MAX_LIMIT
+)
+from migrations import run_migrations, LATEST_SCHEMA_VERSION
+from bitmaps import VARIANT_SLOTS, bit_index, load_series_bitmap, popcount
+from text_search import index_base_card, find_similar_names
+
 DATABASE_NAME = 'cards_platform.db'
 
+# =================== KAPCSOLAT POOL ===================
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite kapcsolat, amelynek close() hívása visszaadja a kapcsolatot a poolnak"""
+
+    _pool = None
+    _last_used = 0.0
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Kapcsolat tényleges lezárása (pool nélkül)"""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Folyamat szintű SQLite kapcsolat pool szálankénti újrahasznosítással.
+
+    - egy szálon belül az egymásba ágyazott lekérések ugyanazt a kapcsolatot kapják
+    - a PRAGMA beállítások kapcsolatonként egyszer futnak le (WAL folyamatonként egyszer)
+    - a tétlen kapcsolatok újrafelhasználás előtt egészség ellenőrzésen esnek át
+    """
+
+    def __init__(self, database, max_size=DB_POOL_SIZE, timeout=DB_TIMEOUT_SECONDS,
+                 health_check_interval=DB_HEALTH_CHECK_INTERVAL):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wal_enabled = False
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0, 'health_checks': 0}
+
+    def _create_connection(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            isolation_level='DEFERRED',
+            check_same_thread=False,
+            factory=PooledConnection
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        if not self._wal_enabled:
+            # A WAL mód az adatbázis fájlban tárolódik, elég egyszer beállítani
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._wal_enabled = True
+        # WAL mellett NORMAL: nincs fsync commitonként - áramszünetnél az utolsó
+        # commitok elveszhetnek (az adatbázis nem sérül), cserébe gyorsabb írás
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self.stats['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Hosszabb tétlenség után egy olcsó SELECT 1 ellenőrzés"""
+        if time.monotonic() - conn._last_used < self.health_check_interval:
+            return True
+        with self._lock:
+            self.stats['health_checks'] += 1
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self, row_factory=None):
+        """Kapcsolat kérése - ugyanazon a szálon belül újrahasznosítja az aktív kapcsolatot.
+
+        A row_factory csak a legkülső lekéréskor állítódik be, így a beágyazott
+        hívások nem írják felül a külső hívó sor formátumát.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            return conn
+
+        conn = None
+        while conn is None:
+            with self._lock:
+                candidate = self._idle.pop() if self._idle else None
+            if candidate is None:
+                conn = self._create_connection()
+            elif self._is_healthy(candidate):
+                conn = candidate
+                with self._lock:
+                    self.stats['reused'] += 1
+            else:
+                self._discard(candidate)
+
+        conn._pool = self
+        conn.row_factory = row_factory
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Kapcsolat visszaadása - a legkülső felszabadításkor kerül vissza a poolba"""
+        if getattr(self._local, 'conn', None) is not conn:
+            # Másik szálon szerzett vagy már felszabadított kapcsolat
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        conn.row_factory = None
+        conn._last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self.stats['discarded'] += 1
+        try:
+            conn.discard()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Összes tétlen kapcsolat lezárása (pl. leállításkor vagy DB csere után)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._wal_enabled = False
+        for conn in idle:
+            try:
+                conn.discard()
+            except sqlite3.Error:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Folyamat szintű pool lekérése (lusta inicializálással)"""
+    global _pool
+    if _pool is None or _pool.database != DATABASE_NAME:
+        with _pool_lock:
+            if _pool is None or _pool.database != DATABASE_NAME:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(DATABASE_NAME)
+    return _pool
+
 @contextmanager
 def get_db_connection():
-    """Biztonságos adatbázis kapcsolat context managerrel"""
-    conn = None
+    """Biztonságos adatbázis kapcsolat context managerrel (poolból)"""
+    pool = get_pool()
+    conn = pool.acquire(row_factory=sqlite3.Row)  # Dict-szerű sorok
     try:
-        # Timeout beállítása és WAL mód
-        conn = sqlite3.connect(DATABASE_NAME, timeout=30.0, isolation_level='DEFERRED')
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA busy_timeout=30000")
-        conn.row_factory = sqlite3.Row  # Dict-szerű sorok
         yield conn
     except sqlite3.OperationalError as e:
-        if "locked" in str(e).lower():
-            # Várunk és újrapróbálkozunk
-            time.sleep(0.5)
-            conn = sqlite3.connect(DATABASE_NAME, timeout=30.0)
-            conn.execute("PRAGMA journal_mode=WAL")
-            yield conn
-        else:
-            raise
+        if "locked" in str(e).lower() and conn.in_transaction:
+            conn.rollback()
+        raise
     finally:
-        if conn:
-            conn.close()
+        pool.release(conn)
 
 def get_connection():
-    """Legacy függvény - visszafelé kompatibilitás"""
-    conn = sqlite3.connect(DATABASE_NAME, timeout=30.0)
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA busy_timeout=30000")
-    return conn
+    """Legacy függvény - visszafelé kompatibilitás (a close() visszaadja a poolnak)"""
+    return get_pool().acquire()
 
 def init_database():
-    """Adatbázis táblák inicializálása"""
+    """Adatbázis séma frissítése (migrációk) és alapadatok feltöltése"""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
+        run_migrations(conn)
         
-        # WAL mód engedélyezése
-        cursor.execute("PRAGMA journal_mode=WAL")
-        
-        # Felhasználók tábla
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                profile_info TEXT
-            )
-        """)
-        
-        # Sorozatok tábla
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS series (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                year INTEGER,
-                sport TEXT,
-                total_cards INTEGER DEFAULT 400,
-                description TEXT,
-                image_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Alapkártyák tábla
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS base_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                series_id INTEGER NOT NULL,
-                card_number INTEGER NOT NULL,
-                player_name TEXT NOT NULL,
-                team TEXT,
-                position TEXT,
-                description TEXT,
-                FOREIGN KEY (series_id) REFERENCES series (id),
-                UNIQUE(series_id, card_number)
-            )
-        """)
-        
-        # Kártya változatok
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS card_variants (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                color_code TEXT,
-                rarity_level INTEGER DEFAULT 1,
-                description TEXT
-            )
-        """)
-        
-        # Felhasználó kártyái
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                base_card_id INTEGER NOT NULL,
-                variant_id INTEGER NOT NULL,
-                status TEXT NOT NULL DEFAULT 'owned',
-                price DECIMAL(10,2) NULL,
-                condition TEXT DEFAULT 'Jó',
-                notes TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (base_card_id) REFERENCES base_cards (id),
-                FOREIGN KEY (variant_id) REFERENCES card_variants (id),
-                UNIQUE(user_id, base_card_id, variant_id)
-            )
-        """)
-        
-        # Kívánságlista
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS wishlists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                base_card_id INTEGER NOT NULL,
-                variant_id INTEGER NOT NULL,
-                max_price DECIMAL(10,2),
-                priority INTEGER DEFAULT 1,
-                notes TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (base_card_id) REFERENCES base_cards (id),
-                FOREIGN KEY (variant_id) REFERENCES card_variants (id),
-                UNIQUE(user_id, base_card_id, variant_id)
-            )
-        """)
-        
-        # Üzenetek
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id INTEGER NOT NULL,
-                receiver_id INTEGER NOT NULL,
-                subject TEXT NOT NULL,
-                content TEXT NOT NULL,
-                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_read BOOLEAN DEFAULT FALSE,
-                parent_message_id INTEGER,
-                related_card_id INTEGER,
-                FOREIGN KEY (sender_id) REFERENCES users (id),
-                FOREIGN KEY (receiver_id) REFERENCES users (id),
-                FOREIGN KEY (parent_message_id) REFERENCES messages (id),
-                FOREIGN KEY (related_card_id) REFERENCES user_cards (id)
-            )
-        """)
-        
-        # Aktivitás log
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS activity_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
+        cursor = conn.cursor()
         
         # Kártya változatok alapértelmezett adatai
         cursor.execute("SELECT COUNT(*) FROM card_variants")
@@ -185,12 +225,122 @@ def init_database():
         
         conn.commit()
 
+# =================== EGYSZERI INDÍTÁS ===================
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped_database = None
+BOOTSTRAP_STATS = {}
+
+def is_schema_current(conn):
+    """Gyors ellenőrzés: a PRAGMA user_version a legutolsó migrációra mutat-e"""
+    return conn.execute("PRAGMA user_version").fetchone()[0] >= LATEST_SCHEMA_VERSION
+
+def bootstrap_database():
+    """Séma és tesztadatok előkészítése folyamatonként egyszer.
+
+    Streamlit minden interakciónál újrafuttatja a szkriptet; ez a függvény az
+    első hívás után azonnal visszatér, így a rerunok DDL költsége nulla.
+    Visszatérés: az indítás mért adatai (BOOTSTRAP_STATS).
+    """
+    global _bootstrapped_database, BOOTSTRAP_STATS
+    if _bootstrapped_database == DATABASE_NAME:
+        return BOOTSTRAP_STATS
+    
+    with _bootstrap_lock:
+        if _bootstrapped_database == DATABASE_NAME:
+            return BOOTSTRAP_STATS
+        
+        started = time.perf_counter()
+        
+        with get_db_connection() as conn:
+            schema_was_current = is_schema_current(conn)
+        
+        if not schema_was_current:
+            init_database()
+        
+        add_sample_data()
+        
+        BOOTSTRAP_STATS = {
+            'database': DATABASE_NAME,
+            'schema_version': LATEST_SCHEMA_VERSION,
+            'schema_was_current': schema_was_current,
+            'duration_ms': (time.perf_counter() - started) * 1000
+        }
+        _bootstrapped_database = DATABASE_NAME
+        
+        return BOOTSTRAP_STATS
+
+# =================== KÉRÉS SZINTŰ MEMO ===================
+
+# Egy Streamlit script futáson belül ugyanaz az olvasás csak egyszer fut le.
+# A scope-ot minden oldal elején a begin_request_scope() nyitja; scope nélkül
+# (pl. batch scriptekben) a dekorált függvények változatlanul lefutnak.
+_request_scope = threading.local()
+REQUEST_MEMO_STATS = {'calls': 0, 'duplicates_avoided': 0}
+
+def begin_request_scope():
+    """Új script futás kezdete: üres memo az aktuális szálon"""
+    _request_scope.cache = {}
+    _request_scope.duplicates_avoided = 0
+
+def clear_request_memo():
+    """Memo ürítése (írás után, hogy a futás hátralévő része friss adatot lásson)"""
+    cache = getattr(_request_scope, 'cache', None)
+    if cache:
+        cache.clear()
+
+def get_request_memo_stats():
+    """Memo számlálók: folyamat szintű összesen és az aktuális futásban megspórolt hívások"""
+    stats = dict(REQUEST_MEMO_STATS)
+    stats['duplicates_avoided_this_run'] = getattr(_request_scope, 'duplicates_avoided', 0)
+    return stats
+
+def request_memo(func):
+    """Olvasó függvény eredményének megjegyzése a futás végéig (függvény + argumentumok szerint).
+
+    A visszaadott objektum a hívók között közös - nem szabad módosítani.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = getattr(_request_scope, 'cache', None)
+        if cache is None:
+            return func(*args, **kwargs)
+        
+        key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+        
+        REQUEST_MEMO_STATS['calls'] += 1
+        if key in cache:
+            REQUEST_MEMO_STATS['duplicates_avoided'] += 1
+            _request_scope.duplicates_avoided += 1
+            return cache[key]
+        
+        result = cache[key] = func(*args, **kwargs)
+        return result
+    
+    return wrapper
+
+def clears_request_memo(func):
+    """Író függvény: futás után üríti a kérés szintű memót"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            clear_request_memo()
+    
+    return wrapper
+
 # =================== FELHASZNÁLÓ FUNKCIÓK ===================
 
 def hash_password(password):
     """Jelszó hashelése"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+@clears_request_memo
 def create_user(username, email, password):
     """Új felhasználó létrehozása - JAVÍTOTT VERZIÓ"""
     try:
@@ -252,6 +402,7 @@ def authenticate_user(username, password):
         else:
             return False, None
 
+@request_memo
 def get_all_users():
     """Összes felhasználó lekérése"""
     with get_db_connection() as conn:
@@ -259,8 +410,46 @@ def get_all_users():
         cursor.execute("SELECT id, username FROM users ORDER BY username")
         return cursor.fetchall()
 
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def nocase_prefix_range(prefix):
+    """Prefix -> [alsó, felső) tartomány a NOCASE indexhez (LIKE 'q%' helyett)
+
+    A NOCASE csak az ASCII betűket hajtja kisbetűre - mi is csak azokat, különben
+    pl. a "Z" után következő "[" a kisbetűs "z" elé rendeződne. A felső határ a
+    prefix + a legnagyobb kódpont, így pontosan a prefixszel kezdődő nevek esnek bele.
+    """
+    lower = prefix.translate(_ASCII_LOWER)
+    return lower, lower + "\U0010FFFF"
+
+@request_memo
+def search_users_for_messaging(query, exclude_user_id=None, limit=USER_SEARCH_LIMIT):
+    """Felhasználók keresése név eleje alapján (kis/nagybetű független, korlátozott találatszám)
+
+    Visszatérés: (id, username, created_at, card_count, last_activity) sorok név szerint.
+    """
+    prefix = (query or "").strip()
+    if not prefix:
+        return []
+    
+    lower, upper = nocase_prefix_range(prefix)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.id, u.username, u.created_at,
+                   COALESCE(c.total_cards, 0) AS card_count, c.last_activity_at AS last_activity
+            FROM users u
+            LEFT JOIN user_counters c ON c.user_id = u.id
+            WHERE u.username >= ? COLLATE NOCASE AND u.username < ? COLLATE NOCASE
+            AND u.id != ?
+            ORDER BY u.username COLLATE NOCASE
+            LIMIT ?
+        """, (lower, upper, exclude_user_id or 0, min(limit, USER_SEARCH_MAX_LIMIT)))
+        return cursor.fetchall()
+
 # =================== SOROZAT FUNKCIÓK ===================
 
+@clears_request_memo
 def add_series(name, year=None, sport="", description=""):
     """Új sorozat hozzáadása"""
     try:
@@ -279,6 +468,7 @@ def add_series(name, year=None, sport="", description=""):
     except sqlite3.IntegrityError:
         return False, "Ez a sorozat már létezik!"
 
+@request_memo
 def get_all_series():
     """Összes sorozat lekérése"""
     with get_db_connection() as conn:
@@ -292,6 +482,7 @@ def get_all_series():
         
         return cursor.fetchall()
 
+@request_memo
 def get_series_by_id(series_id):
     """Sorozat lekérése ID alapján"""
     with get_db_connection() as conn:
@@ -307,6 +498,7 @@ def get_series_by_id(series_id):
 
 # =================== ALAPKÁRTYA FUNKCIÓK ===================
 
+@clears_request_memo
 def add_base_card(series_id, card_number, player_name, team="", position="", description=""):
     """Alapkártya hozzáadása sorozathoz"""
     try:
@@ -319,12 +511,34 @@ def add_base_card(series_id, card_number, player_name, team="", position="", des
             """, (series_id, card_number, player_name, team, position, description))
             
             card_id = cursor.lastrowid
+            index_base_card(cursor, card_id, player_name)
             conn.commit()
             
             return True, card_id
     except sqlite3.IntegrityError:
         return False, "Ez a kártya már létezik ebben a sorozatban!"
 
+@clears_request_memo
+def update_base_card(base_card_id, player_name, team="", position="", description=""):
+    """Alapkártya adatainak módosítása (a név a trigram indexben is frissül)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            UPDATE base_cards SET player_name = ?, team = ?, position = ?, description = ?
+            WHERE id = ?
+        """, (player_name, team, position, description, base_card_id))
+
+        if cursor.rowcount == 0:
+            return False, "A kártya nem található!"
+
+        # Átnevezéskor a trigger leveszi a régi nevet - az újat itt vesszük fel
+        index_base_card(cursor, base_card_id, player_name)
+        conn.commit()
+
+        return True, "Kártya sikeresen módosítva!"
+
+@request_memo
 def get_base_cards_by_series(series_id):
     """Sorozat alapkártyáinak lekérése"""
     with get_db_connection() as conn:
@@ -339,35 +553,129 @@ def get_base_cards_by_series(series_id):
         
         return cursor.fetchall()
 
-def search_base_cards(query="", series_id=None):
-    """Alapkártyák keresése"""
+# FTS5 oszlopsúlyok a bm25 rangsoroláshoz: játékos, csapat, pozíció, sorozat, (series_id)
+SEARCH_COLUMN_WEIGHTS = (10.0, 4.0, 1.0, 2.0, 0.0)
+
+_fts_databases = {}
+
+def _has_fts_table(cursor, table):
+    """Van-e az adott FTS5 index az aktuális adatbázisban (adatbázisonként egyszer ellenőrizve)"""
+    key = (DATABASE_NAME, table)
+    if key not in _fts_databases:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        _fts_databases[key] = cursor.fetchone() is not None
+    return _fts_databases[key]
+
+def _has_catalog_fts(cursor):
+    """Van-e FTS5 katalógus index az aktuális adatbázisban"""
+    return _has_fts_table(cursor, 'base_cards_fts')
+
+def _fts_prefix_query(query):
+    """Felhasználói keresőszöveg FTS5 lekérdezéssé alakítása: minden szó prefix, ÉS kapcsolattal"""
+    terms = []
+    for word in query.split():
+        word = word.replace('"', '')
+        if word:
+            terms.append(f'"{word}"*')
+    return " ".join(terms)
+
+@request_memo
+def search_base_cards(query="", series_id=None, limit=50, offset=0):
+    """Alapkártyák keresése (FTS5 rangsorolással, prefix egyezéssel, lapozva)
+
+    A szavak prefixként illeszkednek a játékos nevére, csapatra, pozícióra és a
+    sorozat nevére. FTS5 nélküli adatbázison LIKE alapú keresésre vált.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        sql = """
-            SELECT bc.id, bc.card_number, bc.player_name, bc.team, bc.position, 
-                   s.name as series_name, s.year
-            FROM base_cards bc
-            JOIN series s ON bc.series_id = s.id
-            WHERE 1=1
-        """
-        params = []
+        fts_query = _fts_prefix_query(query or "")
+        if not fts_query:
+            return _search_base_cards_like(cursor, "", series_id, limit, offset)
         
-        if query:
-            sql += " AND (bc.player_name LIKE ? OR bc.team LIKE ?)"
-            params.extend([f"%{query}%", f"%{query}%"])
+        if not _has_catalog_fts(cursor):
+            return _search_base_cards_like(cursor, query, series_id, limit, offset)
         
-        if series_id:
-            sql += " AND bc.series_id = ?"
-            params.append(series_id)
+        # A teljes találathalmazt rangsoroljuk, és már az FTS lekérdezésben lapozunk
+        # (rendezés: pontszám, rowid) - így az oldalak stabilak és nem fednek át
+        weights = ", ".join(map(str, SEARCH_COLUMN_WEIGHTS))
+        series_filter = "AND series_id = ?" if series_id else ""
+        params = [fts_query] + ([series_id] if series_id else [])
         
-        sql += " ORDER BY s.name, bc.card_number"
+        cursor.execute(f"""
+            SELECT bc.id, bc.card_number, bc.player_name, bc.team, bc.position, 
+                   s.name as series_name, s.year
+            FROM (
+                SELECT rowid, bm25(base_cards_fts, {weights}) AS score
+                FROM base_cards_fts
+                WHERE base_cards_fts MATCH ? {series_filter}
+                ORDER BY score, rowid
+                LIMIT ? OFFSET ?
+            ) AS hits
+            JOIN base_cards bc ON bc.id = hits.rowid
+            JOIN series s ON bc.series_id = s.id
+            ORDER BY hits.score, bc.id
+        """, params + [limit, offset])
+        results = cursor.fetchall()
         
-        cursor.execute(sql, params)
-        return cursor.fetchall()
+        # Nincs pontos (prefix) találat - valószínűleg elgépelés: hasonló nevek
+        if not results and offset == 0:
+            results = _fetch_base_cards_by_ids(
+                cursor, [hit[0] for hit in find_similar_names(cursor, query, limit, series_id=series_id)]
+            )
+        return results
+
+def search_player_names(query, series_id=None, limit=20):
+    """Elírástűrő, ékezet-független játékosnév keresés (trigram hasonlóság szerint rendezve)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        hits = find_similar_names(cursor, query, limit, series_id=series_id)
+        return _fetch_base_cards_by_ids(cursor, [hit[0] for hit in hits])
+
+def _fetch_base_cards_by_ids(cursor, base_card_ids):
+    """Alapkártya sorok (a keresés formátumában) a megadott sorrendben"""
+    if not base_card_ids:
+        return []
+    
+    placeholders = ",".join("?" * len(base_card_ids))
+    cursor.execute(f"""
+        SELECT bc.id, bc.card_number, bc.player_name, bc.team, bc.position, 
+               s.name as series_name, s.year
+        FROM base_cards bc
+        JOIN series s ON bc.series_id = s.id
+        WHERE bc.id IN ({placeholders})
+    """, base_card_ids)
+    rows = {row[0]: row for row in cursor.fetchall()}
+    return [rows[card_id] for card_id in base_card_ids if card_id in rows]
+
+def _search_base_cards_like(cursor, query, series_id, limit, offset):
+    """LIKE alapú keresés (FTS5 hiányában, illetve üres keresőszöveggel)"""
+    sql = """
+        SELECT bc.id, bc.card_number, bc.player_name, bc.team, bc.position, 
+               s.name as series_name, s.year
+        FROM base_cards bc
+        JOIN series s ON bc.series_id = s.id
+        WHERE 1=1
+    """
+    params = []
+    
+    if query:
+        sql += " AND (bc.player_name LIKE ? OR bc.team LIKE ? OR bc.position LIKE ? OR s.name LIKE ?)"
+        params.extend([f"%{query}%"] * 4)
+    
+    if series_id:
+        sql += " AND bc.series_id = ?"
+        params.append(series_id)
+    
+    sql += " ORDER BY s.name, bc.card_number LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+    
+    cursor.execute(sql, params)
+    return cursor.fetchall()
 
 # =================== KÁRTYA VÁLTOZAT FUNKCIÓK ===================
 
+@request_memo
 def get_all_variants():
     """Összes kártya változat lekérése"""
     with get_db_connection() as conn:
@@ -381,6 +689,7 @@ def get_all_variants():
         
         return cursor.fetchall()
 
+@request_memo
 def get_variant_by_name(variant_name):
     """Változat lekérése név alapján"""
     with get_db_connection() as conn:
@@ -396,6 +705,7 @@ def get_variant_by_name(variant_name):
 
 # =================== FELHASZNÁLÓ KÁRTYÁK FUNKCIÓK ===================
 
+@clears_request_memo
 def add_user_card(user_id, base_card_id, variant_id, status='owned', price=None, condition='Jó', notes=''):
     """Kártya hozzáadása felhasználóhoz - JAVÍTOTT"""
     try:
@@ -409,6 +719,7 @@ def add_user_card(user_id, base_card_id, variant_id, status='owned', price=None,
                     INSERT INTO user_cards (user_id, base_card_id, variant_id, status, price, condition, notes)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 """, (user_id, base_card_id, variant_id, status, price, condition, notes))
+
                 
                 # Log activity ugyanabban a tranzakcióban
                 cursor.execute("""
@@ -426,6 +737,7 @@ def add_user_card(user_id, base_card_id, variant_id, status='owned', price=None,
     except sqlite3.IntegrityError:
         return False, "Ez a kártya már megvan nálad ebben a változatban!"
 
+@clears_request_memo
 def update_user_card_status(user_card_id, status, price=None):
     """Felhasználó kártya státuszának frissítése"""
     with get_db_connection() as conn:
@@ -439,6 +751,7 @@ def update_user_card_status(user_card_id, status, price=None):
         
         conn.commit()
 
+@request_memo
 def get_user_cards(user_id, status=None, series_id=None):
     """Felhasználó kártyáinak lekérése"""
     with get_db_connection() as conn:
@@ -470,11 +783,13 @@ def get_user_cards(user_id, status=None, series_id=None):
         cursor.execute(sql, params)
         return cursor.fetchall()
 
+@clears_request_memo
 def delete_user_card(user_card_id, user_id):
     """Felhasználó kártya törlése"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        # A számlálókat és a sorozat bitképet a user_cards triggerei vezetik
         cursor.execute("""
             DELETE FROM user_cards 
             WHERE id = ? AND user_id = ?
@@ -482,8 +797,78 @@ def delete_user_card(user_card_id, user_id):
         
         conn.commit()
 
+# =================== SOROZAT TELJESÍTETTSÉG ===================
+
+@request_memo
+def get_all_series_completion(user_id):
+    """Teljesítettség minden sorozatra egyszerre (bitkép popcount alapján).
+
+    Visszatérés: {series_id: (megvan, összes, százalék)} - az összes a sorozat
+    kártyáinak száma × változatok száma.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM card_variants")
+        variant_count = cursor.fetchone()[0]
+        
+        cursor.execute("SELECT series_id, bits FROM user_series_bitmaps WHERE user_id = ?", (user_id,))
+        owned = {}
+        for series_id, bits in cursor.fetchall():
+            owned[series_id] = owned.get(series_id, 0) + popcount(bits)
+        
+        cursor.execute("""
+            SELECT s.id, COUNT(bc.id)
+            FROM series s
+            LEFT JOIN base_cards bc ON bc.series_id = s.id
+            GROUP BY s.id
+        """)
+        
+        completion = {}
+        for series_id, card_count in cursor.fetchall():
+            total = card_count * variant_count
+            has = owned.get(series_id, 0)
+            completion[series_id] = (has, total, (has / total) * 100 if total else 0)
+        
+        return completion
+
+@request_memo
+def get_missing_series_cards(user_id, series_id, limit=None):
+    """Hiányzó kártya+változat párosok egy sorozatból (bitkép végigpásztázásával)
+
+    Visszatérés: [(base_card_id, card_number, player_name, variant_id, variant_name, rarity_level)]
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        owned = load_series_bitmap(cursor, user_id, series_id)
+        
+        cursor.execute("SELECT id, name, rarity_level, bitmap_slot FROM card_variants ORDER BY rarity_level, id")
+        variants = cursor.fetchall()
+        all_slots = sum(1 << slot for _, _, _, slot in variants)
+        
+        cursor.execute("""
+            SELECT id, card_number, player_name FROM base_cards
+            WHERE series_id = ? ORDER BY card_number
+        """, (series_id,))
+        
+        missing = []
+        for base_card_id, card_number, player_name in cursor.fetchall():
+            # A kártya összes változatának bitjei egyben
+            card_bits = owned >> bit_index(card_number, 0) & ((1 << VARIANT_SLOTS) - 1)
+            if card_bits == all_slots:
+                continue
+            for variant_id, variant_name, rarity_level, slot in variants:
+                if not card_bits >> slot & 1:
+                    missing.append((base_card_id, card_number, player_name, variant_id, variant_name, rarity_level))
+                    if limit and len(missing) >= limit:
+                        return missing
+        
+        return missing
+
 # =================== KÍVÁNSÁGLISTA FUNKCIÓK ===================
 
+@clears_request_memo
 def add_to_wishlist(user_id, base_card_id, variant_id, max_price=None, priority=1, notes=""):
     """Kártya hozzáadása kívánságlistához - JAVÍTOTT"""
     try:
@@ -513,6 +898,7 @@ def add_to_wishlist(user_id, base_card_id, variant_id, max_price=None, priority=
     except sqlite3.IntegrityError:
         return False, "Ez a kártya már a kívánságlistádon van!"
 
+@request_memo
 def get_user_wishlist(user_id):
     """Felhasználó kívánságlistájának lekérése"""
     with get_db_connection() as conn:
@@ -535,36 +921,345 @@ def get_user_wishlist(user_id):
 
 # =================== MATCHMAKING FUNKCIÓK ===================
 
-def find_potential_matches(user_id, limit=50):
-    """Fejlett matchmaking algoritmus rangsorolással"""
+# Folyamat szintű cache számlálók (debug / admin célra)
+MATCH_CACHE_STATS = {'hits': 0, 'batch_hits': 0, 'misses': 0, 'stores': 0, 'store_conflicts': 0,
+                     'filtered_fallbacks': 0}
+
+@request_memo
+def find_potential_matches(user_id, limit=50, use_cache=True, min_score=None, max_price=None,
+                           min_rarity=None, only_affordable=False, after=None):
+    """Fejlett matchmaking algoritmus rangsorolással (perzisztens cache-sel)
+
+    A cache-t a kívánságlista és a kínált kártyák változásai triggerekkel
+    érvénytelenítik (match_cache tábla), a frissességi bónusz miatt pedig
+    MATCH_CACHE_TTL_SECONDS után lejár. A batch_matchmaking.py által előre
+    számolt eredmények ugyanitt vannak; elavult felhasználóra élőben számolunk.
+
+    Lapozáshoz az after=(match_score, user_card_id) az előző oldal utolsó
+    találata (rendezés: pontszám csökkenő, user_card_id). A szűrőket és a
+    lapozást a cache-elt rangsorra alkalmazzuk: a cache a teljes rangsor eleje,
+    így ha abból kijön a kért oldal, az pontos. Csak ha nem jön ki (mély oldal,
+    szigorú szűrő), akkor fut a lekérdezés élőben, SQL szűrőkkel.
+    """
+    filters = {
+        'min_score': min_score,
+        'max_price': max_price,
+        'min_rarity': min_rarity,
+        'only_affordable': only_affordable
+    }
+    
+    if use_cache and limit <= MATCH_CACHE_SIZE:
+        cached, complete = _cached_potential_matches(user_id)
+        selected = [match for match in cached if _match_passes(match, filters, after)][:limit]
+        if len(selected) == limit or complete:
+            return selected
+        MATCH_CACHE_STATS['filtered_fallbacks'] += 1
+    
+    with get_db_connection() as conn:
+        return _query_potential_matches(conn.cursor(), user_id, limit, filters=filters, after=after)
+
+def _match_passes(match, filters, after):
+    """A _query_potential_matches szűrőinek és lapozásának megfelelője egy (cache-elt) találatra"""
+    if filters.get('min_rarity') and match['rarity_level'] < filters['min_rarity']:
+        return False
+    if filters.get('max_price') and match['status'] == 'sell' and match['price'] is not None \
+            and match['price'] > filters['max_price']:
+        return False
+    if filters.get('only_affordable') and not match['is_affordable']:
+        return False
+    if filters.get('min_score') and match['match_score'] < filters['min_score']:
+        return False
+    if after is not None and (-match['match_score'], match['user_card_id']) <= (-after[0], after[1]):
+        return False
+    return True
+
+def _cached_potential_matches(user_id):
+    """A felhasználó cache-elt rangsorának eleje (lejárt / hiányzó cache esetén újraszámolva)
+
+    Visszatérés: (találatok, teljes) - teljes, ha a rangsor a cache méreténél rövidebb,
+    vagyis a cache minden találatot tartalmaz.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Egy olvasási pillanatképben számolunk és írunk: ha közben valaki más írt,
+        # az írás SQLITE_BUSY hibával elbukik, és nem tárolunk elavult eredményt
+        cursor.execute("BEGIN")
+        
+        try:
+            cursor.execute("""
+                SELECT payload, source, match_limit FROM match_cache
+                WHERE user_id = ? AND expires_at > ?
+            """, (user_id, time.time()))
+            
+            cached = cursor.fetchone()
+            if cached:
+                MATCH_CACHE_STATS['hits'] += 1
+                if cached[1] == 'batch':
+                    MATCH_CACHE_STATS['batch_hits'] += 1
+                conn.rollback()
+                matches = _load_cached_matches(cached[0], cached[2])
+                return matches, len(matches) < cached[2]
+            
+            MATCH_CACHE_STATS['misses'] += 1
+            matches = _query_potential_matches(cursor, user_id, MATCH_CACHE_SIZE)
+            
+            try:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO match_cache (user_id, match_limit, payload, expires_at)
+                    VALUES (?, ?, ?, ?)
+                """, (user_id, MATCH_CACHE_SIZE, json.dumps(matches), time.time() + MATCH_CACHE_TTL_SECONDS))
+                conn.commit()
+                MATCH_CACHE_STATS['stores'] += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                MATCH_CACHE_STATS['store_conflicts'] += 1
+            
+            return matches, len(matches) < MATCH_CACHE_SIZE
+            
+        except:
+            conn.rollback()
+            raise
+
+def _load_cached_matches(payload, limit):
+    """Cache-elt találatok betöltése, az időfüggő mezők újraszámolásával"""
+    matches = json.loads(payload)[:limit]
+    for match in matches:
+        match['days_since_added'] = _days_since(match['added_at'])
+    return matches
+
+@clears_request_memo
+def invalidate_match_cache(user_id=None):
+    """Match cache kézi ürítése (egy felhasználóra vagy mindenkire)"""
+    with get_db_connection() as conn:
+        if user_id is None:
+            conn.execute("DELETE FROM match_cache")
+        else:
+            conn.execute("DELETE FROM match_cache WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+def get_match_cache_stats():
+    """Cache találati arány és számlálók"""
+    stats = dict(MATCH_CACHE_STATS)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+def _query_potential_matches(cursor, user_id, limit, filters=None, after=None):
+    """Matchmaking lekérdezés futtatása (cache nélkül), opcionális szűrőkkel és kulcs alapú lapozással"""
+    filters = filters or {}
+    card_conditions = []
+    card_params = []
+    score_conditions = []
+    score_params = []
+    
+    if filters.get('min_rarity'):
+        card_conditions.append("AND cv.rarity_level >= ?")
+        card_params.append(filters['min_rarity'])
+    
+    if filters.get('max_price'):
+        card_conditions.append("AND (uc.status != 'sell' OR uc.price IS NULL OR uc.price <= ?)")
+        card_params.append(filters['max_price'])
+    
+    if filters.get('only_affordable'):
+        card_conditions.append(
+            "AND (uc.status = 'trade' OR uwp.max_price IS NULL OR uc.price IS NULL OR uc.price <= uwp.max_price)"
+        )
+    
+    if filters.get('min_score'):
+        score_conditions.append("AND match_score >= ?")
+        score_params.append(filters['min_score'])
+    
+    if after is not None:
+        score_conditions.append("AND (match_score < ? OR (match_score = ? AND user_card_id > ?))")
+        score_params.extend([after[0], after[0], after[1]])
+    
+    # Komplex lekérdezés rangsorolással (kereslet/kínálat a card_market_stats táblából)
+    card_filter = " ".join(card_conditions)
+    score_filter = " ".join(score_conditions)
+    
+    cursor.execute(f"""
+        WITH user_wishlist_priority AS (
+            SELECT base_card_id, variant_id, priority, max_price
+            FROM wishlists
+            WHERE user_id = ?
+        ),
+        
+        scored AS (
+        SELECT DISTINCT
+            uc.id as user_card_id,
+            uc.status,
+            uc.price,
+            uc.condition,
+            uc.added_at,
+            bc.card_number,
+            bc.player_name,
+            bc.team,
+            cv.name as variant_name,
+            cv.color_code,
+            cv.rarity_level,
+            s.name as series_name,
+            s.year,
+            u.username as owner,
+            uwp.priority as user_priority,
+            uwp.max_price as user_max_price,
+            COALESCE(ms.demand_count, 0) as demand,
+            COALESCE(ms.supply_count, 0) as supply,
+            
+            (
+                (5 - COALESCE(uwp.priority, 3)) * 10 +
+                    cv.rarity_level * 5 +
+                    CASE 
+                        WHEN COALESCE(ms.supply_count, 0) = 0 THEN 30
+                        WHEN COALESCE(ms.supply_count, 0) = 1 THEN 25
+                        WHEN COALESCE(ms.supply_count, 0) = 2 THEN 20
+                        WHEN COALESCE(ms.supply_count, 0) <= 5 THEN 15
+                        ELSE CASE WHEN (10 - ms.supply_count) > 0 THEN (10 - ms.supply_count) ELSE 0 END
+                    END +
+                    CASE 
+                        WHEN COALESCE(ms.demand_count, 0) * 3 < 20 THEN COALESCE(ms.demand_count, 0) * 3 
+                        ELSE 20 
+                    END +
+                    CASE 
+                        WHEN uc.status = 'trade' THEN 15
+                        WHEN uc.status = 'sell' AND uwp.max_price IS NULL THEN 10
+                        WHEN uc.status = 'sell' AND uc.price <= uwp.max_price THEN 15
+                        WHEN uc.status = 'sell' AND uc.price <= uwp.max_price * 1.1 THEN 10
+                        WHEN uc.status = 'sell' AND uc.price <= uwp.max_price * 1.2 THEN 5
+                        ELSE 0
+                    END +
+                    CASE 
+                        WHEN uc.added_at >= datetime('now', '-1 day') THEN 10
+                        WHEN uc.added_at >= datetime('now', '-3 days') THEN 7
+                        WHEN uc.added_at >= datetime('now', '-7 days') THEN 5
+                        WHEN uc.added_at >= datetime('now', '-30 days') THEN 2
+                        ELSE 0
+                    END
+            ) as match_score
+            
+        FROM user_cards uc
+        JOIN base_cards bc ON uc.base_card_id = bc.id
+        JOIN card_variants cv ON uc.variant_id = cv.id
+        JOIN series s ON bc.series_id = s.id
+        JOIN users u ON uc.user_id = u.id
+        JOIN user_wishlist_priority uwp ON uc.base_card_id = uwp.base_card_id 
+            AND uc.variant_id = uwp.variant_id
+        LEFT JOIN card_market_stats ms ON uc.base_card_id = ms.base_card_id 
+            AND uc.variant_id = ms.variant_id
+            
+        WHERE uc.user_id != ?
+        AND uc.status IN ('trade', 'sell')
+        {card_filter}
+        )
+        
+        SELECT * FROM scored
+        WHERE 1 = 1 {score_filter}
+        
+        -- Teljes rendezés (user_card_id egyedi), hogy a kulcs alapú lapozás stabil legyen
+        ORDER BY match_score DESC, user_card_id
+        LIMIT ?
+    """, [user_id, user_id, *card_params, *score_params, limit])
+    
+    return [_match_row_to_dict(row) for row in cursor.fetchall()]
+
+def _match_row_to_dict(row):
+    """Matchmaking eredmény sor átalakítása dict-té"""
+    match_data = {
+        'user_card_id': row[0],
+        'status': row[1],
+        'price': row[2],
+        'condition': row[3],
+        'added_at': row[4],
+        'card_number': row[5],
+        'player_name': row[6],
+        'team': row[7],
+        'variant_name': row[8],
+        'color_code': row[9],
+        'rarity_level': row[10],
+        'series_name': row[11],
+        'series_year': row[12],
+        'owner': row[13],
+        'user_priority': row[14],
+        'user_max_price': row[15],
+        'demand': row[16],
+        'supply': row[17],
+        'match_score': row[18],
+        'demand_supply_ratio': row[16] / max(row[17], 1),
+        'is_affordable': True if row[1] == 'trade' else (
+            row[15] is None or row[2] is None or row[2] <= row[15]
+        ),
+        'rarity_text': get_rarity_text(row[10]),
+        'priority_text': get_priority_text(row[14]),
+        'days_since_added': _days_since(row[4])
+    }
+    
+    return match_data
+
+def _days_since(timestamp):
+    """Eltelt napok száma egy adatbázis időbélyeg óta"""
+    return (datetime.now() - datetime.fromisoformat(timestamp)).days if timestamp else 999
+
+@request_memo
+def find_reverse_matches(user_id, limit=50, users_per_card=20):
+    """Ki keresi azt, amit kínálok - kártyánként csoportosítva
+
+    A cserére/eladásra kínált kártyáimat indexelt joinnal párosítja mások
+    kívánságlistájával. A csoportosítás és a limit (kártyák száma) az
+    adatbázisban történik, kártyánként legfeljebb users_per_card érdeklődővel.
+
+    Érdeklődési pontszám: prioritás * 10 + ritkaság * 5 + ár megfelelőség (0-15)
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Komplex lekérdezés rangsorolással
         cursor.execute("""
-            WITH card_demand AS (
-                SELECT base_card_id, variant_id, COUNT(*) as demand_count
-                FROM wishlists
-                GROUP BY base_card_id, variant_id
+            WITH interest AS (
+                SELECT
+                    uc.id as my_card_id,
+                    w.user_id as interested_user_id,
+                    w.priority,
+                    w.max_price,
+                    (
+                        COALESCE(w.priority, 1) * 10 +
+                        cv.rarity_level * 5 +
+                        CASE 
+                            WHEN uc.status = 'trade' THEN 15
+                            WHEN w.max_price IS NULL THEN 10
+                            WHEN uc.price <= w.max_price THEN 15
+                            WHEN uc.price <= w.max_price * 1.1 THEN 10
+                            WHEN uc.price <= w.max_price * 1.2 THEN 5
+                            ELSE 0
+                        END
+                    ) as interest_score
+                FROM user_cards uc
+                JOIN wishlists w ON w.base_card_id = uc.base_card_id 
+                    AND w.variant_id = uc.variant_id
+                JOIN card_variants cv ON uc.variant_id = cv.id
+                WHERE uc.user_id = ?
+                AND uc.status IN ('trade', 'sell')
+                AND w.user_id != uc.user_id
             ),
-            card_supply AS (
-                SELECT base_card_id, variant_id, COUNT(*) as supply_count
-                FROM user_cards
-                WHERE status IN ('trade', 'sell')
-                GROUP BY base_card_id, variant_id
+            top_cards AS (
+                SELECT my_card_id, COUNT(*) as interest_count, AVG(interest_score) as avg_score
+                FROM interest
+                GROUP BY my_card_id
+                ORDER BY interest_count DESC, avg_score DESC, my_card_id
+                LIMIT ?
             ),
-            user_wishlist_priority AS (
-                SELECT base_card_id, variant_id, priority, max_price
-                FROM wishlists
-                WHERE user_id = ?
+            ranked_interest AS (
+                SELECT i.*, ROW_NUMBER() OVER (
+                    PARTITION BY i.my_card_id ORDER BY i.interest_score DESC, i.interested_user_id
+                ) as user_rank
+                FROM interest i
+                WHERE i.my_card_id IN (SELECT my_card_id FROM top_cards)
             )
             
-            SELECT DISTINCT
-                uc.id as user_card_id,
+            SELECT
+                tc.my_card_id,
+                tc.interest_count,
+                tc.avg_score,
                 uc.status,
                 uc.price,
-                uc.condition,
-                uc.added_at,
                 bc.card_number,
                 bc.player_name,
                 bc.team,
@@ -573,96 +1268,50 @@ def find_potential_matches(user_id, limit=50):
                 cv.rarity_level,
                 s.name as series_name,
                 s.year,
-                u.username as owner,
-                uwp.priority as user_priority,
-                uwp.max_price as user_max_price,
-                COALESCE(cd.demand_count, 0) as demand,
-                COALESCE(cs.supply_count, 0) as supply,
-                
-                (
-                    (5 - COALESCE(uwp.priority, 3)) * 10 +
-                        cv.rarity_level * 5 +
-                        CASE 
-                            WHEN COALESCE(cs.supply_count, 0) = 0 THEN 30
-                            WHEN COALESCE(cs.supply_count, 0) = 1 THEN 25
-                            WHEN COALESCE(cs.supply_count, 0) = 2 THEN 20
-                            WHEN COALESCE(cs.supply_count, 0) <= 5 THEN 15
-                            ELSE CASE WHEN (10 - cs.supply_count) > 0 THEN (10 - cs.supply_count) ELSE 0 END
-                        END +
-                        CASE 
-                            WHEN COALESCE(cd.demand_count, 0) * 3 < 20 THEN COALESCE(cd.demand_count, 0) * 3 
-                            ELSE 20 
-                        END +
-                        CASE 
-                            WHEN uc.status = 'trade' THEN 15
-                            WHEN uc.status = 'sell' AND uwp.max_price IS NULL THEN 10
-                            WHEN uc.status = 'sell' AND uc.price <= uwp.max_price THEN 15
-                            WHEN uc.status = 'sell' AND uc.price <= uwp.max_price * 1.1 THEN 10
-                            WHEN uc.status = 'sell' AND uc.price <= uwp.max_price * 1.2 THEN 5
-                            ELSE 0
-                        END +
-                        CASE 
-                            WHEN uc.added_at >= datetime('now', '-1 day') THEN 10
-                            WHEN uc.added_at >= datetime('now', '-3 days') THEN 7
-                            WHEN uc.added_at >= datetime('now', '-7 days') THEN 5
-                            WHEN uc.added_at >= datetime('now', '-30 days') THEN 2
-                            ELSE 0
-                        END
-                ) as match_score
-                
-            FROM user_cards uc
+                ri.interested_user_id,
+                u.username as interested_user,
+                ri.priority,
+                ri.max_price,
+                ri.interest_score
+            FROM top_cards tc
+            JOIN ranked_interest ri ON ri.my_card_id = tc.my_card_id AND ri.user_rank <= ?
+            JOIN user_cards uc ON uc.id = tc.my_card_id
             JOIN base_cards bc ON uc.base_card_id = bc.id
             JOIN card_variants cv ON uc.variant_id = cv.id
             JOIN series s ON bc.series_id = s.id
-            JOIN users u ON uc.user_id = u.id
-            JOIN user_wishlist_priority uwp ON uc.base_card_id = uwp.base_card_id 
-                AND uc.variant_id = uwp.variant_id
-            LEFT JOIN card_demand cd ON uc.base_card_id = cd.base_card_id 
-                AND uc.variant_id = cd.variant_id
-            LEFT JOIN card_supply cs ON uc.base_card_id = cs.base_card_id 
-                AND uc.variant_id = cs.variant_id
-                
-            WHERE uc.user_id != ?
-            AND uc.status IN ('trade', 'sell')
-            
-            ORDER BY match_score DESC, demand DESC, cv.rarity_level DESC
-            LIMIT ?
-        """, (user_id, user_id, limit))
+            JOIN users u ON ri.interested_user_id = u.id
+            ORDER BY tc.interest_count DESC, tc.avg_score DESC, tc.my_card_id, ri.user_rank
+        """, (user_id, limit, users_per_card))
         
-        matches = []
+        cards = []
         for row in cursor.fetchall():
-            match_data = {
-                'user_card_id': row[0],
-                'status': row[1],
-                'price': row[2],
-                'condition': row[3],
-                'added_at': row[4],
-                'card_number': row[5],
-                'player_name': row[6],
-                'team': row[7],
-                'variant_name': row[8],
-                'color_code': row[9],
-                'rarity_level': row[10],
-                'series_name': row[11],
-                'series_year': row[12],
-                'owner': row[13],
-                'user_priority': row[14],
-                'user_max_price': row[15],
-                'demand': row[16],
-                'supply': row[17],
-                'match_score': row[18],
-                'demand_supply_ratio': row[16] / max(row[17], 1),
-                'is_affordable': True if row[1] == 'trade' else (
-                    row[15] is None or row[2] is None or row[2] <= row[15]
-                ),
-                'rarity_text': get_rarity_text(row[10]),
-                'priority_text': get_priority_text(row[14]),
-                'days_since_added': (datetime.now() - datetime.fromisoformat(row[4])).days if row[4] else 999
-            }
+            if not cards or cards[-1]['my_card_id'] != row[0]:
+                cards.append({
+                    'my_card_id': row[0],
+                    'interest_count': row[1],
+                    'avg_interest_score': row[2],
+                    'status': row[3],
+                    'price': row[4],
+                    'card_number': row[5],
+                    'player_name': row[6],
+                    'team': row[7],
+                    'variant_name': row[8],
+                    'color_code': row[9],
+                    'rarity_level': row[10],
+                    'series_name': row[11],
+                    'series_year': row[12],
+                    'interested_users': []
+                })
             
-            matches.append(match_data)
+            cards[-1]['interested_users'].append({
+                'interested_user_id': row[13],
+                'interested_user': row[14],
+                'their_priority': row[15],
+                'their_max_price': row[16],
+                'interest_score': row[17]
+            })
         
-        return matches
+        return cards
 
 def get_rarity_text(rarity_level):
     """Ritkasági szint szöveges megfelelője"""
@@ -690,6 +1339,7 @@ def get_priority_text(priority):
 
 # =================== AKTIVITÁS LOG ===================
 
+@clears_request_memo
 def log_activity(user_id, action, description):
     """Aktivitás naplózása - JAVÍTOTT önálló verzió"""
     try:
@@ -707,6 +1357,7 @@ def log_activity(user_id, action, description):
         print(f"Log activity error: {e}")
         pass
 
+@request_memo
 def get_user_activity(user_id, limit=10):
     """Felhasználó aktivitásának lekérése"""
     with get_db_connection() as conn:
@@ -722,6 +1373,107 @@ def get_user_activity(user_id, limit=10):
         
         return cursor.fetchall()
 
+# =================== RENDSZER STATISZTIKÁK ===================
+
+SYSTEM_STATS_COLUMNS = ('total_users', 'total_series', 'total_base_cards', 'total_user_cards',
+                        'total_messages', 'activity_week', 'popular_series')
+
+def refresh_system_stats():
+    """Rendszer statisztikák kiszámolása és mentése új pillanatképként (régi előzmények törlésével)"""
+    started = time.perf_counter()
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM series),
+                (SELECT COUNT(*) FROM base_cards),
+                (SELECT COUNT(*) FROM user_cards),
+                (SELECT COUNT(*) FROM messages),
+                (SELECT COUNT(*) FROM activity_log WHERE created_at >= datetime('now', '-7 days')),
+                -- Legnépszerűbb sorozat a triggerekkel vezetett sorozatonkénti darabszámokból
+                (SELECT s.name FROM user_series_counts usc
+                 JOIN series s ON usc.series_id = s.id
+                 GROUP BY usc.series_id
+                 ORDER BY SUM(usc.card_count) DESC
+                 LIMIT 1)
+        """)
+        stats = dict(zip(SYSTEM_STATS_COLUMNS, cursor.fetchone()))
+        stats['popular_series'] = stats['popular_series'] or "Nincs adat"
+        duration_ms = (time.perf_counter() - started) * 1000
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(f"""
+                INSERT INTO system_stats_snapshot ({", ".join(SYSTEM_STATS_COLUMNS)}, duration_ms)
+                VALUES ({", ".join("?" * len(SYSTEM_STATS_COLUMNS))}, ?)
+            """, (*stats.values(), duration_ms))
+            cursor.execute("""
+                DELETE FROM system_stats_snapshot WHERE taken_at < datetime('now', ?)
+            """, (f"-{SYSTEM_STATS_HISTORY_DAYS} days",))
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+    
+    stats['duration_ms'] = duration_ms
+    return stats
+
+def get_latest_system_stats():
+    """Legutóbbi pillanatkép (None, ha még nincs)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {", ".join(SYSTEM_STATS_COLUMNS)}, taken_at
+            FROM system_stats_snapshot
+            ORDER BY taken_at DESC, id DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        return dict(zip(SYSTEM_STATS_COLUMNS + ('taken_at',), row)) if row else None
+
+def get_system_stats_history(days=30):
+    """Pillanatképek időrendben a trend grafikonokhoz"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT taken_at, {", ".join(SYSTEM_STATS_COLUMNS)}
+            FROM system_stats_snapshot
+            WHERE taken_at >= datetime('now', ?)
+            ORDER BY taken_at
+        """, (f"-{int(days)} days",))
+        return [dict(zip(('taken_at',) + SYSTEM_STATS_COLUMNS, row)) for row in cursor.fetchall()]
+
+_stats_refresher = None
+_stats_refresher_lock = threading.Lock()
+
+def start_system_stats_refresher(interval=SYSTEM_STATS_INTERVAL_SECONDS):
+    """Háttérszál indítása, amely interval másodpercenként pillanatképet készít.
+
+    Folyamatonként egyszer indul (ismételt hívás no-op); interval <= 0 esetén nem indul.
+    """
+    global _stats_refresher
+    if interval <= 0:
+        return None
+    
+    with _stats_refresher_lock:
+        if _stats_refresher is not None and _stats_refresher.is_alive():
+            return _stats_refresher
+        
+        def run():
+            while True:
+                try:
+                    refresh_system_stats()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Rendszer statisztika frissítés sikertelen: {e}")
+                time.sleep(interval)
+        
+        _stats_refresher = threading.Thread(target=run, name="system-stats-refresher", daemon=True)
+        _stats_refresher.start()
+        return _stats_refresher
+
 # =================== TESZTADATOK ===================
 
 def add_sample_data():
@@ -783,6 +1535,7 @@ def add_sample_data():
                             INSERT INTO base_cards (series_id, card_number, player_name, team, position)
                             VALUES (?, ?, ?, ?, ?)
                         """, (series_id, player[0], player[1], player[2], player[3]))
+                        index_base_card(cursor, cursor.lastrowid, player[1])
                 
                 conn.commit()
                 
@@ -790,5 +1543,369 @@ def add_sample_data():
                 conn.rollback()
                 raise
 
-# =================== ÜZENET FUNKCIÓK maradnak változatlanok ===================
-# ... (a többi függvény ugyanaz marad, csak használja az új get_db_connection()-t)
\ No newline at end of file
+# =================== ÜZENET FUNKCIÓK ===================
+
+MESSAGE_PAGE_SIZE = 50
+
+# Kapcsolódó kártya rövid leírása: "#007 Lionel Messi (Gold)"
+_MESSAGE_CARD_INFO = """
+    CASE WHEN m.related_card_id IS NULL THEN NULL ELSE (
+        SELECT '#' || printf('%03d', bc.card_number) || ' ' || bc.player_name || ' (' || cv.name || ')'
+        FROM user_cards uc
+        JOIN base_cards bc ON uc.base_card_id = bc.id
+        JOIN card_variants cv ON uc.variant_id = cv.id
+        WHERE uc.id = m.related_card_id
+    ) END
+"""
+
+_MESSAGE_REPLY_COUNT = "(SELECT COUNT(*) FROM messages r WHERE r.parent_message_id = m.id)"
+
+def _keyset_filter(before):
+    """Keyset lapozás: az előző oldal utolsó sorának (sent_at, id) párja előtti üzenetek"""
+    if not before:
+        return "", []
+    # Sorérték összehasonlítás: az index tartományként olvassa (sent_at < ?), nem szűrőként
+    return " AND (m.sent_at, m.id) < (?, ?)", [before[0], before[1]]
+
+@request_memo
+def get_inbox_messages(user_id, limit=MESSAGE_PAGE_SIZE, before=None, unread_only=False, card_only=False):
+    """Beérkezett üzenetek, legújabb elöl (keyset lapozás: before = (sent_at, id))
+
+    Visszatérés: (id, sender_id, subject, content, sent_at, is_read, parent_id,
+    card_id, sender_name, card_info, reply_count) sorok.
+    """
+    keyset, params = _keyset_filter(before)
+    filters = keyset
+    if unread_only:
+        filters += " AND NOT m.is_read"
+    if card_only:
+        filters += " AND m.related_card_id IS NOT NULL"
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT m.id, m.sender_id, m.subject, m.content, m.sent_at, m.is_read,
+                   m.parent_message_id, m.related_card_id, u.username AS sender_name,
+                   {_MESSAGE_CARD_INFO} AS card_info,
+                   {_MESSAGE_REPLY_COUNT} AS reply_count
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.receiver_id = ? AND m.deleted_by_receiver = 0{filters}
+            ORDER BY m.sent_at DESC, m.id DESC
+            LIMIT ?
+        """, [user_id] + params + [limit])
+        return cursor.fetchall()
+
+def iter_inbox_messages(user_id, chunk_size=MESSAGE_PAGE_SIZE):
+    """Az összes beérkezett üzenet oldalanként lekérve (exporthoz) - a get_inbox_messages sorai"""
+    before = None
+    while True:
+        # A kérés szintű memót megkerüljük, hogy a lapok ne maradjanak memóriában
+        page = get_inbox_messages.__wrapped__(user_id, limit=chunk_size, before=before)
+        yield from page
+        if len(page) < chunk_size:
+            return
+        before = (page[-1][4], page[-1][0])
+
+@request_memo
+def get_sent_messages(user_id, limit=MESSAGE_PAGE_SIZE, before=None):
+    """Elküldött üzenetek, legújabb elöl (keyset lapozás: before = (sent_at, id))
+
+    Visszatérés: (id, receiver_id, subject, content, sent_at, is_read, parent_id,
+    card_id, receiver_name, card_info, reply_count) sorok.
+    """
+    keyset, params = _keyset_filter(before)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT m.id, m.receiver_id, m.subject, m.content, m.sent_at, m.is_read,
+                   m.parent_message_id, m.related_card_id, u.username AS receiver_name,
+                   {_MESSAGE_CARD_INFO} AS card_info,
+                   {_MESSAGE_REPLY_COUNT} AS reply_count
+            FROM messages m
+            JOIN users u ON m.receiver_id = u.id
+            WHERE m.sender_id = ? AND m.deleted_by_sender = 0{keyset}
+            ORDER BY m.sent_at DESC, m.id DESC
+            LIMIT ?
+        """, [user_id] + params + [limit])
+        return cursor.fetchall()
+
+@clears_request_memo
+def send_message(sender_id, receiver_id, subject, content, parent_message_id=None, related_card_id=None):
+    """Üzenet küldése - visszatérés: (True, üzenet id) vagy (False, hibaüzenet)"""
+    if sender_id == receiver_id:
+        return False, "Nem küldhetsz üzenetet önmagadnak!"
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("BEGIN TRANSACTION")
+        
+        try:
+            cursor.execute("SELECT 1 FROM users WHERE id = ?", (receiver_id,))
+            if not cursor.fetchone():
+                conn.rollback()
+                return False, "A címzett nem található!"
+            
+            if parent_message_id:
+                # Csak saját beszélgetésre lehet válaszolni
+                cursor.execute("""
+                    SELECT 1 FROM messages
+                    WHERE id = ? AND (sender_id = ? OR receiver_id = ?)
+                """, (parent_message_id, sender_id, sender_id))
+                if not cursor.fetchone():
+                    conn.rollback()
+                    return False, "Az eredeti üzenet nem található!"
+            
+            cursor.execute("""
+                INSERT INTO messages (sender_id, receiver_id, subject, content, parent_message_id, related_card_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sender_id, receiver_id, subject.strip(), content.strip(), parent_message_id, related_card_id))
+            message_id = cursor.lastrowid
+            
+            cursor.execute("""
+                INSERT INTO activity_log (user_id, action, description)
+                VALUES (?, ?, ?)
+            """, (sender_id, "message_sent", f"Üzenet küldve: {subject.strip()[:50]}"))
+            
+            conn.commit()
+            return True, message_id
+        
+        except:
+            conn.rollback()
+            raise
+
+@request_memo
+def get_message_thread(message_id, user_id):
+    """Üzenet szál (a gyökér üzenettől az összes válaszig), időrendben
+
+    Egy indexelt tartomány olvasás a thread_id alapján, a szál mélységétől függetlenül.
+    Csak a szál résztvevője kérheti le; a felhasználó által törölt üzenetek kimaradnak.
+    Visszatérés: (id, sender_id, receiver_id, subject, content, sent_at, is_read,
+    parent_id, related_card_id, sender_name, card_info) sorok, a gyökér az első.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT thread_id FROM messages WHERE id = ? AND (sender_id = ? OR receiver_id = ?)
+        """, (message_id, user_id, user_id))
+        row = cursor.fetchone()
+        if not row:
+            return []
+        
+        cursor.execute(f"""
+            SELECT m.id, m.sender_id, m.receiver_id, m.subject, m.content, m.sent_at, m.is_read,
+                   m.parent_message_id, m.related_card_id, u.username AS sender_name,
+                   {_MESSAGE_CARD_INFO} AS card_info
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.thread_id = ?
+            AND (m.sender_id = ? OR m.receiver_id = ?)
+            AND NOT (m.sender_id = ? AND m.deleted_by_sender)
+            AND NOT (m.receiver_id = ? AND m.deleted_by_receiver)
+            ORDER BY m.sent_at, m.id
+        """, (row[0], user_id, user_id, user_id, user_id))
+        return cursor.fetchall()
+
+@clears_request_memo
+def mark_message_as_read(message_id, user_id):
+    """Üzenet olvasottnak jelölése (csak a címzett teheti meg)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE messages SET is_read = 1
+            WHERE id = ? AND receiver_id = ? AND NOT is_read
+        """, (message_id, user_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+@clears_request_memo
+def delete_message(message_id, user_id):
+    """Üzenet törlése a felhasználó saját postafiókjából (a másik félnél megmarad)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE messages SET
+                deleted_by_sender = deleted_by_sender OR sender_id = ?,
+                deleted_by_receiver = deleted_by_receiver OR receiver_id = ?
+            WHERE id = ? AND (sender_id = ? OR receiver_id = ?)
+        """, (user_id, user_id, message_id, user_id, user_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+@clears_request_memo
+def mark_all_messages_as_read(user_id):
+    """A felhasználó összes olvasatlan üzenetének olvasottnak jelölése.
+
+    Egy UPDATE utasítás - az olvasatlan számlálót a triggerek ugyanabban a
+    tranzakcióban nullázzák. Visszatérés: az olvasottnak jelölt üzenetek száma.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE messages SET is_read = 1
+            WHERE receiver_id = ? AND NOT is_read
+        """, (user_id,))
+        conn.commit()
+        return cursor.rowcount
+
+@request_memo
+def get_unread_message_count(user_id):
+    """Olvasatlan beérkezett üzenetek száma (triggerekkel karbantartott user_counters sorból)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT unread_messages FROM user_counters WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+@request_memo
+def get_conversation_partners(user_id, limit=10):
+    """Beszélgetőpartnerek a legutóbbi üzenet szerint (triggerekkel karbantartott conversations táblából)
+
+    Visszatérés: (partner_id, name, last_time, msg_count, unread) sorok.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.partner_id, u.username, c.last_message_at, c.message_count, c.unread_count
+            FROM conversations c
+            JOIN users u ON c.partner_id = u.id
+            WHERE c.user_id = ?
+            ORDER BY c.last_message_at DESC, c.last_message_id DESC
+            LIMIT ?
+        """, (user_id, limit))
+        return cursor.fetchall()
+
+def create_card_inquiry_message(inquirer_id, card_owner_name, user_card_id, card_data, inquiry_type="buy"):
+    """Kártya érdeklődő üzenet sablon a matchmaking oldalról
+
+    Visszatérés: (sablon, None) vagy (None, hibaüzenet); a sablon kulcsai:
+    receiver_id, subject, content, related_card_id.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.id FROM user_cards uc
+            JOIN users u ON uc.user_id = u.id
+            WHERE uc.id = ? AND u.username = ?
+        """, (user_card_id, card_owner_name))
+        owner = cursor.fetchone()
+    
+    if not owner:
+        return None, "A kártya már nem elérhető!"
+    if owner[0] == inquirer_id:
+        return None, "Ez a saját kártyád!"
+    
+    card_line = f"#{card_data['card_number']:03d} {card_data['player_name']} ({card_data['variant_name']})"
+    if inquiry_type == "buy":
+        subject = f"Vételi érdeklődés: {card_data['player_name']}"
+        request_line = "Érdekelne a kártyád, szívesen megvásárolnám."
+    else:
+        subject = f"Csere ajánlat: {card_data['player_name']}"
+        request_line = "Érdekelne a kártyád, szívesen cserélnék."
+    
+    details = [
+        f"Szia {card_owner_name}!",
+        "",
+        request_line,
+        "",
+        f"🃏 Kártya: {card_line}",
+        f"📚 Sorozat: {card_data['series_name']}",
+        f"🏷️ Állapot: {card_data['condition']}",
+    ]
+    if card_data.get('price'):
+        details.append(f"💰 Ár: {card_data['price']:,.0f} Ft".replace(',', ' '))
+    details += ["", "Várom a válaszod!"]
+    
+    return {
+        'receiver_id': owner[0],
+        'subject': subject,
+        'content': "\n".join(details),
+        'related_card_id': user_card_id,
+    }, None
+
+# =================== ÜZENET KERESÉS ===================
+
+@request_memo
+def search_messages(user_id, query, folder='all', unread_only=False, card_only=False,
+                    limit=20, after=None):
+    """Üzenetek keresése tárgyban és tartalomban (FTS5, prefix egyezés, a felhasználó üzenetei)
+
+    folder: 'all' | 'received' | 'sent'; unread_only a fogadott olvasatlanokra szűr,
+    card_only a kártyához kapcsolódókra. Lapozás: after = az előző oldal utolsó
+    sorának (sent_at, id) párja.
+    Visszatérés: (id, sender_id, receiver_id, subject, snippet, sent_at, is_read,
+    related_card_id, sender_name, receiver_name) sorok, legújabb elöl; a találatok
+    a tárgyban és a részletben **kiemelve**.
+    """
+    terms = _fts_prefix_query(query or "")
+    if not terms:
+        return []
+    
+    # A saját postafiókból törölt üzenetek nem jelennek meg
+    filters = ["NOT (m.sender_id = ? AND m.deleted_by_sender)",
+               "NOT (m.receiver_id = ? AND m.deleted_by_receiver)"]
+    params = [user_id, user_id]
+    if folder == 'received' or unread_only:
+        filters.append("m.receiver_id = ?")
+        params.append(user_id)
+    elif folder == 'sent':
+        filters.append("m.sender_id = ?")
+        params.append(user_id)
+    if unread_only:
+        filters.append("NOT m.is_read")
+    if card_only:
+        filters.append("m.related_card_id IS NOT NULL")
+    if after:
+        filters.append("(m.sent_at, m.id) < (?, ?)")
+        params.extend(after)
+    extra = "".join(f" AND {condition}" for condition in filters)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        if not _has_fts_table(cursor, 'messages_fts'):
+            return _search_messages_like(cursor, user_id, query, extra, params, limit)
+        
+        # A résztvevő szűrést maga az index végzi, a keresőszavak csak tárgyra/tartalomra illeszkednek
+        match = f'participants : "u{int(user_id)}" AND {{subject content}} : ({terms})'
+        cursor.execute(f"""
+            SELECT m.id, m.sender_id, m.receiver_id,
+                   highlight(messages_fts, 0, '**', '**') AS subject,
+                   snippet(messages_fts, 1, '**', '**', '…', 16) AS snippet,
+                   m.sent_at, m.is_read, m.related_card_id,
+                   sender.username AS sender_name, receiver.username AS receiver_name
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN users sender ON m.sender_id = sender.id
+            JOIN users receiver ON m.receiver_id = receiver.id
+            WHERE messages_fts MATCH ?{extra}
+            ORDER BY m.sent_at DESC, m.id DESC
+            LIMIT ?
+        """, [match] + params + [limit])
+        return cursor.fetchall()
+
+def _like_contains(text):
+    """Részszöveg LIKE minta: a %, _ és \\ karakterek szó szerint illeszkednek (ESCAPE '\\')"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _search_messages_like(cursor, user_id, query, extra, params, limit):
+    """LIKE alapú üzenet keresés (FTS5 nélküli adatbázison)"""
+    pattern = _like_contains(query.strip())
+    cursor.execute(f"""
+        SELECT m.id, m.sender_id, m.receiver_id, m.subject,
+               substr(m.content, 1, 120) AS snippet,
+               m.sent_at, m.is_read, m.related_card_id,
+               sender.username AS sender_name, receiver.username AS receiver_name
+        FROM messages m
+        JOIN users sender ON m.sender_id = sender.id
+        JOIN users receiver ON m.receiver_id = receiver.id
+        WHERE (m.sender_id = ? OR m.receiver_id = ?)
+        AND (m.subject LIKE ? ESCAPE '\\' OR m.content LIKE ? ESCAPE '\\'){extra}
+        ORDER BY m.sent_at DESC, m.id DESC
+        LIMIT ?
+    """, [user_id, user_id, pattern, pattern] + params + [limit])
+    return cursor.fetchall()
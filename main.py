@@ -1,8 +1,12 @@
 import streamlit as st
 import sqlite3
-from database import init_database
+from database import (
+    bootstrap_database, begin_request_scope, get_request_memo_stats,
+    start_system_stats_refresher
+)
 from auth import login_page, register_page, logout_user
 import utils
+from config import DEBUG
 
 # Oldal konfiguráció
 st.set_page_config(
@@ -12,12 +16,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Adatbázis inicializálás
-init_database()
+# Adatbázis inicializálás és tesztadatok (folyamatonként csak egyszer, nem minden rerunnál)
+bootstrap_database()
+
+# Rendszer statisztika pillanatképek háttérszálon (folyamatonként egyszer indul)
+start_system_stats_refresher()
 
-# Tesztadatok hozzáadása (csak első futáskor)
-from database import add_sample_data
-add_sample_data()
+# Kérés szintű memo: egy futáson belül ugyanaz a lekérdezés csak egyszer fut
+begin_request_scope()
 
 # Session state inicializálás
 if 'logged_in' not in st.session_state:
@@ -83,6 +89,13 @@ def main():
             
         # Főoldal dashboard bejelentkezett felhasználóknak
         show_dashboard()
+        
+        if DEBUG:
+            memo_stats = get_request_memo_stats()
+            st.sidebar.caption(
+                f"🧠 Memo: {memo_stats['duplicates_avoided_this_run']} ismételt lekérdezés megspórolva "
+                f"(összesen {memo_stats['duplicates_avoided']})"
+            )
 
 def show_dashboard():
     """Főoldal dashboard bejelentkezett felhasználóknak"""
@@ -126,9 +139,6 @@ def show_dashboard():
     with col2:
         st.header("🔥 Ajánlott")
         
-        # Lehetséges matchek
-        matches = utils.find_potential_matches(st.session_state.user_id)
-        
         # Lehetséges matchek
         matches = utils.find_potential_matches(st.session_state.user_id)
         match_summary = utils.get_match_summary(matches)
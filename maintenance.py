@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Karbantartó feladatok: előre számolt aggregátumok ellenőrzése és javítása
+Használat: python maintenance.py counters|unread|conversations|bitmaps|trigrams [--fix] [--db fájl]
+"""
+
+import argparse
+import sys
+
+import database
+from bitmaps import compute_series_bitmaps, load_series_bitmaps, rebuild_series_bitmaps
+from migrations import (
+    CONVERSATION_ROWS_SQL, USER_COUNTER_COLUMNS, rebuild_conversations, rebuild_unread_counters,
+    rebuild_user_counters
+)
+from text_search import compute_trigram_index, load_trigram_index, rebuild_trigram_index
+
+# =================== FELHASZNÁLÓI SZÁMLÁLÓK ===================
+
+def _expected_user_counters(cursor):
+    """Számlálók újraszámolása a forrás táblákból: {user_id: {oszlop: érték}}"""
+    expected = {}
+
+    def counters(user_id):
+        return expected.setdefault(user_id, dict.fromkeys(USER_COUNTER_COLUMNS, 0))
+
+    cursor.execute("""
+        SELECT uc.user_id, COUNT(*),
+            SUM(uc.status = 'owned'), SUM(uc.status = 'trade'), SUM(uc.status = 'sell'),
+            SUM(COALESCE(cv.name = 'Epic', 0)), COUNT(DISTINCT bc.series_id)
+        FROM user_cards uc
+        LEFT JOIN card_variants cv ON uc.variant_id = cv.id
+        LEFT JOIN base_cards bc ON uc.base_card_id = bc.id
+        GROUP BY uc.user_id
+    """)
+    for user_id, total, owned, trade, sell, epic, series in cursor.fetchall():
+        counters(user_id).update(total_cards=total, owned_cards=owned, trade_cards=trade,
+                                 sell_cards=sell, epic_cards=epic, series_count=series)
+
+    cursor.execute("SELECT user_id, COUNT(*) FROM wishlists GROUP BY user_id")
+    for user_id, wishes in cursor.fetchall():
+        counters(user_id)['wishlist_count'] = wishes
+
+    return expected
+
+def reconcile_user_counters(fix=False):
+    """user_counters összevetése a forrás táblákkal.
+
+    Visszatérés: eltérések listája (user_id, oszlop, tárolt, elvárt).
+    fix=True esetén eltérés esetén a számláló táblákat újraépíti.
+    """
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Egy pillanatképből olvassuk a forrást és a számlálókat
+        cursor.execute("BEGIN IMMEDIATE" if fix else "BEGIN")
+        try:
+            expected = _expected_user_counters(cursor)
+
+            columns = ", ".join(USER_COUNTER_COLUMNS)
+            cursor.execute(f"SELECT user_id, {columns} FROM user_counters")
+            stored = {row[0]: dict(zip(USER_COUNTER_COLUMNS, row[1:])) for row in cursor.fetchall()}
+
+            zeros = dict.fromkeys(USER_COUNTER_COLUMNS, 0)
+            drift = []
+            for user_id in sorted(expected.keys() | stored.keys()):
+                have = stored.get(user_id, zeros)
+                want = expected.get(user_id, zeros)
+                for column in USER_COUNTER_COLUMNS:
+                    if have[column] != want[column]:
+                        drift.append((user_id, column, have[column], want[column]))
+
+            if fix and drift:
+                rebuild_user_counters(cursor)
+                conn.commit()
+            else:
+                conn.rollback()
+        except:
+            conn.rollback()
+            raise
+
+    return drift
+
+# =================== OLVASATLAN ÜZENETEK ===================
+
+def reconcile_unread_counters(fix=False):
+    """user_counters.unread_messages összevetése a messages táblával.
+
+    Visszatérés: eltérések listája (user_id, tárolt, elvárt).
+    fix=True esetén eltérés esetén a számlálót újraszámolja.
+    """
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN IMMEDIATE" if fix else "BEGIN")
+        try:
+            cursor.execute("""
+                SELECT receiver_id, COUNT(*) FROM messages
+                WHERE is_read IS 0 AND deleted_by_receiver IS 0
+                GROUP BY receiver_id
+            """)
+            expected = dict(cursor.fetchall())
+            cursor.execute("SELECT user_id, unread_messages FROM user_counters WHERE unread_messages != 0")
+            stored = dict(cursor.fetchall())
+
+            drift = [(user_id, stored.get(user_id, 0), expected.get(user_id, 0))
+                     for user_id in sorted(expected.keys() | stored.keys())
+                     if stored.get(user_id, 0) != expected.get(user_id, 0)]
+
+            if fix and drift:
+                rebuild_unread_counters(cursor)
+                conn.commit()
+            else:
+                conn.rollback()
+        except:
+            conn.rollback()
+            raise
+
+    return drift
+
+# =================== BESZÉLGETÉSEK ===================
+
+def reconcile_conversations(fix=False):
+    """conversations összevetése a messages táblával.
+
+    Visszatérés: eltérő (user_id, partner_id) kulcsok listája.
+    fix=True esetén eltérés esetén a táblát újraépíti.
+    """
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN IMMEDIATE" if fix else "BEGIN")
+        try:
+            cursor.execute(CONVERSATION_ROWS_SQL)
+            expected = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+            cursor.execute("""
+                SELECT user_id, partner_id, last_message_at, last_message_id, message_count, unread_count
+                FROM conversations
+            """)
+            stored = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+
+            drift = sorted(key for key in expected.keys() | stored.keys()
+                           if expected.get(key) != stored.get(key))
+
+            if fix and drift:
+                rebuild_conversations(cursor)
+                conn.commit()
+            else:
+                conn.rollback()
+        except:
+            conn.rollback()
+            raise
+
+    return drift
+
+# =================== SOROZAT BITKÉPEK ===================
+
+def reconcile_series_bitmaps(fix=False):
+    """user_series_bitmaps összevetése a user_cards táblával.
+
+    Visszatérés: eltérő (user_id, series_id) kulcsok listája.
+    fix=True esetén eltérés esetén a bitkép táblát újraépíti.
+    """
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN IMMEDIATE" if fix else "BEGIN")
+        try:
+            expected = compute_series_bitmaps(cursor)
+            # Üres bitkép (minden kártya törölve) egyenértékű a hiányzó sorral
+            stored = load_series_bitmaps(cursor)
+
+            drift = sorted(key for key in expected.keys() | stored.keys()
+                           if expected.get(key) != stored.get(key))
+
+            if fix and drift:
+                rebuild_series_bitmaps(cursor)
+                conn.commit()
+            else:
+                conn.rollback()
+        except:
+            conn.rollback()
+            raise
+
+    return drift
+
+# =================== TRIGRAM INDEX ===================
+
+def reconcile_trigram_index(fix=False):
+    """Játékos név trigram index összevetése a base_cards táblával.
+
+    Visszatérés: eltérések listája (rész, kulcs) párokként - rész: link / name / posting / frequency.
+    fix=True esetén eltérés esetén az indexet újraépíti.
+    """
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("BEGIN IMMEDIATE" if fix else "BEGIN")
+        try:
+            expected_links, expected_names, expected_postings, expected_frequency = compute_trigram_index(cursor)
+            links, names, postings, frequency = load_trigram_index(cursor)
+
+            drift = [('link', key) for key in sorted(expected_links.keys() | links.keys())
+                     if expected_links.get(key) != links.get(key)]
+            drift += [('name', name) for name in sorted(expected_names ^ names)]
+            drift += [('posting', posting) for posting in sorted(expected_postings ^ postings, key=repr)]
+            drift += [('frequency', trigram) for trigram in sorted(expected_frequency.keys() | frequency.keys())
+                      if expected_frequency.get(trigram) != frequency.get(trigram)]
+
+            if fix and drift:
+                rebuild_trigram_index(cursor)
+                conn.commit()
+            else:
+                conn.rollback()
+        except:
+            conn.rollback()
+            raise
+
+    return drift
+
+def main():
+    parser = argparse.ArgumentParser(description="Kártya Csere Platform karbantartás")
+    parser.add_argument('task', choices=['counters', 'unread', 'conversations', 'bitmaps', 'trigrams'])
+    parser.add_argument('--fix', action='store_true', help="eltérés esetén újraépítés")
+    parser.add_argument('--db', default=None, help="adatbázis fájl (alapból az alkalmazásé)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DATABASE_NAME = args.db
+    database.bootstrap_database()
+
+    if args.task == 'counters':
+        drift = reconcile_user_counters(fix=args.fix)
+        for user_id, column, stored, expected in drift[:50]:
+            print(f"   ❌ user={user_id} {column}: tárolt={stored} elvárt={expected}")
+    elif args.task == 'unread':
+        drift = reconcile_unread_counters(fix=args.fix)
+        for user_id, stored, expected in drift[:50]:
+            print(f"   ❌ user={user_id} unread_messages: tárolt={stored} elvárt={expected}")
+    elif args.task == 'conversations':
+        drift = reconcile_conversations(fix=args.fix)
+        for user_id, partner_id in drift[:50]:
+            print(f"   ❌ user={user_id} partner={partner_id}: eltérő beszélgetés összesítő")
+    elif args.task == 'bitmaps':
+        drift = reconcile_series_bitmaps(fix=args.fix)
+        for user_id, series_id in drift[:50]:
+            print(f"   ❌ user={user_id} series={series_id}: eltérő bitkép")
+    else:
+        drift = reconcile_trigram_index(fix=args.fix)
+        for part, key in drift[:50]:
+            print(f"   ❌ {part} {key!r}: eltérő trigram index")
+
+    if drift:
+        action = "javítva" if args.fix else "futtasd --fix kapcsolóval a javításhoz"
+        print(f"⚠️  {len(drift)} eltérés ({action})")
+    else:
+        print("✅ Az aggregátumok egyeznek a forrás táblákkal")
+
+    sys.exit(1 if drift and not args.fix else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1603 @@
+"""
+Verziózott adatbázis migrációk
+Használat: python migrations.py  (séma frissítése + indexhasználat ellenőrzése)
+"""
+
+import sqlite3
+import sys
+
+from bitmaps import VARIANT_SLOTS, WORD_BITS, rebuild_series_bitmaps
+from text_search import rebuild_trigram_index
+
+# =================== MIGRÁCIÓK ===================
+
+def _migration_001_initial_schema(cursor):
+    """Alap táblák (a korábbi init_database tartalma)"""
+
+    # Felhasználók tábla
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            profile_info TEXT
+        )
+    """)
+
+    # Sorozatok tábla
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS series (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            year INTEGER,
+            sport TEXT,
+            total_cards INTEGER DEFAULT 400,
+            description TEXT,
+            image_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Alapkártyák tábla
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS base_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            series_id INTEGER NOT NULL,
+            card_number INTEGER NOT NULL,
+            player_name TEXT NOT NULL,
+            team TEXT,
+            position TEXT,
+            description TEXT,
+            FOREIGN KEY (series_id) REFERENCES series (id),
+            UNIQUE(series_id, card_number)
+        )
+    """)
+
+    # Kártya változatok
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS card_variants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            color_code TEXT,
+            rarity_level INTEGER DEFAULT 1,
+            description TEXT
+        )
+    """)
+
+    # Felhasználó kártyái
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            base_card_id INTEGER NOT NULL,
+            variant_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'owned',
+            price DECIMAL(10,2) NULL,
+            condition TEXT DEFAULT 'Jó',
+            notes TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (base_card_id) REFERENCES base_cards (id),
+            FOREIGN KEY (variant_id) REFERENCES card_variants (id),
+            UNIQUE(user_id, base_card_id, variant_id)
+        )
+    """)
+
+    # Kívánságlista
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wishlists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            base_card_id INTEGER NOT NULL,
+            variant_id INTEGER NOT NULL,
+            max_price DECIMAL(10,2),
+            priority INTEGER DEFAULT 1,
+            notes TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (base_card_id) REFERENCES base_cards (id),
+            FOREIGN KEY (variant_id) REFERENCES card_variants (id),
+            UNIQUE(user_id, base_card_id, variant_id)
+        )
+    """)
+
+    # Üzenetek
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            receiver_id INTEGER NOT NULL,
+            subject TEXT NOT NULL,
+            content TEXT NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_read BOOLEAN DEFAULT FALSE,
+            parent_message_id INTEGER,
+            related_card_id INTEGER,
+            FOREIGN KEY (sender_id) REFERENCES users (id),
+            FOREIGN KEY (receiver_id) REFERENCES users (id),
+            FOREIGN KEY (parent_message_id) REFERENCES messages (id),
+            FOREIGN KEY (related_card_id) REFERENCES user_cards (id)
+        )
+    """)
+
+    # Aktivitás log
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+def _migration_002_secondary_indexes(cursor):
+    """Másodlagos indexek a database.py és utils.py gyakori lekérdezéseihez"""
+
+    # Olvasatlan üzenetek számolása: receiver_id = ? AND is_read = 0
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_receiver_read
+        ON messages (receiver_id, is_read)
+    """)
+
+    # Aktivitás lista: user_id = ? [AND created_at >= ?] ORDER BY created_at DESC
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_activity_log_user_created
+        ON activity_log (user_id, created_at)
+    """)
+
+    # Kereslet: kívánságlisták kártyánként (matchmaking, népszerű kártyák)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_wishlists_card
+        ON wishlists (base_card_id, variant_id, user_id)
+    """)
+
+    # Kínálat: status IN ('trade', 'sell') kártyánként csoportosítva
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_cards_status_card
+        ON user_cards (status, base_card_id, variant_id)
+    """)
+
+    # Matchmaking join: adott kártya+változat cserélhető/eladó példányai
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_cards_card_status
+        ON user_cards (base_card_id, variant_id, status, user_id)
+    """)
+
+    # Felhasználói statisztikák: user_id = ? AND status = ?
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_cards_user_status
+        ON user_cards (user_id, status)
+    """)
+
+def _migration_003_card_market_stats(cursor):
+    """Kereslet/kínálat aggregátumok kártya+változat szerint, triggerekkel karbantartva"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS card_market_stats (
+            base_card_id INTEGER NOT NULL,
+            variant_id INTEGER NOT NULL,
+            demand_count INTEGER NOT NULL DEFAULT 0,
+            supply_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (base_card_id, variant_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Kereslet: kívánságlista sorok
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_market_insert
+        AFTER INSERT ON wishlists
+        BEGIN
+            INSERT INTO card_market_stats (base_card_id, variant_id, demand_count)
+            VALUES (NEW.base_card_id, NEW.variant_id, 1)
+            ON CONFLICT (base_card_id, variant_id)
+            DO UPDATE SET demand_count = demand_count + 1;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_market_delete
+        AFTER DELETE ON wishlists
+        BEGIN
+            UPDATE card_market_stats SET demand_count = demand_count - 1
+            WHERE base_card_id = OLD.base_card_id AND variant_id = OLD.variant_id;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_market_update
+        AFTER UPDATE OF base_card_id, variant_id ON wishlists
+        WHEN OLD.base_card_id != NEW.base_card_id OR OLD.variant_id != NEW.variant_id
+        BEGIN
+            UPDATE card_market_stats SET demand_count = demand_count - 1
+            WHERE base_card_id = OLD.base_card_id AND variant_id = OLD.variant_id;
+
+            INSERT INTO card_market_stats (base_card_id, variant_id, demand_count)
+            VALUES (NEW.base_card_id, NEW.variant_id, 1)
+            ON CONFLICT (base_card_id, variant_id)
+            DO UPDATE SET demand_count = demand_count + 1;
+        END
+    """)
+
+    # Kínálat: cserére/eladásra kínált példányok
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_market_insert
+        AFTER INSERT ON user_cards
+        WHEN NEW.status IN ('trade', 'sell')
+        BEGIN
+            INSERT INTO card_market_stats (base_card_id, variant_id, supply_count)
+            VALUES (NEW.base_card_id, NEW.variant_id, 1)
+            ON CONFLICT (base_card_id, variant_id)
+            DO UPDATE SET supply_count = supply_count + 1;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_market_delete
+        AFTER DELETE ON user_cards
+        WHEN OLD.status IN ('trade', 'sell')
+        BEGIN
+            UPDATE card_market_stats SET supply_count = supply_count - 1
+            WHERE base_card_id = OLD.base_card_id AND variant_id = OLD.variant_id;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_market_update
+        AFTER UPDATE OF status, base_card_id, variant_id ON user_cards
+        WHEN (OLD.status IN ('trade', 'sell')) != (NEW.status IN ('trade', 'sell'))
+            OR OLD.base_card_id != NEW.base_card_id
+            OR OLD.variant_id != NEW.variant_id
+        BEGIN
+            UPDATE card_market_stats SET supply_count = supply_count - 1
+            WHERE OLD.status IN ('trade', 'sell')
+            AND base_card_id = OLD.base_card_id AND variant_id = OLD.variant_id;
+
+            INSERT INTO card_market_stats (base_card_id, variant_id, supply_count)
+            SELECT NEW.base_card_id, NEW.variant_id, 1
+            WHERE NEW.status IN ('trade', 'sell')
+            ON CONFLICT (base_card_id, variant_id)
+            DO UPDATE SET supply_count = supply_count + 1;
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    cursor.execute("DELETE FROM card_market_stats")
+    cursor.execute("""
+        INSERT INTO card_market_stats (base_card_id, variant_id, demand_count, supply_count)
+        SELECT base_card_id, variant_id, SUM(demand), SUM(supply)
+        FROM (
+            SELECT base_card_id, variant_id, 1 AS demand, 0 AS supply FROM wishlists
+            UNION ALL
+            SELECT base_card_id, variant_id, 0, 1 FROM user_cards
+            WHERE status IN ('trade', 'sell')
+        )
+        GROUP BY base_card_id, variant_id
+    """)
+
+def _migration_004_match_cache(cursor):
+    """Felhasználónkénti matchmaking eredmény cache kulcs alapú érvénytelenítéssel"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_cache (
+            user_id INTEGER PRIMARY KEY,
+            match_limit INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Egy (kártya, változat) kulcs változásakor mindenki cache-e érvénytelen, aki keresi
+    invalidate_wishers = """
+        DELETE FROM match_cache WHERE user_id IN (
+            SELECT user_id FROM wishlists
+            WHERE base_card_id = {row}.base_card_id AND variant_id = {row}.variant_id
+        );
+    """
+
+    # Kívánságlista: saját cache + a kulcs keresőinek cache-e (változik a kereslet)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_match_cache_insert
+        AFTER INSERT ON wishlists
+        BEGIN
+            {invalidate_wishers.format(row="NEW")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_match_cache_delete
+        AFTER DELETE ON wishlists
+        BEGIN
+            DELETE FROM match_cache WHERE user_id = OLD.user_id;
+            {invalidate_wishers.format(row="OLD")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_match_cache_update
+        AFTER UPDATE ON wishlists
+        BEGIN
+            DELETE FROM match_cache WHERE user_id IN (OLD.user_id, NEW.user_id);
+            {invalidate_wishers.format(row="OLD")}
+            {invalidate_wishers.format(row="NEW")}
+        END
+    """)
+
+    # Kártyák: csak a cserére/eladásra kínált példányok jelennek meg matchként
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_match_cache_insert
+        AFTER INSERT ON user_cards
+        WHEN NEW.status IN ('trade', 'sell')
+        BEGIN
+            {invalidate_wishers.format(row="NEW")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_match_cache_delete
+        AFTER DELETE ON user_cards
+        WHEN OLD.status IN ('trade', 'sell')
+        BEGIN
+            {invalidate_wishers.format(row="OLD")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_match_cache_update
+        AFTER UPDATE ON user_cards
+        WHEN OLD.status IN ('trade', 'sell') OR NEW.status IN ('trade', 'sell')
+        BEGIN
+            {invalidate_wishers.format(row="OLD")}
+            {invalidate_wishers.format(row="NEW")}
+        END
+    """)
+
+def _migration_005_trade_cycle_results(cursor):
+    """Többszereplős csere körök (batch számolás eredménye) felhasználónként"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trade_cycle_results (
+            user_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            score REAL NOT NULL,
+            cycle_length INTEGER NOT NULL,
+            cycle TEXT NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, rank),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_006_match_batch(cursor):
+    """Offline matchmaking batch: eredmény forrása, foglalás és futási napló"""
+
+    # source: 'online' (oldalbetöltéskor számolt), 'batch' vagy 'pending' (foglalt helyőrző)
+    cursor.execute("ALTER TABLE match_cache ADD COLUMN source TEXT NOT NULL DEFAULT 'online'")
+    # A batch futás azonosítója, amíg az eredmény el nem készül - az érvénytelenítő
+    # triggerek törlik a sort, így a futás közben elavult eredmény nem íródik vissza
+    cursor.execute("ALTER TABLE match_cache ADD COLUMN batch_run INTEGER")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_batch_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            workers INTEGER NOT NULL,
+            users INTEGER DEFAULT 0,
+            written INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            duration_seconds REAL
+        )
+    """)
+
+# Felhasználói számlálók - a user_counters oszlopai és a forrás táblákból számolt értékük
+USER_COUNTER_COLUMNS = ('total_cards', 'owned_cards', 'trade_cards', 'sell_cards',
+                        'epic_cards', 'series_count', 'wishlist_count')
+
+def _user_card_counter_delta(row, sign):
+    """Trigger utasítások: egy user_cards sor hozzáadása (+1) vagy elvétele (-1) a számlálókból"""
+    # Az új (vagy kiürült) sorozat számít a series_count-ba
+    series_threshold = 1 if sign > 0 else 0
+    statements = f"""
+            INSERT INTO user_series_counts (user_id, series_id, card_count)
+            SELECT {row}.user_id, series_id, {sign} FROM base_cards WHERE id = {row}.base_card_id
+            ON CONFLICT (user_id, series_id) DO UPDATE SET card_count = card_count + excluded.card_count;
+
+            INSERT INTO user_counters (user_id, total_cards, owned_cards, trade_cards, sell_cards,
+                                       epic_cards, series_count)
+            VALUES (
+                {row}.user_id,
+                {sign},
+                {sign} * ({row}.status = 'owned'),
+                {sign} * ({row}.status = 'trade'),
+                {sign} * ({row}.status = 'sell'),
+                {sign} * COALESCE((SELECT name = 'Epic' FROM card_variants WHERE id = {row}.variant_id), 0),
+                {sign} * COALESCE((
+                    SELECT card_count = {series_threshold} FROM user_series_counts
+                    WHERE user_id = {row}.user_id
+                    AND series_id = (SELECT series_id FROM base_cards WHERE id = {row}.base_card_id)
+                ), 0)
+            )
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_cards = total_cards + excluded.total_cards,
+                owned_cards = owned_cards + excluded.owned_cards,
+                trade_cards = trade_cards + excluded.trade_cards,
+                sell_cards = sell_cards + excluded.sell_cards,
+                epic_cards = epic_cards + excluded.epic_cards,
+                series_count = series_count + excluded.series_count;
+    """
+    if sign < 0:
+        statements += f"""
+            DELETE FROM user_series_counts WHERE user_id = {row}.user_id AND card_count <= 0;
+        """
+    return statements
+
+def _wishlist_counter_delta(row, sign):
+    """Trigger utasítás: kívánságlista számláló módosítása"""
+    return f"""
+            INSERT INTO user_counters (user_id, wishlist_count) VALUES ({row}.user_id, {sign})
+            ON CONFLICT (user_id) DO UPDATE SET wishlist_count = wishlist_count + excluded.wishlist_count;
+    """
+
+def rebuild_user_counters(cursor):
+    """Számláló táblák teljes újraszámolása a forrás táblákból (backfill / javítás)"""
+    cursor.execute("DELETE FROM user_series_counts")
+    cursor.execute("""
+        INSERT INTO user_series_counts (user_id, series_id, card_count)
+        SELECT uc.user_id, bc.series_id, COUNT(*)
+        FROM user_cards uc
+        JOIN base_cards bc ON uc.base_card_id = bc.id
+        GROUP BY uc.user_id, bc.series_id
+    """)
+
+    # Csak a számláló oszlopokat írjuk újra (a sor többi oszlopa, pl. last_activity_at, marad)
+    zeroes = ", ".join(f"{column} = 0" for column in USER_COUNTER_COLUMNS)
+    cursor.execute(f"UPDATE user_counters SET {zeroes}")
+    updates = ", ".join(f"{column} = excluded.{column}" for column in USER_COUNTER_COLUMNS)
+    cursor.execute(f"""
+        INSERT INTO user_counters (user_id, total_cards, owned_cards, trade_cards, sell_cards,
+                                   epic_cards, series_count, wishlist_count)
+        SELECT user_id, SUM(total), SUM(owned), SUM(trade), SUM(sell), SUM(epic), SUM(series), SUM(wishes)
+        FROM (
+            SELECT uc.user_id, COUNT(*) AS total,
+                SUM(uc.status = 'owned') AS owned, SUM(uc.status = 'trade') AS trade,
+                SUM(uc.status = 'sell') AS sell, SUM(COALESCE(cv.name = 'Epic', 0)) AS epic,
+                0 AS series, 0 AS wishes
+            FROM user_cards uc
+            LEFT JOIN card_variants cv ON uc.variant_id = cv.id
+            GROUP BY uc.user_id
+            UNION ALL
+            SELECT user_id, 0, 0, 0, 0, 0, COUNT(*), 0 FROM user_series_counts GROUP BY user_id
+            UNION ALL
+            SELECT user_id, 0, 0, 0, 0, 0, 0, COUNT(*) FROM wishlists GROUP BY user_id
+        )
+        WHERE true
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET {updates}
+    """)
+
+def _migration_007_user_counters(cursor):
+    """Felhasználónkénti kártya/kívánság számlálók triggerekkel karbantartva"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_counters (
+            user_id INTEGER PRIMARY KEY,
+            total_cards INTEGER NOT NULL DEFAULT 0,
+            owned_cards INTEGER NOT NULL DEFAULT 0,
+            trade_cards INTEGER NOT NULL DEFAULT 0,
+            sell_cards INTEGER NOT NULL DEFAULT 0,
+            epic_cards INTEGER NOT NULL DEFAULT 0,
+            series_count INTEGER NOT NULL DEFAULT 0,
+            wishlist_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # A series_count (különböző sorozatok) karbantartásához sorozatonkénti darabszám kell
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_series_counts (
+            user_id INTEGER NOT NULL,
+            series_id INTEGER NOT NULL,
+            card_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, series_id)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_counters_insert
+        AFTER INSERT ON user_cards
+        BEGIN
+            {_user_card_counter_delta("NEW", 1)}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_counters_delete
+        AFTER DELETE ON user_cards
+        BEGIN
+            {_user_card_counter_delta("OLD", -1)}
+        END
+    """)
+
+    # Módosításkor a régi sort kivesszük, az újat hozzáadjuk
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_counters_update
+        AFTER UPDATE OF user_id, base_card_id, variant_id, status ON user_cards
+        BEGIN
+            {_user_card_counter_delta("OLD", -1)}
+            {_user_card_counter_delta("NEW", 1)}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_counters_insert
+        AFTER INSERT ON wishlists
+        BEGIN
+            {_wishlist_counter_delta("NEW", 1)}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_counters_delete
+        AFTER DELETE ON wishlists
+        BEGIN
+            {_wishlist_counter_delta("OLD", -1)}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_wishlists_counters_update
+        AFTER UPDATE OF user_id ON wishlists
+        WHEN OLD.user_id != NEW.user_id
+        BEGIN
+            {_wishlist_counter_delta("OLD", -1)}
+            {_wishlist_counter_delta("NEW", 1)}
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    rebuild_user_counters(cursor)
+
+def _migration_008_series_bitmaps(cursor):
+    """Sorozat teljesítettség bitképek felhasználónként (a database.py írja karban)"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_series_bitmaps (
+            user_id INTEGER NOT NULL,
+            series_id INTEGER NOT NULL,
+            bitmap BLOB NOT NULL,
+            PRIMARY KEY (user_id, series_id)
+        ) WITHOUT ROWID
+    """)
+
+    # A meglévő adatokat a 19-es migráció tölti be (az már a szavas tárolást használja)
+
+def _migration_009_popularity_index(cursor):
+    """Top-K népszerűség index a kereslet/kínálat aggregátumokon"""
+
+    # "Legkeresettebb kártyák" = index elejének beolvasása, rendezés és csoportosítás nélkül
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_card_market_stats_popularity
+        ON card_market_stats(demand_count DESC, supply_count)
+    """)
+
+def _migration_010_system_stats_snapshot(cursor):
+    """Rendszer statisztika pillanatképek (háttérfrissítés + előzmények)"""
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS system_stats_snapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_users INTEGER NOT NULL,
+            total_series INTEGER NOT NULL,
+            total_base_cards INTEGER NOT NULL,
+            total_user_cards INTEGER NOT NULL,
+            total_messages INTEGER NOT NULL,
+            activity_week INTEGER NOT NULL,
+            popular_series TEXT,
+            duration_ms REAL
+        )
+    """)
+
+    # Előzmények törlése / trend lekérdezés időszakra
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_system_stats_snapshot_taken
+        ON system_stats_snapshot(taken_at)
+    """)
+
+def _migration_011_base_cards_fts(cursor):
+    """FTS5 teljes szöveges index a katalógusra (játékos, csapat, pozíció, sorozat név)"""
+
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS base_cards_fts USING fts5(
+                player_name, team, position, series_name, series_id UNINDEXED,
+                tokenize = "unicode61 remove_diacritics 2"
+            )
+        """)
+    except sqlite3.OperationalError:
+        # FTS5 nélküli SQLite build - a keresés LIKE alapon működik tovább
+        return
+
+    # A rowid megegyezik a base_cards.id-vel
+    insert_row = """
+        INSERT INTO base_cards_fts (rowid, player_name, team, position, series_name, series_id)
+        SELECT NEW.id, NEW.player_name, COALESCE(NEW.team, ''), COALESCE(NEW.position, ''),
+               COALESCE((SELECT name FROM series WHERE id = NEW.series_id), ''), NEW.series_id;
+    """
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_fts_insert
+        AFTER INSERT ON base_cards
+        BEGIN
+            {insert_row}
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_fts_delete
+        AFTER DELETE ON base_cards
+        BEGIN
+            DELETE FROM base_cards_fts WHERE rowid = OLD.id;
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_fts_update
+        AFTER UPDATE OF player_name, team, position, series_id ON base_cards
+        BEGIN
+            DELETE FROM base_cards_fts WHERE rowid = OLD.id;
+            {insert_row}
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_series_fts_update
+        AFTER UPDATE OF name ON series
+        BEGIN
+            UPDATE base_cards_fts SET series_name = NEW.name
+            WHERE rowid IN (SELECT id FROM base_cards WHERE series_id = NEW.id);
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    cursor.execute("DELETE FROM base_cards_fts")
+    cursor.execute("""
+        INSERT INTO base_cards_fts (rowid, player_name, team, position, series_name, series_id)
+        SELECT bc.id, bc.player_name, COALESCE(bc.team, ''), COALESCE(bc.position, ''),
+               COALESCE(s.name, ''), bc.series_id
+        FROM base_cards bc
+        LEFT JOIN series s ON bc.series_id = s.id
+    """)
+
+def _migration_012_player_name_trigrams(cursor):
+    """Ékezet-független trigram index a játékos nevekre (a text_search.py írja karban)"""
+
+    # Különböző normalizált nevek (ékezet nélkül, casefold) + trigram szám
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_names (
+            id INTEGER PRIMARY KEY,
+            normalized TEXT UNIQUE NOT NULL,
+            trigram_count INTEGER NOT NULL
+        )
+    """)
+
+    # Posting listák: trigram -> nevek (a PK a keresés indexe)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_name_trigrams (
+            trigram TEXT NOT NULL,
+            name_id INTEGER NOT NULL,
+            PRIMARY KEY (trigram, name_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Trigram gyakoriság - a keresés a legritkább trigramokkal kezd
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trigram_frequency (
+            trigram TEXT PRIMARY KEY,
+            name_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    # Alapkártya -> normalizált név
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS base_card_names (
+            base_card_id INTEGER PRIMARY KEY,
+            name_id INTEGER NOT NULL
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_base_card_names_name
+        ON base_card_names(name_id, base_card_id)
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_base_card_names_delete
+        AFTER DELETE ON base_cards
+        BEGIN
+            DELETE FROM base_card_names WHERE base_card_id = OLD.id;
+        END
+    """)
+
+    # Meglévő adatok betöltése (a normalizálás Pythonban fut)
+    rebuild_trigram_index(cursor)
+
+# Utolsó aktivitás forrásai: (tábla, felhasználó oszlop, időbélyeg oszlop)
+LAST_ACTIVITY_SOURCES = (
+    ('user_cards', 'user_id', 'added_at'),
+    ('wishlists', 'user_id', 'added_at'),
+    ('messages', 'sender_id', 'sent_at'),
+    ('activity_log', 'user_id', 'created_at'),
+)
+
+def rebuild_last_activity(cursor):
+    """user_counters.last_activity_at újraszámolása a forrás táblákból"""
+    sources = " UNION ALL ".join(
+        f"SELECT {user_column} AS user_id, MAX({time_column}) AS at FROM {table} GROUP BY {user_column}"
+        for table, user_column, time_column in LAST_ACTIVITY_SOURCES
+    )
+    cursor.execute("UPDATE user_counters SET last_activity_at = NULL")
+    cursor.execute(f"""
+        INSERT INTO user_counters (user_id, last_activity_at)
+        SELECT user_id, MAX(at) FROM ({sources})
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET last_activity_at = excluded.last_activity_at
+    """)
+
+def _migration_013_user_directory(cursor):
+    """Felhasználó kereső: kis/nagybetű független név index + utolsó aktivitás"""
+
+    # Prefix keresés tartomány lekérdezéssel (username >= ? AND username < ?, NOCASE)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_username_nocase
+        ON users(username COLLATE NOCASE)
+    """)
+
+    cursor.execute("ALTER TABLE user_counters ADD COLUMN last_activity_at TIMESTAMP")
+
+    for table, user_column, time_column in LAST_ACTIVITY_SOURCES:
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_last_activity
+            AFTER INSERT ON {table}
+            WHEN NEW.{user_column} IS NOT NULL
+            BEGIN
+                INSERT INTO user_counters (user_id, last_activity_at)
+                VALUES (NEW.{user_column}, COALESCE(NEW.{time_column}, CURRENT_TIMESTAMP))
+                ON CONFLICT (user_id) DO UPDATE SET
+                    last_activity_at = MAX(COALESCE(last_activity_at, ''), excluded.last_activity_at);
+            END
+        """)
+
+    # Meglévő adatok betöltése
+    rebuild_last_activity(cursor)
+
+def _migration_014_messages_fts(cursor):
+    """FTS5 index az üzenetek tárgyára és tartalmára (résztvevők szerint szűrhetően)"""
+
+    # A participants oszlop ("u<küldő> u<címzett>") teszi lehetővé, hogy a felhasználó
+    # saját üzeneteire szűrést maga az FTS index végezze; a szöveget a nézet adja
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                subject, content, participants,
+                content = 'messages_fts_source', content_rowid = 'id',
+                tokenize = "unicode61 remove_diacritics 2"
+            )
+        """)
+    except sqlite3.OperationalError:
+        # FTS5 nélküli SQLite build - a keresés LIKE alapon működik tovább
+        return
+
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS messages_fts_source AS
+        SELECT id, subject, content, 'u' || sender_id || ' u' || receiver_id AS participants
+        FROM messages
+    """)
+
+    def fts_row(row):
+        return f"{row}.id, {row}.subject, {row}.content, 'u' || {row}.sender_id || ' u' || {row}.receiver_id"
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert
+        AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts (rowid, subject, content, participants) VALUES ({fts_row("NEW")});
+        END
+    """)
+
+    # Külső tartalmú indexből a régi értékekkel kell törölni
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete
+        AFTER DELETE ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, subject, content, participants)
+            VALUES ('delete', {fts_row("OLD")});
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update
+        AFTER UPDATE OF subject, content, sender_id, receiver_id ON messages
+        BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, subject, content, participants)
+            VALUES ('delete', {fts_row("OLD")});
+            INSERT INTO messages_fts (rowid, subject, content, participants) VALUES ({fts_row("NEW")});
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+def _migration_015_messaging(cursor):
+    """Üzenetkezelés: oldalankénti (soft) törlés + postafiók indexek a lapozáshoz"""
+
+    # Mindkét fél a saját postafiókjából töröl - a másik félnél megmarad
+    cursor.execute("ALTER TABLE messages ADD COLUMN deleted_by_sender BOOLEAN NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE messages ADD COLUMN deleted_by_receiver BOOLEAN NOT NULL DEFAULT 0")
+
+    # Beérkezett / elküldött lista: egyenlőség a fiókra, rendezés (sent_at, id) szerint
+    # az indexből, keyset lapozás rendezés nélkül
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_inbox
+        ON messages(receiver_id, deleted_by_receiver, sent_at)
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_outbox
+        ON messages(sender_id, deleted_by_sender, sent_at)
+    """)
+
+    # Válaszok száma / szál bejárás
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_parent
+        ON messages(parent_message_id)
+    """)
+
+def _migration_016_message_threads(cursor):
+    """Denormalizált szál azonosító (a gyökér üzenet id-je) a szálak egy lépéses betöltéséhez"""
+
+    cursor.execute("ALTER TABLE messages ADD COLUMN thread_id INTEGER")
+
+    # Válasz a szülő szálát örökli, új üzenet saját szálat nyit
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_thread_id
+        AFTER INSERT ON messages
+        WHEN NEW.thread_id IS NULL
+        BEGIN
+            UPDATE messages SET thread_id = COALESCE(
+                (SELECT thread_id FROM messages WHERE id = NEW.parent_message_id), NEW.id
+            )
+            WHERE id = NEW.id;
+        END
+    """)
+
+    # Meglévő adatok betöltése: gyökértől lefelé bejárva (ideiglenes táblán át, hogy a
+    # rekurzió egyszer fusson); hiányzó szülő esetén az üzenet maga a gyökér
+    cursor.execute("""
+        CREATE TEMP TABLE thread_roots AS
+        WITH RECURSIVE roots(id, root_id) AS (
+            SELECT id, id FROM messages
+            WHERE parent_message_id IS NULL
+            OR parent_message_id NOT IN (SELECT id FROM messages)
+            UNION ALL
+            SELECT m.id, r.root_id FROM messages m JOIN roots r ON m.parent_message_id = r.id
+        )
+        SELECT id, root_id FROM roots
+    """)
+    cursor.execute("CREATE UNIQUE INDEX temp.idx_thread_roots_id ON thread_roots(id)")
+    cursor.execute("""
+        UPDATE messages SET thread_id = COALESCE(
+            (SELECT root_id FROM thread_roots WHERE thread_roots.id = messages.id), id
+        )
+    """)
+    cursor.execute("DROP TABLE thread_roots")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_thread
+        ON messages(thread_id, sent_at)
+    """)
+
+# Egy üzenet akkor számít olvasatlannak, ha a címzett még nem olvasta és nem törölte
+# (IS 0: NULL esetén is 0/1 az eredmény, így a számláló sosem lesz NULL)
+_UNREAD_CONDITION = "({row}.is_read IS 0 AND {row}.deleted_by_receiver IS 0)"
+
+def _unread_counter_delta(row, sign):
+    """Trigger utasítás: a címzett olvasatlan számlálójának módosítása a sor hozzájárulásával"""
+    return f"""
+            INSERT INTO user_counters (user_id, unread_messages)
+            VALUES ({row}.receiver_id, {sign} * {_UNREAD_CONDITION.format(row=row)})
+            ON CONFLICT (user_id) DO UPDATE SET unread_messages = unread_messages + excluded.unread_messages;
+    """
+
+def rebuild_unread_counters(cursor):
+    """user_counters.unread_messages újraszámolása a messages táblából"""
+    cursor.execute("UPDATE user_counters SET unread_messages = 0")
+    cursor.execute(f"""
+        INSERT INTO user_counters (user_id, unread_messages)
+        SELECT receiver_id, COUNT(*) FROM messages m
+        WHERE {_UNREAD_CONDITION.format(row="m")}
+        GROUP BY receiver_id
+        ON CONFLICT (user_id) DO UPDATE SET unread_messages = excluded.unread_messages
+    """)
+
+def _migration_017_unread_counters(cursor):
+    """Olvasatlan üzenetek számlálója triggerekkel karbantartva (COUNT(*) helyett)"""
+
+    cursor.execute("ALTER TABLE user_counters ADD COLUMN unread_messages INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_unread_insert
+        AFTER INSERT ON messages
+        WHEN {_UNREAD_CONDITION.format(row="NEW")}
+        BEGIN
+            {_unread_counter_delta("NEW", 1)}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_unread_delete
+        AFTER DELETE ON messages
+        WHEN {_UNREAD_CONDITION.format(row="OLD")}
+        BEGIN
+            {_unread_counter_delta("OLD", -1)}
+        END
+    """)
+
+    # Olvasás, címzett oldali törlés (vagy címzett csere): a régi hozzájárulást
+    # kivesszük, az újat hozzáadjuk
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_unread_update
+        AFTER UPDATE OF is_read, deleted_by_receiver, receiver_id ON messages
+        WHEN {_UNREAD_CONDITION.format(row="OLD")} != {_UNREAD_CONDITION.format(row="NEW")}
+        OR OLD.receiver_id != NEW.receiver_id
+        BEGIN
+            {_unread_counter_delta("OLD", -1)}
+            {_unread_counter_delta("NEW", 1)}
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    rebuild_unread_counters(cursor)
+
+def _visible_pair_messages(user, partner):
+    """SQL: a user és a partner közötti, a user oldalán nem törölt üzenetek (id, sent_at, unread)"""
+    return f"""
+        SELECT id, sent_at, 0 AS unread FROM messages
+        WHERE sender_id = {user} AND receiver_id = {partner} AND deleted_by_sender IS 0
+        UNION ALL
+        SELECT id, sent_at, is_read IS 0 FROM messages
+        WHERE sender_id = {partner} AND receiver_id = {user} AND deleted_by_receiver IS 0
+    """
+
+def _conversation_refresh(user, partner):
+    """Trigger utasítások: egy beszélgetés sor újraszámolása (üres beszélgetés sora törlődik)"""
+    return f"""
+            DELETE FROM conversations WHERE user_id = {user} AND partner_id = {partner};
+            INSERT INTO conversations (user_id, partner_id, last_message_at, last_message_id,
+                                       message_count, unread_count)
+            SELECT {user}, {partner}, last.sent_at, last.id, totals.message_count, totals.unread_count
+            FROM (
+                SELECT id, sent_at FROM ({_visible_pair_messages(user, partner)})
+                ORDER BY sent_at DESC, id DESC LIMIT 1
+            ) AS last, (
+                SELECT COUNT(*) AS message_count, SUM(unread) AS unread_count
+                FROM ({_visible_pair_messages(user, partner)})
+            ) AS totals;
+    """
+
+def _conversation_append(user, partner, unread):
+    """Trigger utasítás: új üzenet hozzáadása a user oldali beszélgetés sorhoz"""
+    return f"""
+            INSERT INTO conversations (user_id, partner_id, last_message_at, last_message_id,
+                                       message_count, unread_count)
+            VALUES ({user}, {partner}, NEW.sent_at, NEW.id, 1, {unread})
+            ON CONFLICT (user_id, partner_id) DO UPDATE SET
+                last_message_at = CASE
+                    WHEN (excluded.last_message_at, excluded.last_message_id) > (last_message_at, last_message_id)
+                    THEN excluded.last_message_at ELSE last_message_at END,
+                last_message_id = CASE
+                    WHEN (excluded.last_message_at, excluded.last_message_id) > (last_message_at, last_message_id)
+                    THEN excluded.last_message_id ELSE last_message_id END,
+                message_count = message_count + 1,
+                unread_count = unread_count + excluded.unread_count;
+    """
+
+# Beszélgetés sorok a messages táblából: mindkét fél saját sort kap (a saját oldalán látható üzenetekkel)
+CONVERSATION_ROWS_SQL = """
+    SELECT user_id, partner_id, sent_at, id, message_count, unread_count
+    FROM (
+        SELECT user_id, partner_id, sent_at, id,
+               COUNT(*) OVER pair AS message_count, SUM(unread) OVER pair AS unread_count,
+               ROW_NUMBER() OVER (PARTITION BY user_id, partner_id ORDER BY sent_at DESC, id DESC) AS position
+        FROM (
+            SELECT sender_id AS user_id, receiver_id AS partner_id, sent_at, id, 0 AS unread
+            FROM messages WHERE deleted_by_sender IS 0
+            UNION ALL
+            SELECT receiver_id, sender_id, sent_at, id, is_read IS 0
+            FROM messages WHERE deleted_by_receiver IS 0
+        )
+        WINDOW pair AS (PARTITION BY user_id, partner_id)
+    )
+    WHERE position = 1
+"""
+
+def rebuild_conversations(cursor):
+    """conversations tábla teljes újraépítése a messages táblából"""
+    cursor.execute("DELETE FROM conversations")
+    cursor.execute(f"""
+        INSERT INTO conversations (user_id, partner_id, last_message_at, last_message_id,
+                                   message_count, unread_count)
+        {CONVERSATION_ROWS_SQL}
+    """)
+
+def _migration_018_conversations(cursor):
+    """Beszélgetés összesítők (partnerenként utolsó üzenet, darabszám, olvasatlan) triggerekkel"""
+
+    # Felhasználónként egy sor partnerenként - a partner lista egy index tartomány
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            user_id INTEGER NOT NULL,
+            partner_id INTEGER NOT NULL,
+            last_message_at TIMESTAMP,
+            last_message_id INTEGER NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, partner_id)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_recent
+        ON conversations(user_id, last_message_at, last_message_id)
+    """)
+
+    # Egy beszélgetés újraszámolásához (törlés után) csak a pár üzeneteit olvassuk
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_pair
+        ON messages(sender_id, receiver_id)
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_conversations_insert
+        AFTER INSERT ON messages
+        BEGIN
+            {_conversation_append("NEW.sender_id", "NEW.receiver_id", 0)}
+            {_conversation_append("NEW.receiver_id", "NEW.sender_id", "(NEW.is_read IS 0)")}
+        END
+    """)
+
+    # Olvasás: csak a címzett oldali olvasatlan szám változik
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_conversations_read
+        AFTER UPDATE OF is_read ON messages
+        WHEN OLD.deleted_by_receiver IS 0 AND NEW.deleted_by_receiver IS 0
+        AND (OLD.is_read IS 0) != (NEW.is_read IS 0)
+        BEGIN
+            UPDATE conversations SET unread_count = unread_count + (NEW.is_read IS 0) - (OLD.is_read IS 0)
+            WHERE user_id = NEW.receiver_id AND partner_id = NEW.sender_id;
+        END
+    """)
+
+    # Törlés (soft vagy valódi) után az utolsó üzenet is változhat - a párt újraszámoljuk
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_conversations_update
+        AFTER UPDATE OF deleted_by_sender, deleted_by_receiver, sent_at, sender_id, receiver_id ON messages
+        WHEN OLD.deleted_by_sender IS NOT NEW.deleted_by_sender
+        OR OLD.deleted_by_receiver IS NOT NEW.deleted_by_receiver
+        OR OLD.sent_at IS NOT NEW.sent_at
+        OR OLD.sender_id != NEW.sender_id OR OLD.receiver_id != NEW.receiver_id
+        BEGIN
+            {_conversation_refresh("OLD.sender_id", "OLD.receiver_id")}
+            {_conversation_refresh("OLD.receiver_id", "OLD.sender_id")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_conversations_move
+        AFTER UPDATE OF sender_id, receiver_id ON messages
+        WHEN OLD.sender_id != NEW.sender_id OR OLD.receiver_id != NEW.receiver_id
+        BEGIN
+            {_conversation_refresh("NEW.sender_id", "NEW.receiver_id")}
+            {_conversation_refresh("NEW.receiver_id", "NEW.sender_id")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_conversations_delete
+        AFTER DELETE ON messages
+        BEGIN
+            {_conversation_refresh("OLD.sender_id", "OLD.receiver_id")}
+            {_conversation_refresh("OLD.receiver_id", "OLD.sender_id")}
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    rebuild_conversations(cursor)
+
+def _row_positions(row):
+    """SQL: egy user_cards sor (NEW / OLD) bit pozíciója"""
+    return f"""
+        SELECT {row}.user_id AS user_id, bc.series_id AS series_id,
+               (bc.card_number - 1) * {VARIANT_SLOTS} + cv.bitmap_slot AS pos
+        FROM base_cards bc, card_variants cv
+        WHERE bc.id = {row}.base_card_id AND cv.id = {row}.variant_id
+    """
+
+def _card_owner_positions(card):
+    """SQL: egy alapkártya (NEW / OLD értékekkel) összes tulajdonosának bit pozíciói"""
+    return f"""
+        SELECT uc.user_id AS user_id, {card}.series_id AS series_id,
+               ({card}.card_number - 1) * {VARIANT_SLOTS} + cv.bitmap_slot AS pos
+        FROM user_cards uc JOIN card_variants cv ON cv.id = uc.variant_id
+        WHERE uc.base_card_id = {card}.id
+    """
+
+def _bitmap_set(positions):
+    """Trigger utasítás: a pozíciók bitjeinek beállítása (szavanként összevonva)"""
+    return f"""
+            INSERT INTO user_series_bitmaps (user_id, series_id, word, bits)
+            SELECT user_id, series_id, pos / {WORD_BITS}, SUM(1 << (pos % {WORD_BITS}))
+            FROM ({positions})
+            WHERE true
+            GROUP BY user_id, series_id, pos / {WORD_BITS}
+            ON CONFLICT (user_id, series_id, word) DO UPDATE SET bits = bits | excluded.bits;
+    """
+
+def _bitmap_clear(positions):
+    """Trigger utasítások: a pozíciók bitjeinek törlése, a kiürült szavak eltávolítása"""
+    return f"""
+            UPDATE user_series_bitmaps SET bits = bits & ~(
+                SELECT SUM(1 << (p.pos % {WORD_BITS})) FROM ({positions}) AS p
+                WHERE p.user_id = user_series_bitmaps.user_id
+                AND p.series_id = user_series_bitmaps.series_id
+                AND p.pos / {WORD_BITS} = user_series_bitmaps.word
+            )
+            WHERE (user_id, series_id, word) IN (
+                SELECT user_id, series_id, pos / {WORD_BITS} FROM ({positions})
+            );
+            DELETE FROM user_series_bitmaps
+            WHERE bits = 0 AND (user_id, series_id, word) IN (
+                SELECT user_id, series_id, pos / {WORD_BITS} FROM ({positions})
+            );
+    """
+
+def _migration_019_bitmap_triggers(cursor):
+    """Sorozat bitképek: stabil változat helyek + szavas tárolás triggerekkel karbantartva"""
+
+    # Változatonként saját, stabil bit hely (a ritkasági szint nem egyedi és nem korlátos)
+    cursor.execute(f"""
+        ALTER TABLE card_variants ADD COLUMN bitmap_slot INTEGER
+        CHECK (bitmap_slot BETWEEN 0 AND {VARIANT_SLOTS - 1})
+    """)
+    cursor.execute("""
+        UPDATE card_variants SET bitmap_slot = (
+            SELECT COUNT(*) FROM card_variants v
+            WHERE (v.rarity_level, v.id) < (card_variants.rarity_level, card_variants.id)
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_card_variants_bitmap_slot
+        ON card_variants(bitmap_slot)
+    """)
+
+    # Több változat nem fér a bitképbe - a beszúrás elbukik, nem csúszik át a következő kártyára
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_card_variants_slot_limit
+        BEFORE INSERT ON card_variants
+        WHEN (SELECT COUNT(*) FROM card_variants) >= {VARIANT_SLOTS}
+        BEGIN
+            SELECT RAISE(ABORT, 'card_variants: legfeljebb {VARIANT_SLOTS} változat fér a bitképbe');
+        END
+    """)
+
+    # Új változat a legkisebb szabad helyet kapja
+    free_slots = " UNION ALL ".join(f"SELECT {slot} AS slot" for slot in range(VARIANT_SLOTS))
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_card_variants_slot_assign
+        AFTER INSERT ON card_variants
+        WHEN NEW.bitmap_slot IS NULL
+        BEGIN
+            UPDATE card_variants SET bitmap_slot = (
+                SELECT MIN(slot) FROM ({free_slots})
+                WHERE slot NOT IN (SELECT bitmap_slot FROM card_variants WHERE bitmap_slot IS NOT NULL)
+            )
+            WHERE id = NEW.id;
+        END
+    """)
+
+    # A hely a meglévő bitek jelentése - utólag nem változhat
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_card_variants_slot_fixed
+        BEFORE UPDATE OF bitmap_slot ON card_variants
+        WHEN OLD.bitmap_slot IS NOT NULL AND NEW.bitmap_slot IS NOT OLD.bitmap_slot
+        BEGIN
+            SELECT RAISE(ABORT, 'card_variants.bitmap_slot nem módosítható');
+        END
+    """)
+
+    # BLOB helyett WORD_BITS bites szavak - ezeket SQL-ben is lehet bitenként írni
+    cursor.execute("DROP TABLE IF EXISTS user_series_bitmaps")
+    cursor.execute("""
+        CREATE TABLE user_series_bitmaps (
+            user_id INTEGER NOT NULL,
+            series_id INTEGER NOT NULL,
+            word INTEGER NOT NULL,
+            bits INTEGER NOT NULL,
+            PRIMARY KEY (user_id, series_id, word)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_bitmap_insert
+        AFTER INSERT ON user_cards
+        BEGIN
+            {_bitmap_set(_row_positions("NEW"))}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_bitmap_delete
+        AFTER DELETE ON user_cards
+        BEGIN
+            {_bitmap_clear(_row_positions("OLD"))}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_cards_bitmap_update
+        AFTER UPDATE OF user_id, base_card_id, variant_id ON user_cards
+        WHEN OLD.user_id != NEW.user_id OR OLD.base_card_id != NEW.base_card_id
+        OR OLD.variant_id != NEW.variant_id
+        BEGIN
+            {_bitmap_clear(_row_positions("OLD"))}
+            {_bitmap_set(_row_positions("NEW"))}
+        END
+    """)
+
+    # Katalógus módosítás (kártyaszám / sorozat) - a kártya összes tulajdonosánál áthelyezzük a bitet
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_bitmap_update
+        AFTER UPDATE OF card_number, series_id ON base_cards
+        WHEN OLD.card_number != NEW.card_number OR OLD.series_id != NEW.series_id
+        BEGIN
+            {_bitmap_clear(_card_owner_positions("OLD"))}
+            {_bitmap_set(_card_owner_positions("NEW"))}
+        END
+    """)
+
+    # Meglévő adatok betöltése
+    rebuild_series_bitmaps(cursor)
+
+def _orphan_name_cleanup(name_id):
+    """Trigger utasítások: a már egy kártyához sem tartozó név és trigramjai törlése"""
+    return f"""
+            UPDATE trigram_frequency SET name_count = name_count - 1
+            WHERE trigram IN (SELECT trigram FROM player_name_trigrams WHERE name_id = {name_id});
+            DELETE FROM trigram_frequency
+            WHERE name_count <= 0
+            AND trigram IN (SELECT trigram FROM player_name_trigrams WHERE name_id = {name_id});
+            DELETE FROM player_name_trigrams WHERE name_id = {name_id};
+            DELETE FROM player_names WHERE id = {name_id};
+    """
+
+def _migration_020_trigram_index_triggers(cursor):
+    """Trigram index: árva nevek takarítása és átnevezés kezelése triggerekkel"""
+
+    # Név -> posting sorok (árva név törlésekor a trigramjait innen keressük)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_player_name_trigrams_name
+        ON player_name_trigrams(name_id)
+    """)
+
+    # Az utolsó hivatkozás megszűnésekor a név, a postingjai és a gyakoriságok is mennek
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_card_names_orphan_delete
+        AFTER DELETE ON base_card_names
+        WHEN NOT EXISTS (SELECT 1 FROM base_card_names WHERE name_id = OLD.name_id)
+        BEGIN
+            {_orphan_name_cleanup("OLD.name_id")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_card_names_orphan_update
+        AFTER UPDATE OF name_id ON base_card_names
+        WHEN OLD.name_id != NEW.name_id
+        AND NOT EXISTS (SELECT 1 FROM base_card_names WHERE name_id = OLD.name_id)
+        BEGIN
+            {_orphan_name_cleanup("OLD.name_id")}
+        END
+    """)
+
+    # Átnevezéskor a régi név hivatkozása megszűnik (a normalizálás Pythonban fut:
+    # az új nevet az index_base_card veszi fel, addig a kártya régi néven sem talál)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_name_update
+        AFTER UPDATE OF player_name ON base_cards
+        WHEN OLD.player_name IS NOT NEW.player_name
+        BEGIN
+            DELETE FROM base_card_names WHERE base_card_id = NEW.id;
+        END
+    """)
+
+    # Korábbi átnevezések / törlések maradványai
+    rebuild_trigram_index(cursor)
+
+def _catalog_version_bump(series_id, condition="true"):
+    """Trigger utasítás: a sorozat katalógus verziójának növelése (ha a feltétel teljesül)"""
+    return f"""
+            INSERT INTO catalog_versions (series_id, version) SELECT {series_id}, 1 WHERE {condition}
+            ON CONFLICT (series_id) DO UPDATE SET version = version + 1;
+    """
+
+def _migration_021_catalog_versions(cursor):
+    """Sorozatonkénti katalógus verzió - a folyamat szintű gyorsítótárak frissességéhez"""
+
+    # Bármely base_cards írás (bármelyik folyamatból) növeli az érintett sorozat verzióját
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            series_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_version_insert
+        AFTER INSERT ON base_cards
+        BEGIN
+            {_catalog_version_bump("NEW.series_id")}
+        END
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_version_delete
+        AFTER DELETE ON base_cards
+        BEGIN
+            {_catalog_version_bump("OLD.series_id")}
+        END
+    """)
+
+    # Sorozatváltáskor mindkét sorozat változik
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_base_cards_version_update
+        AFTER UPDATE ON base_cards
+        BEGIN
+            {_catalog_version_bump("NEW.series_id")}
+            {_catalog_version_bump("OLD.series_id", "OLD.series_id IS NOT NEW.series_id")}
+        END
+    """)
+
+# (verzió, leírás, függvény) - csak a lista végére szabad újat felvenni!
+MIGRATIONS = [
+    (1, "Alap séma", _migration_001_initial_schema),
+    (2, "Másodlagos indexek", _migration_002_secondary_indexes),
+    (3, "Kereslet/kínálat aggregátumok", _migration_003_card_market_stats),
+    (4, "Matchmaking cache", _migration_004_match_cache),
+    (5, "Csere körök", _migration_005_trade_cycle_results),
+    (6, "Matchmaking batch", _migration_006_match_batch),
+    (7, "Felhasználói számlálók", _migration_007_user_counters),
+    (8, "Sorozat bitképek", _migration_008_series_bitmaps),
+    (9, "Népszerűség index", _migration_009_popularity_index),
+    (10, "Rendszer statisztika pillanatképek", _migration_010_system_stats_snapshot),
+    (11, "Katalógus teljes szöveges keresés", _migration_011_base_cards_fts),
+    (12, "Játékos név trigram index", _migration_012_player_name_trigrams),
+    (13, "Felhasználó kereső", _migration_013_user_directory),
+    (14, "Üzenetek teljes szöveges keresés", _migration_014_messages_fts),
+    (15, "Üzenetkezelés", _migration_015_messaging),
+    (16, "Üzenet szálak", _migration_016_message_threads),
+    (17, "Olvasatlan üzenet számlálók", _migration_017_unread_counters),
+    (18, "Beszélgetés összesítők", _migration_018_conversations),
+    (19, "Bitkép triggerek", _migration_019_bitmap_triggers),
+    (20, "Trigram index triggerek", _migration_020_trigram_index_triggers),
+    (21, "Katalógus verziók", _migration_021_catalog_versions),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# =================== FUTTATÓ ===================
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def get_schema_version(conn):
+    """Aktuális séma verzió (0, ha még nem futott migráció)"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+def run_migrations(conn):
+    """Függőben lévő migrációk lefuttatása sorrendben.
+
+    Minden migráció saját tranzakcióban fut (BEGIN IMMEDIATE), így párhuzamosan
+    induló folyamatok közül csak az egyik alkalmazza. Ismételt hívás no-op.
+    Visszatérés: az alkalmazott verziók listája.
+    """
+    _ensure_version_table(conn)
+    conn.commit()
+
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Zárolás után újra ellenőrizzük - közben egy másik folyamat már lefuttathatta
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+
+            migration(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            applied.append(version)
+        except:
+            conn.rollback()
+            raise
+
+    return applied
+
+# =================== INDEXHASZNÁLAT ELLENŐRZÉS ===================
+
+# (név, SQL, paraméterek) - a database.py / utils.py gyakori lekérdezései
+HOT_QUERIES = [
+    ("unread_message_count",
+     "SELECT unread_messages FROM user_counters WHERE user_id = ?",
+     (1,)),
+    ("mark_all_read",
+     "SELECT id FROM messages WHERE receiver_id = ? AND NOT is_read",
+     (1,)),
+    ("recent_activity",
+     """SELECT action, description, created_at FROM activity_log
+        WHERE user_id = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 10""",
+     (1, "2000-01-01")),
+    ("user_activity",
+     """SELECT action, description, created_at FROM activity_log
+        WHERE user_id = ? ORDER BY created_at DESC LIMIT ?""",
+     (1, 10)),
+    ("card_demand",
+     "SELECT COUNT(*) FROM wishlists WHERE base_card_id = ? AND variant_id = ?",
+     (1, 1)),
+    ("card_supply",
+     """SELECT COUNT(*) FROM user_cards
+        WHERE base_card_id = ? AND variant_id = ? AND status IN ('trade', 'sell')""",
+     (1, 1)),
+    ("supply_by_status",
+     """SELECT base_card_id, variant_id, COUNT(*) FROM user_cards
+        WHERE status IN ('trade', 'sell') GROUP BY base_card_id, variant_id""",
+     ()),
+    ("user_status_count",
+     "SELECT COUNT(*) FROM user_cards WHERE user_id = ? AND status = ?",
+     (1, "trade")),
+    ("user_wishlist",
+     "SELECT base_card_id, variant_id, priority, max_price FROM wishlists WHERE user_id = ?",
+     (1,)),
+    ("duplicate_card_check",
+     """SELECT COUNT(*) FROM user_cards
+        WHERE user_id = ? AND base_card_id = ? AND variant_id = ?""",
+     (1, 1, 1)),
+    ("match_candidates",
+     """SELECT uc.id FROM wishlists w
+        JOIN user_cards uc ON uc.base_card_id = w.base_card_id
+            AND uc.variant_id = w.variant_id
+        WHERE w.user_id = ? AND uc.user_id != ? AND uc.status IN ('trade', 'sell')""",
+     (1, 1)),
+    ("card_market_stats",
+     """SELECT demand_count, supply_count FROM card_market_stats
+        WHERE base_card_id = ? AND variant_id = ?""",
+     (1, 1)),
+    ("reverse_match_candidates",
+     """SELECT uc.id, w.user_id FROM user_cards uc
+        JOIN wishlists w ON w.base_card_id = uc.base_card_id
+            AND w.variant_id = uc.variant_id
+        WHERE uc.user_id = ? AND uc.status IN ('trade', 'sell') AND w.user_id != uc.user_id""",
+     (1,)),
+    ("user_counters",
+     "SELECT * FROM user_counters WHERE user_id = ?",
+     (1,)),
+    ("popular_cards",
+     """SELECT ms.base_card_id, ms.variant_id, ms.demand_count, ms.supply_count
+        FROM card_market_stats ms
+        JOIN base_cards bc ON ms.base_card_id = bc.id
+        WHERE ms.demand_count > 0
+        ORDER BY ms.demand_count DESC, ms.supply_count LIMIT ?""",
+     (10,)),
+    ("system_stats_latest",
+     "SELECT * FROM system_stats_snapshot ORDER BY taken_at DESC, id DESC LIMIT 1",
+     ()),
+    ("user_directory",
+     """SELECT u.id, u.username, u.created_at, COALESCE(c.total_cards, 0), c.last_activity_at
+        FROM users u
+        LEFT JOIN user_counters c ON c.user_id = u.id
+        WHERE u.username >= ? COLLATE NOCASE AND u.username < ? COLLATE NOCASE AND u.id != ?
+        ORDER BY u.username COLLATE NOCASE LIMIT ?""",
+     ("us", "ut", 0, 20)),
+    ("inbox_page",
+     """SELECT id, sent_at FROM messages
+        WHERE receiver_id = ? AND deleted_by_receiver = 0 AND (sent_at, id) < (?, ?)
+        ORDER BY sent_at DESC, id DESC LIMIT ?""",
+     (1, "9999-12-31", 0, 20)),
+    ("outbox_page",
+     """SELECT id, sent_at FROM messages
+        WHERE sender_id = ? AND deleted_by_sender = 0
+        ORDER BY sent_at DESC, id DESC LIMIT ?""",
+     (1, 20)),
+    ("message_thread",
+     """SELECT id, sender_id, sent_at FROM messages
+        WHERE thread_id = ? ORDER BY sent_at, id""",
+     (1,)),
+    ("reply_count",
+     "SELECT COUNT(*) FROM messages WHERE parent_message_id = ?",
+     (1,)),
+    ("conversation_partners",
+     """SELECT partner_id, last_message_at, message_count, unread_count FROM conversations
+        WHERE user_id = ? ORDER BY last_message_at DESC, last_message_id DESC LIMIT ?""",
+     (1, 10)),
+    ("series_cards",
+     "SELECT id, card_number FROM base_cards WHERE series_id = ? ORDER BY card_number",
+     (1,)),
+]
+
+def _uses_index(detail):
+    return "INDEX" in detail or "PRIMARY KEY" in detail
+
+def _is_full_scan(detail):
+    """Index nélküli tábla bejárás az EXPLAIN QUERY PLAN sorában"""
+    return detail.startswith("SCAN ") and not _uses_index(detail) and "CONSTANT ROW" not in detail
+
+def check_query_plans(conn, queries=None):
+    """EXPLAIN QUERY PLAN alapján ellenőrzi, hogy a gyakori lekérdezések indexet használnak.
+
+    Visszatérés: [{'name', 'uses_index', 'plan'}] - uses_index akkor igaz, ha a tervben
+    van index használat és nincs index nélküli teljes tábla bejárás.
+    """
+    results = []
+    for name, sql, params in (queries or HOT_QUERIES):
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        uses_index = (
+            any(_uses_index(detail) for detail in plan)
+            and not any(_is_full_scan(detail) for detail in plan)
+        )
+        results.append({'name': name, 'uses_index': uses_index, 'plan': plan})
+    return results
+
+def main():
+    from database import DATABASE_NAME
+
+    database = sys.argv[1] if len(sys.argv) > 1 else DATABASE_NAME
+    conn = sqlite3.connect(database)
+    try:
+        applied = run_migrations(conn)
+        print(f"📦 Séma verzió: {get_schema_version(conn)} (most alkalmazva: {applied or 'semmi'})")
+
+        failed = 0
+        for result in check_query_plans(conn):
+            mark = "✅" if result['uses_index'] else "❌"
+            failed += 0 if result['uses_index'] else 1
+            print(f"{mark} {result['name']}: {' | '.join(result['plan'])}")
+    finally:
+        conn.close()
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import streamlit as st
+import sys
+from pathlib import Path
+
+# Clean import setup
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import require_admin
+from database import (
+    get_latest_system_stats, get_system_stats_history, refresh_system_stats,
+    begin_request_scope
+)
+from utils import format_datetime
+
+# Kérés szintű memo az oldal futásához
+begin_request_scope()
+
+# Bejelentkezés és adminisztrátori jog ellenőrzése
+if not require_admin():
+    st.stop()
+
+st.title("🛠️ Rendszer statisztikák")
+
+with st.sidebar:
+    st.header("⚙️ Beállítások")
+    history_days = st.selectbox("📅 Trend időszak", [7, 30, 90], index=1, format_func=lambda d: f"{d} nap")
+
+    if st.button("🔄 Frissítés most", use_container_width=True):
+        refresh_system_stats()
+        st.rerun()
+
+# Legutóbbi pillanatkép (a háttérszál frissíti)
+stats = get_latest_system_stats()
+
+if not stats:
+    st.info("⏳ Még nem készült pillanatkép - a háttérfrissítés hamarosan elkészíti.")
+    st.stop()
+
+st.caption(f"🕒 Utolsó pillanatkép: {format_datetime(stats['taken_at'])}")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("👥 Felhasználók", stats['total_users'])
+    st.metric("📚 Sorozatok", stats['total_series'])
+with col2:
+    st.metric("🃏 Alapkártyák", stats['total_base_cards'])
+    st.metric("📦 Gyűjteményi kártyák", stats['total_user_cards'])
+with col3:
+    st.metric("📨 Üzenetek", stats['total_messages'])
+    st.metric("📈 Aktivitás (7 nap)", stats['activity_week'])
+
+st.write(f"🔥 **Legnépszerűbb sorozat:** {stats['popular_series']}")
+
+st.divider()
+
+# Trendek
+st.subheader("📊 Trendek")
+history = get_system_stats_history(days=history_days)
+
+if len(history) > 1:
+    st.line_chart(
+        {
+            "Felhasználók": [row['total_users'] for row in history],
+            "Gyűjteményi kártyák": [row['total_user_cards'] for row in history],
+            "Üzenetek": [row['total_messages'] for row in history],
+        }
+    )
+    st.caption(f"{len(history)} pillanatkép: {history[0]['taken_at']} - {history[-1]['taken_at']}")
+else:
+    st.info("📉 A trendekhez legalább két pillanatkép kell.")
@@ -1,6 +1,7 @@
 import streamlit as st
 import sys
 import os
+from functools import partial
 from pathlib import Path
 
 # Clean import setup
@@ -8,15 +9,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from auth import require_login
 from database import (
-    get_user_cards, get_all_series, get_base_cards_by_series, 
+    get_user_cards, get_all_series, 
     get_all_variants, add_user_card, update_user_card_status,
-    delete_user_card, add_base_card, add_series
+    delete_user_card, add_base_card, add_series,
+    get_missing_series_cards, begin_request_scope
 )
 from utils import (
     get_sports_list, get_status_list, get_condition_list,
     format_price, get_variant_display, format_card_display,
-    check_duplicate_card, get_series_completion
+    check_duplicate_card, get_series_completion, export_user_collection
 )
+from autocomplete import series_card_count, suggest
+
+# Kérés szintű memo az oldal futásához
+begin_request_scope()
 
 # Bejelentkezés ellenőrzése
 if not require_login():
@@ -63,11 +69,28 @@ with st.sidebar:
         st.metric("🔄 Cserélnék", trade_count)
         st.metric("💰 Eladnám", sell_count)
         
+        # Az export csak letöltéskor készül el (nem minden újrafutáskor)
+        st.download_button(
+            "📥 Gyűjtemény exportálása (CSV)",
+            data=partial(export_user_collection, st.session_state.user_id),
+            file_name="gyujtemeny.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+        
         # Sorozat teljesítettség
         if selected_series_id:
             has, total, percentage = get_series_completion(st.session_state.user_id, selected_series_id)
             st.metric("🎯 Teljesítettség", f"{percentage:.1f}%")
             st.write(f"📊 {has}/{total} kártya")
+            
+            if has < total:
+                with st.expander("🔍 Hiányzó kártyák"):
+                    missing = get_missing_series_cards(st.session_state.user_id, selected_series_id, limit=50)
+                    for _, card_number, player_name, _, variant_name, _ in missing:
+                        st.write(f"#{card_number:03d} {player_name} - {variant_name}")
+                    if len(missing) == 50:
+                        st.caption(f"... és még {total - has - 50} további")
     else:
         st.info("🎯 Még nincs kártyád!")
 
@@ -207,9 +230,8 @@ with tab2:
     # 2. lépés: Kártya választása
     st.subheader("2️⃣ Kártya választása")
     
-    base_cards = get_base_cards_by_series(series_id)
-    
-    if not base_cards:
+    # A sorozat kártyái a folyamat szintű autocomplete indexből (nem olvassuk újra leütésenként)
+    if not series_card_count(series_id):
         st.warning(f"⚠️ A '{selected_series_data[1]}' sorozatban még nincsenek kártyák!")
         
         # Gyors kártya hozzáadás
@@ -241,9 +263,8 @@ with tab2:
     # Kártya választó
     search_player = st.text_input("🔍 Játékos keresése", placeholder="Írd be a játékos nevét...")
     
-    filtered_cards = base_cards
-    if search_player:
-        filtered_cards = [card for card in base_cards if search_player.lower() in card[2].lower()]
+    # Prefix egyezés névszavakra (ékezet- és kisbetű-független), rangsorolva; elírásra hasonlóság
+    filtered_cards = suggest(series_id, search_player, limit=20)
     
     if not filtered_cards:
         st.warning("🤷 Nincs ilyen játékos a sorozatban.")
@@ -252,7 +273,7 @@ with tab2:
     # Kártyák megjelenítése
     selected_card = None
     
-    for card in filtered_cards[:20]:  # Csak első 20 találat
+    for card in filtered_cards:  # Csak első 20 találat
         col1, col2 = st.columns([4, 1])
         
         with col1:
@@ -9,17 +9,27 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from auth import require_login
 from database import (
     find_potential_matches,
+    find_reverse_matches,
     #get_market_insights,
     get_all_variants,
-    get_all_series
+    get_all_series,
+    get_rarity_text,
+    create_card_inquiry_message,
+    begin_request_scope
 )
+from trade_cycles import get_user_trade_cycles
 
 from utils import (
     get_match_summary, format_match_score, get_market_trend_emoji,
-    format_wishlist_priority_badge, format_price, #get_rarity_text,
+    format_wishlist_priority_badge, format_price,
     format_days_ago, get_price_recommendation
 )
 
+MATCH_PAGE_SIZE = 20
+
+# Kérés szintű memo az oldal futásához
+begin_request_scope()
+
 # Bejelentkezés ellenőrzése
 if not require_login():
     st.stop()
@@ -37,6 +47,7 @@ with st.sidebar:
         [
             "🔍 Amit keresek (vásárlás/csere)",
             "💰 Amit kínálok (eladás/csere)",
+            "🔁 Csere körök",
             "📊 Piaci insights",
             "🎯 Mind a kettő"
         ]
@@ -70,38 +81,39 @@ with st.sidebar:
     # Matchmaking statisztikák
     st.subheader("📈 Gyors statisztikák")
 
-# Fő tartalom
+# Fő tartalom (a sidebar statisztikák ezekből számolnak, ha az adott nézet lefutott)
+filtered_matches = None
+reverse_matches = None
+
 if match_type == "🔍 Amit keresek (vásárlás/csere)" or match_type == "🎯 Mind a kettő":
     
     with st.container():
         st.header("🔍 Amit keresek - Rangsort találatok")
         
-        # Matchek lekérése
+        # Lapozás: az oldalak kezdő kulcsai (match_score, user_card_id) a session state-ben,
+        # szűrőváltáskor az első oldalra ugrunk
+        filter_key = (min_match_score, max_price, rarity_filter, only_affordable)
+        if st.session_state.get('match_filter_key') != filter_key:
+            st.session_state.match_filter_key = filter_key
+            st.session_state.match_page_cursors = [None]
+        
+        page_cursors = st.session_state.match_page_cursors
+        page_index = len(page_cursors) - 1
+        
+        # Matchek lekérése (szűrés SQL-ben, eggyel több sor a következő oldal jelzéséhez)
         with st.spinner("🔄 Matchmaking algoritmus futtatása..."):
-            matches = find_potential_matches(st.session_state.user_id, limit=100)
+            page_matches = find_potential_matches(
+                st.session_state.user_id,
+                limit=MATCH_PAGE_SIZE + 1,
+                min_score=min_match_score,
+                max_price=max_price or None,
+                min_rarity=rarity_filter,
+                only_affordable=only_affordable,
+                after=page_cursors[-1]
+            )
         
-        # Szűrés
-        filtered_matches = []
-        for match in matches:
-            # Match score szűrő
-            if match['match_score'] < min_match_score:
-                continue
-            
-            # Ár szűrő
-            if max_price > 0 and match['status'] == 'sell' and match['price'] and match['price'] > max_price:
-                continue
-            
-            # Ritkasági szűrő
-            if selected_rarity == "Epic csak" and match['rarity_level'] != 6:
-                continue
-            elif match['rarity_level'] < rarity_filter:
-                continue
-            
-            # Megfizethetőség szűrő
-            if only_affordable and not match['is_affordable']:
-                continue
-            
-            filtered_matches.append(match)
+        has_next_page = len(page_matches) > MATCH_PAGE_SIZE
+        filtered_matches = page_matches[:MATCH_PAGE_SIZE]
         
         # Összefoglaló
         if filtered_matches:
@@ -109,7 +121,7 @@ if match_type == "🔍 Amit keresek (vásárlás/csere)" or match_type == "🎯
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("🎯 Találatok", summary['total'])
+                st.metric("🎯 Találatok (oldal)", summary['total'])
             with col2:
                 st.metric("🔄 Cserélnék", summary['trade_only'])
             with col3:
@@ -122,8 +134,8 @@ if match_type == "🔍 Amit keresek (vásárlás/csere)" or match_type == "🎯
             # Match-ek megjelenítése
             for i, match in enumerate(filtered_matches):
                 with st.expander(
-                    f"#{i+1} - {match['player_name']} ({match['variant_name']}) - {format_match_score(match['match_score'])}", 
-                    expanded=(i < 3)
+                    f"#{page_index * MATCH_PAGE_SIZE + i + 1} - {match['player_name']} ({match['variant_name']}) - {format_match_score(match['match_score'])}", 
+                    expanded=(page_index == 0 and i < 3)
                 ):
                     col1, col2, col3 = st.columns([2, 2, 1])
                     
@@ -238,6 +250,20 @@ if match_type == "🔍 Amit keresek (vásárlás/csere)" or match_type == "🎯
                                 st.write(f"⭐ Prioritás: {priority_points} pont")
                                 st.write(f"💎 Ritkasági: {rarity_points} pont")
                                 st.write(f"📊 **Összesen: {match['match_score']} pont**")
+            
+            # Lapozó
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if st.button("⬅️ Előző", disabled=page_index == 0, use_container_width=True):
+                    page_cursors.pop()
+                    st.rerun()
+            with col_page:
+                st.markdown(f"<div style='text-align: center;'>{page_index + 1}. oldal</div>", unsafe_allow_html=True)
+            with col_next:
+                if st.button("Következő ➡️", disabled=not has_next_page, use_container_width=True):
+                    last = filtered_matches[-1]
+                    page_cursors.append((last['match_score'], last['user_card_id']))
+                    st.rerun()
         else:
             st.warning("🤷 Nincsenek találatok a megadott szűrőkkel.")
             st.info("💡 Próbáld meg csökkenteni a match pontszám küszöböt vagy a szűrőket.")
@@ -255,19 +281,11 @@ if match_type == "💰 Amit kínálok (eladás/csere)" or match_type == "🎯 Mi
             reverse_matches = find_reverse_matches(st.session_state.user_id, limit=50)
         
         if reverse_matches:
-            # Csoportosítás kártyánként
-            from collections import defaultdict
-            cards_interest = defaultdict(list)
-            
-            for match in reverse_matches:
-                card_key = f"{match['card_number']:03d}_{match['player_name']}_{match['variant_name']}"
-                cards_interest[card_key].append(match)
-            
-            # Megjelenítés
-            for card_key, interested_users in cards_interest.items():
-                match_sample = interested_users[0]
-                total_interest = len(interested_users)
-                avg_interest_score = sum(u['interest_score'] for u in interested_users) / total_interest
+            # Megjelenítés (a csoportosítás kártyánként már az adatbázisban megtörtént)
+            for match_sample in reverse_matches:
+                interested_users = match_sample['interested_users']
+                total_interest = match_sample['interest_count']
+                avg_interest_score = match_sample['avg_interest_score']
                 
                 with st.expander(
                     f"🃏 {match_sample['player_name']} ({match_sample['variant_name']}) - {total_interest} érdeklődő",
@@ -296,10 +314,8 @@ if match_type == "💰 Amit kínálok (eladás/csere)" or match_type == "🎯 Mi
                         # Érdeklődők listája
                         st.subheader(f"👥 Érdeklődők ({total_interest})")
                         
-                        # Rangsorolás érdeklődési pontszám alapján
-                        sorted_users = sorted(interested_users, key=lambda x: x['interest_score'], reverse=True)
-                        
-                        for user in sorted_users:
+                        # Rangsorolva érkeznek (érdeklődési pontszám szerint)
+                        for user in interested_users:
                             user_col1, user_col2, user_col3 = st.columns([2, 2, 1])
                             
                             with user_col1:
@@ -347,6 +363,30 @@ Jelenleg {"eladásra kínálom" if match_sample['status'] == 'sell' else "cseré
             st.info("🤷 Senki sem keresi a kártyáidat jelenleg.")
             st.info("💡 Próbáld meg hozzáadni kártyáidat cserére vagy eladásra!")
 
+if match_type == "🔁 Csere körök":
+    
+    with st.container():
+        st.header("🔁 Többszereplős csere körök")
+        st.caption("A körök időszakos batch futásban frissülnek (trade_cycles.py) - mindenki kap valamit, amit keres.")
+        
+        trade_cycles = get_user_trade_cycles(st.session_state.user_id, limit=5)
+        
+        if trade_cycles:
+            for cycle in trade_cycles:
+                with st.expander(
+                    f"🔁 {cycle['length']} fős kör - pontszám: {cycle['score']:.1f}",
+                    expanded=(cycle['rank'] == 1)
+                ):
+                    for step in cycle['steps']:
+                        giver = "Te" if step['giver_id'] == st.session_state.user_id else step['giver']
+                        receiver = "neked" if step['receiver_id'] == st.session_state.user_id else step['receiver']
+                        card = f"#{step.get('card_number', 0):03d} {step.get('player_name', '?')} ({step.get('variant_name', '?')})"
+                        st.write(f"👤 **{giver}** ➡️ **{receiver}**: 🃏 {card} - {step.get('series_name', '')}")
+                    st.caption(f"🕒 Számolva: {cycle['computed_at']}")
+        else:
+            st.info("🤷 Jelenleg nincs olyan csere kör, amelyben részt vehetnél.")
+            st.info("💡 Tegyél cserére kártyákat és bővítsd a kívánságlistád (legalább közepes prioritással)!")
+
 if match_type == "📊 Piaci insights":
     
     with st.container():
@@ -451,12 +491,11 @@ if match_type == "📊 Piaci insights":
 
 # Sidebar statisztikák frissítése
 with st.sidebar:
-    if 'matches' in locals():
-        filtered_count = len(filtered_matches) if 'filtered_matches' in locals() else 0
-        st.metric("🔍 Szűrt találatok", filtered_count)
+    if filtered_matches is not None:
+        st.metric("🔍 Szűrt találatok", len(filtered_matches))
     
-    if 'reverse_matches' in locals():
-        st.metric("💰 Érdeklődők", len(reverse_matches))
+    if reverse_matches is not None:
+        st.metric("💰 Érdeklődők", sum(card['interest_count'] for card in reverse_matches))
     
     # Algoritmus magyarázat
     with st.expander("🤖 Algoritmus magyarázat"):
@@ -1,6 +1,7 @@
 import streamlit as st
 import sys
 import os
+from functools import partial
 from pathlib import Path
 
 # Clean import setup
@@ -8,16 +9,22 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from auth import require_login
 from database import (
-    get_inbox_messages, get_sent_messages, send_message, get_message_thread,
-    mark_message_as_read, delete_message, get_unread_message_count,
-    search_users_for_messaging, get_conversation_partners, create_card_inquiry_message
+    get_inbox_messages, get_sent_messages, send_message, get_message_thread, iter_inbox_messages,
+    mark_message_as_read, mark_all_messages_as_read, delete_message, get_unread_message_count,
+    search_users_for_messaging, get_conversation_partners, create_card_inquiry_message,
+    search_messages, begin_request_scope
 )
 from utils import (
     format_message_time, truncate_message_content, get_message_priority_badge,
     format_message_subject, validate_message_content, create_message_thread_display,
-    get_quick_reply_templates, format_price
+    get_quick_reply_templates, format_price, export_messages_to_csv
 )
 
+MESSAGE_LIST_PAGE_SIZE = 20
+
+# Kérés szintű memo az oldal futásához
+begin_request_scope()
+
 # Bejelentkezés ellenőrzése
 if not require_login():
     st.stop()
@@ -30,6 +37,32 @@ def clear_message_session():
         if key in st.session_state:
             del st.session_state[key]
 
+def export_inbox(user_id):
+    """Beérkezett üzenetek CSV exportja (a letöltés gomb hívja, kattintáskor)"""
+    return export_messages_to_csv(iter_inbox_messages(user_id))
+
+def get_page_cursors(list_key, filter_key=None):
+    """Keyset lapozás kurzorai listánként; szűrőváltáskor az első oldalra ugrunk"""
+    if st.session_state.get(f"{list_key}_filter_key") != filter_key or f"{list_key}_cursors" not in st.session_state:
+        st.session_state[f"{list_key}_filter_key"] = filter_key
+        st.session_state[f"{list_key}_cursors"] = [None]
+    return st.session_state[f"{list_key}_cursors"]
+
+def show_page_controls(list_key, page_cursors, page_messages, has_next_page, sent_at_index=4):
+    """Előző / következő oldal gombok (kurzor: az oldal utolsó üzenetének (sent_at, id) párja)"""
+    col_prev, col_page, col_next = st.columns([1, 1, 1])
+    with col_prev:
+        if st.button("⬅️ Előző", key=f"{list_key}_prev", disabled=len(page_cursors) == 1, use_container_width=True):
+            page_cursors.pop()
+            st.rerun()
+    with col_page:
+        st.markdown(f"<div style='text-align: center;'>{len(page_cursors)}. oldal</div>", unsafe_allow_html=True)
+    with col_next:
+        if st.button("Következő ➡️", key=f"{list_key}_next", disabled=not has_next_page, use_container_width=True):
+            last = page_messages[-1]
+            page_cursors.append((last[sent_at_index], last[0]))  # (sent_at, id)
+            st.rerun()
+
 def show_compose_message():
     """Új üzenet írása"""
     st.header("✍️ Új üzenet írása")
@@ -271,49 +304,107 @@ def show_message_thread(message_id):
             else:
                 st.error("❌ A válasz nem lehet üres!")
 
+def show_message_search():
+    """Keresés a saját üzenetek tárgyában és tartalmában"""
+    st.header("🔎 Keresés az üzenetekben")
+    
+    query = st.text_input("🔍 Keresett szöveg", placeholder="Tárgy vagy üzenet szövege...", key="message_search_query")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        folder = st.radio("📂 Mappa", ['all', 'received', 'sent'], horizontal=True, key="message_search_folder",
+                          format_func={'all': "Összes", 'received': "Beérkezett", 'sent': "Elküldött"}.get)
+    with col2:
+        unread_only = st.checkbox("🔴 Csak olvasatlanok", key="message_search_unread")
+    with col3:
+        card_only = st.checkbox("🃏 Kártyához kapcsolódó", key="message_search_cards")
+    
+    if not query.strip():
+        st.info("💡 Írj be legalább egy szót a kereséshez (szó eleje is elég).")
+        return
+    
+    # Eggyel több sor a következő oldal jelzéséhez
+    search_cursors = get_page_cursors("search", (query, folder, unread_only, card_only))
+    page_messages = search_messages(
+        st.session_state.user_id, query,
+        folder=folder, unread_only=unread_only, card_only=card_only,
+        limit=MESSAGE_LIST_PAGE_SIZE + 1,
+        after=search_cursors[-1]
+    )
+    has_next_page = len(page_messages) > MESSAGE_LIST_PAGE_SIZE
+    results = page_messages[:MESSAGE_LIST_PAGE_SIZE]
+    
+    if not results:
+        st.info("🤷 Nincs a keresésnek megfelelő üzenet.")
+        return
+    
+    st.divider()
+    
+    for msg in results:
+        msg_id, sender_id, receiver_id, subject, snippet, sent_at, is_read, card_id, sender_name, receiver_name = msg
+        received = receiver_id == st.session_state.user_id
+        
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            direction = f"👤 **{sender_name}**" if received else f"👤 Címzett: **{receiver_name}**"
+            st.markdown(f"{'📩' if received else '📨'} {subject or 'Nincs tárgy'}")
+            st.write(f"{direction} • {format_message_time(sent_at)}")
+            st.markdown(f"💭 {snippet}")
+        with col2:
+            if st.button("👁️ Megnyitás", key=f"open_search_{msg_id}"):
+                if received and not is_read:
+                    mark_message_as_read(msg_id, st.session_state.user_id)
+                st.session_state.selected_message = msg_id
+                st.rerun()
+        
+        st.divider()
+    
+    show_page_controls("search", search_cursors, results, has_next_page, sent_at_index=5)
+
 def show_main_messages():
     """Fő üzenet lista (beérkezett és elküldött)"""
     
-    tab1, tab2, tab3 = st.tabs(["📥 Beérkezett", "📤 Elküldött", "✍️ Új üzenet"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📥 Beérkezett", "📤 Elküldött", "🔎 Keresés", "✍️ Új üzenet"])
     
     with tab1:
         st.header("📥 Beérkezett üzenetek")
         
-        # Üzenetek lekérése
-        inbox_messages = get_inbox_messages(st.session_state.user_id, limit=50)
+        # Szűrés opciók
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            filter_unread = st.checkbox("🔴 Csak olvasatlanok", value=False)
+            filter_with_cards = st.checkbox("🃏 Kártya-specifikus üzenetek", value=False)
+        
+        # Üzenetek lekérése (szűrés SQL-ben, eggyel több sor a következő oldal jelzéséhez)
+        page_cursors = get_page_cursors("inbox", (filter_unread, filter_with_cards))
+        page_messages = get_inbox_messages(
+            st.session_state.user_id,
+            limit=MESSAGE_LIST_PAGE_SIZE + 1,
+            before=page_cursors[-1],
+            unread_only=filter_unread,
+            card_only=filter_with_cards
+        )
+        has_next_page = len(page_messages) > MESSAGE_LIST_PAGE_SIZE
+        inbox_messages = page_messages[:MESSAGE_LIST_PAGE_SIZE]
+        
+        with col2:
+            if inbox_messages and st.button("✅ Összes olvasottnak jelölés"):
+                mark_all_messages_as_read(st.session_state.user_id)
+                st.success("Összes üzenet olvasottnak jelölve!")
+                st.rerun()
         
         if not inbox_messages:
-            st.info("📭 Nincs beérkezett üzeneted.")
-            st.info("💡 Amikor valaki üzenetet küld, itt fogod látni.")
+            if filter_unread or filter_with_cards:
+                st.info("🤷 Nincs a szűrésnek megfelelő üzenet.")
+            else:
+                st.info("📭 Nincs beérkezett üzeneted.")
+                st.info("💡 Amikor valaki üzenetet küld, itt fogod látni.")
         else:
-            # Szűrés opciók
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                filter_unread = st.checkbox("🔴 Csak olvasatlanok", value=False)
-                filter_with_cards = st.checkbox("🃏 Kártya-specifikus üzenetek", value=False)
-            
-            with col2:
-                if st.button("✅ Összes olvasottnak jelölés"):
-                    for msg in inbox_messages:
-                        if not msg[5]:  # is_read
-                            mark_message_as_read(msg[0], st.session_state.user_id)
-                    st.success("Összes üzenet olvasottnak jelölve!")
-                    st.rerun()
-            
             st.divider()
             
-            # Szűrt üzenetek
-            filtered_messages = []
-            for msg in inbox_messages:
-                if filter_unread and msg[5]:  # is_read = True, de mi csak olvasatlanokat akarunk
-                    continue
-                if filter_with_cards and not msg[7]:  # related_card_id
-                    continue
-                filtered_messages.append(msg)
-            
             # Üzenetek megjelenítése
-            for msg in filtered_messages:
+            for msg in inbox_messages:
                 msg_id, sender_id, subject, content, sent_at, is_read, parent_id, card_id, sender_name, card_info, reply_count = msg
                 
                 # Üzenet konténer
@@ -364,12 +455,21 @@ def show_main_messages():
                                 st.rerun()
                     
                     st.divider()
+            
+            show_page_controls("inbox", page_cursors, inbox_messages, has_next_page)
     
     with tab2:
         st.header("📤 Elküldött üzenetek")
         
-        # Üzenetek lekérése
-        sent_messages = get_sent_messages(st.session_state.user_id, limit=50)
+        # Üzenetek lekérése (eggyel több sor a következő oldal jelzéséhez)
+        sent_cursors = get_page_cursors("sent")
+        page_messages = get_sent_messages(
+            st.session_state.user_id,
+            limit=MESSAGE_LIST_PAGE_SIZE + 1,
+            before=sent_cursors[-1]
+        )
+        has_next_page = len(page_messages) > MESSAGE_LIST_PAGE_SIZE
+        sent_messages = page_messages[:MESSAGE_LIST_PAGE_SIZE]
         
         if not sent_messages:
             st.info("📭 Még nem küldtél üzenetet.")
@@ -416,8 +516,13 @@ def show_main_messages():
                                 st.rerun()
                     
                     st.divider()
+            
+            show_page_controls("sent", sent_cursors, sent_messages, has_next_page)
     
     with tab3:
+        show_message_search()
+    
+    with tab4:
         show_compose_message()
 
 # Fő logika
@@ -466,6 +571,14 @@ with st.sidebar:
     if st.button("🔄 Frissítés", use_container_width=True):
         st.rerun()
     
+    st.download_button(
+        "📥 Beérkezett üzenetek exportálása (CSV)",
+        data=partial(export_inbox, st.session_state.user_id),
+        file_name="uzenetek.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
+    
     # Matchmaking integráció
     st.divider()
     st.subheader("🎯 Kapcsolódó")
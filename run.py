@@ -12,6 +12,12 @@ def main():
     print("-" * 50)
     
     try:
+        # Adatbázis előkészítése még a Streamlit indulása előtt
+        from database import bootstrap_database
+        stats = bootstrap_database()
+        status = "naprakész" if stats['schema_was_current'] else "frissítve"
+        print(f"📦 Adatbázis séma v{stats['schema_version']} ({status}) - {stats['duration_ms']:.1f} ms")
+        
         # Streamlit futtatása
         subprocess.run([sys.executable, "-m", "streamlit", "run", "main.py"])
     except KeyboardInterrupt:
@@ -0,0 +1,179 @@
+"""
+Vektorizált (NumPy) match pontozó motor
+
+A find_potential_matches SQL CASE kifejezésével azonos pontszámot számol,
+de a jelölteket oszloponként (tömbökben) húzza be és egyszerre pontozza.
+A súlyok konfigurálhatók, és minden találathoz pontszám-bontás kérhető.
+"""
+
+import numpy as np
+
+from database import get_db_connection, _match_row_to_dict, _query_potential_matches
+
+# Komponensenkénti szorzók - alapértékekkel a pontszám megegyezik az SQL verzióval
+DEFAULT_WEIGHTS = {
+    'priority': 1.0,   # kívánságlista prioritás: (5 - prioritás) * 10
+    'rarity': 1.0,     # ritkasági szint * 5
+    'supply': 1.0,     # kínálati sávok: 30 / 25 / 20 / 15 / max(10 - kínálat, 0)
+    'demand': 1.0,     # kereslet * 3, max. 20
+    'price': 1.0,      # ár megfelelőség: 15 / 10 / 5 / 0
+    'recency': 1.0,    # frissesség: 10 / 7 / 5 / 2 / 0
+}
+
+SCORE_COMPONENTS = tuple(DEFAULT_WEIGHTS)
+
+_DAY = 86400
+
+def fetch_candidates(cursor, user_id):
+    """Matchmaking jelöltek lekérése oszlopos formában.
+
+    Visszatérés: (rows, arrays) - a rows a find_potential_matches első 18
+    oszlopát tartalmazza (pontszám nélkül), az arrays a pontozáshoz szükséges
+    NumPy tömböket.
+    """
+    cursor.execute("""
+        SELECT
+            uc.id, uc.status, uc.price, uc.condition, uc.added_at,
+            bc.card_number, bc.player_name, bc.team,
+            cv.name, cv.color_code, cv.rarity_level,
+            s.name, s.year, u.username,
+            w.priority, w.max_price,
+            COALESCE(ms.demand_count, 0), COALESCE(ms.supply_count, 0),
+            CAST(strftime('%s', uc.added_at) AS INTEGER),
+            CAST(strftime('%s', 'now') AS INTEGER)
+        FROM wishlists w
+        JOIN user_cards uc ON uc.base_card_id = w.base_card_id
+            AND uc.variant_id = w.variant_id
+        JOIN base_cards bc ON uc.base_card_id = bc.id
+        JOIN card_variants cv ON uc.variant_id = cv.id
+        JOIN series s ON bc.series_id = s.id
+        JOIN users u ON uc.user_id = u.id
+        LEFT JOIN card_market_stats ms ON uc.base_card_id = ms.base_card_id
+            AND uc.variant_id = ms.variant_id
+        WHERE w.user_id = ?
+        AND uc.user_id != ?
+        AND uc.status IN ('trade', 'sell')
+    """, (user_id, user_id))
+
+    raw = cursor.fetchall()
+    rows = [tuple(row[:18]) for row in raw]
+
+    def column(index, default=np.nan):
+        return np.array([default if row[index] is None else row[index] for row in raw], dtype=np.float64)
+
+    arrays = {
+        'is_trade': np.array([row[1] == 'trade' for row in raw], dtype=bool),
+        'is_sell': np.array([row[1] == 'sell' for row in raw], dtype=bool),
+        'price': column(2),
+        'rarity': column(10, 0),
+        'priority': column(14, 3),     # COALESCE(priority, 3)
+        'max_price': column(15),
+        'demand': column(16, 0),
+        'supply': column(17, 0),
+        'added_ts': column(18),
+        'now_ts': raw[0][19] if raw else 0,
+    }
+    return rows, arrays
+
+def score_components(arrays):
+    """Pontszám komponensek számolása tömbösen (súlyozás nélkül)"""
+    supply = arrays['supply']
+    price = arrays['price']
+    max_price = arrays['max_price']
+    is_sell = arrays['is_sell']
+    # NaN összehasonlítás mindig hamis, mint az SQL NULL
+    age_ok = arrays['added_ts'] >= arrays['now_ts'] - np.array([1, 3, 7, 30])[:, None] * _DAY
+
+    with np.errstate(invalid='ignore'):
+        return {
+            'priority': (5 - arrays['priority']) * 10,
+            'rarity': arrays['rarity'] * 5,
+            'supply': np.select(
+                [supply == 0, supply == 1, supply == 2, supply <= 5],
+                [30, 25, 20, 15],
+                default=np.maximum(10 - supply, 0)
+            ).astype(np.float64),
+            'demand': np.minimum(arrays['demand'] * 3, 20),
+            'price': np.select(
+                [
+                    arrays['is_trade'],
+                    is_sell & np.isnan(max_price),
+                    is_sell & (price <= max_price),
+                    is_sell & (price <= max_price * 1.1),
+                    is_sell & (price <= max_price * 1.2),
+                ],
+                [15, 10, 15, 10, 5],
+                default=0
+            ).astype(np.float64),
+            'recency': np.select(list(age_ok), [10, 7, 5, 2], default=0).astype(np.float64),
+        }
+
+def score_candidates(arrays, weights=None):
+    """Súlyozott összpontszám és komponensek.
+
+    Visszatérés: (total, components) - mindkettő jelöltenkénti tömb(ök).
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    components = score_components(arrays)
+    total = np.zeros_like(arrays['supply'])
+    for name in SCORE_COMPONENTS:
+        total += weights[name] * components[name]
+    return total, components
+
+def _as_score(value):
+    """Egész pontszám int-ként (mint az SQL), egyébként float"""
+    value = round(float(value), 4)
+    return int(value) if value.is_integer() else value
+
+def rank_matches(rows, arrays, limit=50, weights=None, explain=False):
+    """Jelöltek pontozása és rangsorolása (pontszám, majd user_card_id szerint, mint az SQL)"""
+    if not rows:
+        return []
+
+    total, components = score_candidates(arrays, weights)
+
+    # lexsort: az utolsó kulcs az elsődleges
+    user_card_ids = np.array([row[0] for row in rows])
+    order = np.lexsort((user_card_ids, -total))[:limit]
+
+    matches = []
+    for index in order:
+        match = _match_row_to_dict(rows[index] + (_as_score(total[index]),))
+        if explain:
+            match['score_breakdown'] = {
+                name: _as_score(components[name][index]) for name in SCORE_COMPONENTS
+            }
+        matches.append(match)
+    return matches
+
+def find_potential_matches_vectorized(user_id, limit=50, weights=None, explain=False):
+    """find_potential_matches NumPy alapú megfelelője konfigurálható súlyokkal.
+
+    explain=True esetén minden találat kap egy 'score_breakdown' dict-et.
+    """
+    with get_db_connection() as conn:
+        rows, arrays = fetch_candidates(conn.cursor(), user_id)
+    return rank_matches(rows, arrays, limit=limit, weights=weights, explain=explain)
+
+def check_sql_parity(user_ids):
+    """Alap súlyokkal a NumPy és az SQL pontszámok összevetése.
+
+    Visszatérés: eltérések listája (user_id, user_card_id, sql_score, numpy_score).
+    """
+    mismatches = []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for user_id in user_ids:
+            sql_scores = {
+                m['user_card_id']: m['match_score']
+                for m in _query_potential_matches(cursor, user_id, -1)
+            }
+            rows, arrays = fetch_candidates(cursor, user_id)
+            numpy_scores = {
+                m['user_card_id']: m['match_score']
+                for m in rank_matches(rows, arrays, limit=len(rows))
+            }
+            for card_id in sql_scores.keys() | numpy_scores.keys():
+                if sql_scores.get(card_id) != numpy_scores.get(card_id):
+                    mismatches.append((user_id, card_id, sql_scores.get(card_id), numpy_scores.get(card_id)))
+    return mismatches
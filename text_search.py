@@ -0,0 +1,289 @@
+"""
+Ékezet- és kisbetű-független, elírástűrő névkeresés trigramokkal
+
+A neveket normalizáljuk (ékezet nélkül, casefold), szavanként trigramokra
+bontjuk (pg_trgm stílusban: "  w", " wo", "wor", "ord", "rd "). Az index a
+különböző normalizált neveken él (player_names + player_name_trigrams), a
+kártyák a base_card_names táblán keresztül mutatnak a nevükre - így egy
+sok sorozatban szereplő játékos sem növeli a posting listákat. Törlésnél és
+átnevezésnél a triggerek (migrations.py, 20) takarítják az árva neveket.
+
+Keresésnél a hasonlóság a kérdés trigramjainak lefedettsége (elgépelés és
+félig beírt név is talál), azonos lefedettségnél a Jaccard-hasonlóság dönt.
+"""
+
+import math
+import re
+import unicodedata
+
+DEFAULT_MIN_SIMILARITY = 0.5
+POSTINGS_BUDGET = 1000  # ennyi posting fölött már nem vonunk be újabb (gyakori) trigramot
+SIMILAR_NAME_WINDOW = 200  # ennyi legjobb névhez keressük meg a kártyákat
+SIMILARITY_TIERS = (0.8, 0.65)  # szigorúbb küszöbök, amelyekkel a keresés kezd
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize_text(text):
+    """Ékezetek eltávolítása, casefold, szóközök egységesítése ("Luka Dončić" -> "luka doncic")"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", stripped.casefold()).split())
+
+def trigrams(text):
+    """Szöveg trigramjai normalizálás után (szavanként, kezdő/záró kitöltéssel)"""
+    return _word_trigrams(normalize_text(text))
+
+def _word_trigrams(normalized):
+    result = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def similarity(query_trigrams, name_trigrams):
+    """(lefedettség, Jaccard) - a lefedettség a kérdés trigramjainak megtalált aránya"""
+    if not query_trigrams:
+        return 0.0, 0.0
+    shared = len(query_trigrams & name_trigrams)
+    return shared / len(query_trigrams), shared / len(query_trigrams | name_trigrams)
+
+def rank_names(query, items, key=lambda item: item, min_similarity=DEFAULT_MIN_SIMILARITY):
+    """Kis listák (pl. egy sorozat kártyái) rangsorolása memóriában, indexek nélkül
+
+    A normalizált részszöveg egyezés mindig találat (teljes lefedettséggel).
+    """
+    normalized_query = normalize_text(query)
+    query_trigrams = _word_trigrams(normalized_query)
+    scored = []
+    for item in items:
+        name = normalize_text(key(item))
+        coverage, jaccard = similarity(query_trigrams, _word_trigrams(name))
+        if normalized_query and normalized_query in name:
+            coverage = 1.0
+        if coverage >= min_similarity:
+            scored.append((coverage, jaccard, item))
+    scored.sort(key=lambda entry: (entry[0], entry[1]), reverse=True)
+    return [item for _, _, item in scored]
+
+# =================== INDEX KARBANTARTÁS ===================
+
+def _name_id(cursor, normalized):
+    """Normalizált név azonosítója - új név esetén a trigramjait is indexeli"""
+    cursor.execute("SELECT id FROM player_names WHERE normalized = ?", (normalized,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+
+    name_trigrams = _word_trigrams(normalized)
+    cursor.execute("INSERT INTO player_names (normalized, trigram_count) VALUES (?, ?)",
+                   (normalized, len(name_trigrams)))
+    name_id = cursor.lastrowid
+    cursor.executemany("INSERT INTO player_name_trigrams (trigram, name_id) VALUES (?, ?)",
+                       ((trigram, name_id) for trigram in name_trigrams))
+    cursor.executemany("""
+        INSERT INTO trigram_frequency (trigram, name_count) VALUES (?, 1)
+        ON CONFLICT (trigram) DO UPDATE SET name_count = name_count + 1
+    """, ((trigram,) for trigram in name_trigrams))
+    return name_id
+
+def index_base_card(cursor, base_card_id, player_name):
+    """Egy alapkártya nevének felvétele a trigram indexbe (a hívó tranzakciójában)"""
+    # Előbb a régi hivatkozás törlése: a DELETE trigger takarítja az árvává vált nevet
+    # (az INSERT OR REPLACE törlése nem indít triggert)
+    cursor.execute("DELETE FROM base_card_names WHERE base_card_id = ?", (base_card_id,))
+    name_id = _name_id(cursor, normalize_text(player_name))
+    cursor.execute("INSERT INTO base_card_names (base_card_id, name_id) VALUES (?, ?)",
+                   (base_card_id, name_id))
+
+def rebuild_trigram_index(cursor):
+    """Trigram index teljes újraépítése a base_cards táblából (backfill / tömeges betöltés után)"""
+    # A hivatkozások utoljára: addigra az árva név triggereknek nincs mit takarítani
+    for table in ("player_name_trigrams", "trigram_frequency", "player_names", "base_card_names"):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute("SELECT id, player_name FROM base_cards")
+    name_ids = {}
+    links = []
+    for base_card_id, player_name in cursor.fetchall():
+        normalized = normalize_text(player_name)
+        links.append((base_card_id, name_ids.setdefault(normalized, len(name_ids) + 1)))
+
+    names = []
+    postings = []
+    frequency = {}
+    for normalized, name_id in name_ids.items():
+        name_trigrams = _word_trigrams(normalized)
+        names.append((name_id, normalized, len(name_trigrams)))
+        for trigram in name_trigrams:
+            postings.append((trigram, name_id))
+            frequency[trigram] = frequency.get(trigram, 0) + 1
+
+    cursor.executemany("INSERT INTO player_names (id, normalized, trigram_count) VALUES (?, ?, ?)", names)
+    postings.sort()
+    cursor.executemany("INSERT INTO player_name_trigrams (trigram, name_id) VALUES (?, ?)", postings)
+    cursor.executemany("INSERT INTO trigram_frequency (trigram, name_count) VALUES (?, ?)", frequency.items())
+    cursor.executemany("INSERT INTO base_card_names (base_card_id, name_id) VALUES (?, ?)", links)
+    return len(names)
+
+def compute_trigram_index(cursor):
+    """Elvárt index a base_cards táblából: (hivatkozások, nevek, postingok, gyakoriságok)"""
+    cursor.execute("SELECT id, player_name FROM base_cards")
+    links = {base_card_id: normalize_text(player_name) for base_card_id, player_name in cursor.fetchall()}
+    names = set(links.values())
+    postings = {(trigram, name) for name in names for trigram in _word_trigrams(name)}
+    frequency = {}
+    for trigram, _ in postings:
+        frequency[trigram] = frequency.get(trigram, 0) + 1
+    return links, names, postings, frequency
+
+def load_trigram_index(cursor):
+    """Tárolt index ugyanabban a formában, mint a compute_trigram_index"""
+    cursor.execute("""
+        SELECT bn.base_card_id, n.normalized
+        FROM base_card_names bn
+        LEFT JOIN player_names n ON n.id = bn.name_id
+    """)
+    links = {base_card_id: name for base_card_id, name in cursor.fetchall()}
+    cursor.execute("SELECT normalized FROM player_names")
+    names = {row[0] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT t.trigram, n.normalized
+        FROM player_name_trigrams t
+        LEFT JOIN player_names n ON n.id = t.name_id
+    """)
+    postings = {(trigram, name) for trigram, name in cursor.fetchall()}
+    cursor.execute("SELECT trigram, name_count FROM trigram_frequency")
+    frequency = {trigram: name_count for trigram, name_count in cursor.fetchall()}
+    return links, names, postings, frequency
+
+# =================== KERESÉS ===================
+
+def _shared_count(query_trigrams, normalized):
+    """Közös trigramok száma halmazépítés nélkül (a kérdés trigramjai nem lógnak át szóhatáron)"""
+    padded = "".join(f"  {word} " for word in normalized.split())
+    return sum(trigram in padded for trigram in query_trigrams)
+
+def _similar_name_ids(cursor, query_trigrams, threshold, floor, window):
+    """Küszöb feletti nevek csökkenő hasonlóság szerint.
+
+    Visszatérés: ([(name_id, lefedettség, jaccard)], végleges). Ha a posting
+    listákat csonkolni kellett, a jelöltek nem függnek a küszöbtől: ilyenkor már
+    a `floor` alsó küszöbbel szűrünk, és a lazítás nem hozna újat (végleges).
+    """
+    query_size = len(query_trigrams)
+    # Legalább ennyi közös trigram kell a küszöbhöz
+    required = math.ceil(threshold * query_size)
+
+    placeholders = ",".join("?" * query_size)
+    cursor.execute(f"""
+        SELECT trigram, name_count FROM trigram_frequency
+        WHERE trigram IN ({placeholders})
+        ORDER BY name_count
+    """, tuple(query_trigrams))
+    known = cursor.fetchall()
+
+    # A legritkább trigramokkal kezdünk. Skatulya-elv: ha a névnek legalább
+    # `required` közös trigramja van, a (len - required + 1) legritkább közül
+    # legalább egyet tartalmaz - ennyit mindenképp bevonunk, többet csak a kereten belül.
+    must_probe = query_size - required + 1
+    probes = []
+    postings = 0
+    for trigram, name_count in known:
+        if len(probes) >= must_probe and postings + name_count > POSTINGS_BUDGET:
+            break
+        probes.append(trigram)
+        postings += name_count
+
+    if not probes:
+        return [], False
+
+    # A be nem vont (gyakori) trigramok legfeljebb ennyivel növelhetik a közös számot
+    unprobed = len(known) - len(probes)
+    # Csak gyakori trigramokból álló kérdésnél (pl. egy keresztnév) a posting
+    # listákat is a kereten belül olvassuk - a rangsor az első találatokra szól
+    truncated = postings > POSTINGS_BUDGET
+    exact = not unprobed and not truncated
+    if truncated:
+        threshold = floor
+
+    placeholders = ",".join("?" * len(probes))
+    cursor.execute(f"""
+        SELECT n.id, n.normalized, candidates.shared, n.trigram_count
+        FROM (
+            SELECT name_id, COUNT(*) AS shared
+            FROM (
+                SELECT name_id FROM player_name_trigrams
+                WHERE trigram IN ({placeholders})
+                LIMIT ?
+            )
+            GROUP BY name_id
+            HAVING COUNT(*) >= ?
+        ) AS candidates
+        JOIN player_names n ON n.id = candidates.name_id
+        ORDER BY candidates.shared DESC, n.trigram_count, n.id
+        {"LIMIT ?" if exact else ""}
+    """, (*probes, min(postings, POSTINGS_BUDGET),
+          1 if truncated else max(1, required - unprobed), *([window] if exact else [])))
+
+    scored = []
+    for name_id, normalized, shared, trigram_count in cursor.fetchall():
+        if not exact:
+            # Részleges számlálás - a pontos közös számot a névből számoljuk
+            shared = _shared_count(query_trigrams, normalized)
+        coverage = shared / query_size
+        if coverage >= threshold:
+            scored.append((name_id, coverage, shared / (query_size + trigram_count - shared)))
+
+    scored.sort(key=lambda entry: (-entry[1], -entry[2], entry[0]))
+    return scored[:window], truncated
+
+def find_similar_names(cursor, query, limit=20, min_similarity=DEFAULT_MIN_SIMILARITY, series_id=None):
+    """Hasonló nevű alapkártyák a trigram indexből.
+
+    Szigorú küszöbbel kezd (kevés, ritka trigram elég a jelöltekhez), és csak
+    akkor lazít a min_similarity-ig, ha nincs elég találat.
+    Visszatérés: [(base_card_id, lefedettség, jaccard)] csökkenő hasonlóság szerint.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+
+    thresholds = [t for t in SIMILARITY_TIERS if t > min_similarity] + [min_similarity]
+    hits = []
+    for threshold in thresholds:
+        ranked, final = _similar_name_ids(cursor, query_trigrams, threshold, min_similarity,
+                                          SIMILAR_NAME_WINDOW)
+        hits = _cards_for_names(cursor, ranked, limit, series_id)
+        if len(hits) >= limit or final:
+            break
+
+    return hits
+
+def _cards_for_names(cursor, ranked, limit, series_id=None):
+    """Rangsorolt nevekhez tartozó alapkártyák: [(base_card_id, lefedettség, jaccard)]"""
+    if series_id:
+        # Egy sorozat kártyái kevesen vannak - onnan indulunk, a rangsort Pythonban tartjuk
+        rank = {name_id: position for position, (name_id, _, _) in enumerate(ranked)}
+        cursor.execute("""
+            SELECT bc.id, bn.name_id
+            FROM base_cards bc
+            JOIN base_card_names bn ON bn.base_card_id = bc.id
+            WHERE bc.series_id = ?
+        """, (series_id,))
+        matches = sorted((rank[name_id], base_card_id)
+                         for base_card_id, name_id in cursor.fetchall() if name_id in rank)
+        return [(base_card_id, *ranked[position][1:]) for position, base_card_id in matches[:limit]]
+
+    # Nevenként a rangsor sorrendjében, amíg össze nem jön a limit
+    hits = []
+    for name_id, coverage, jaccard in ranked:
+        cursor.execute("""
+            SELECT base_card_id FROM base_card_names
+            WHERE name_id = ?
+            ORDER BY base_card_id
+            LIMIT ?
+        """, (name_id, limit - len(hits)))
+        hits.extend((row[0], coverage, jaccard) for row in cursor.fetchall())
+        if len(hits) >= limit:
+            break
+    return hits
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Többszereplős csere körök keresése (A-nak megvan, amit B keres, B-nek, amit C, C-nek, amit A)
+Használat: python trade_cycles.py  (körök újraszámolása és mentése)
+
+Időszakos batch (pl. cron óránként: 0 * * * * python trade_cycles.py) - 100 000
+felhasználón kb. 17 s. Az eredményt a trade_cycle_results táblából a matchmaking
+oldal "Csere körök" nézete olvassa (get_user_trade_cycles).
+"""
+
+import heapq
+import json
+import time
+
+from database import get_db_connection
+
+# Alapértelmezett vágási paraméterek
+DEFAULT_MIN_PRIORITY = 2        # ennél kisebb prioritású kívánságok nem számítanak (1 = Alacsony kimarad)
+DEFAULT_MIN_RARITY = 2          # ennél gyakoribb változatok nem számítanak (1 = Base kimarad)
+DEFAULT_WANTERS_PER_CARD = 8    # kártyánként a legerősebb N kereső
+DEFAULT_MAX_OUT_DEGREE = 6      # felhasználónként a legerősebb N kimenő él
+DEFAULT_MAX_LENGTH = 4          # leghosszabb kör (felhasználók száma)
+
+def build_trade_graph(cursor, min_priority=DEFAULT_MIN_PRIORITY, min_rarity=DEFAULT_MIN_RARITY,
+                      wanters_per_card=DEFAULT_WANTERS_PER_CARD, max_out_degree=DEFAULT_MAX_OUT_DEGREE):
+    """Kompakt ad/kér gráf: giver -> [(weight, receiver, user_card_id, base_card_id, variant_id)]
+
+    Él súlya: a fogadó prioritása * 10 + a változat ritkasága * 5. Kártyánként csak
+    a legerősebb keresők, felhasználónként csak a legerősebb kimenő élek maradnak.
+    """
+    # Kártyánkénti legerősebb keresők (prioritás szerint rendezve érkeznek)
+    wanters = {}
+    cursor.execute("""
+        SELECT base_card_id, variant_id, user_id, priority
+        FROM wishlists
+        WHERE COALESCE(priority, 1) >= ?
+        ORDER BY base_card_id, variant_id, priority DESC, user_id
+    """, (min_priority,))
+    for base_card_id, variant_id, user_id, priority in cursor:
+        bucket = wanters.setdefault((base_card_id, variant_id), [])
+        if len(bucket) < wanters_per_card:
+            bucket.append((user_id, priority or 1))
+
+    # Cserére kínált kártyák felhasználónként - felhasználónként azonnal vágunk top-K-ra
+    graph = {}
+    current_user = None
+    best = {}
+
+    def flush():
+        if best:
+            graph[current_user] = heapq.nlargest(max_out_degree, best.values())
+
+    cursor.execute("""
+        SELECT uc.user_id, uc.id, uc.base_card_id, uc.variant_id, cv.rarity_level
+        FROM user_cards uc
+        JOIN card_variants cv ON uc.variant_id = cv.id
+        WHERE uc.status = 'trade' AND cv.rarity_level >= ?
+        ORDER BY uc.user_id
+    """, (min_rarity,))
+    for giver, user_card_id, base_card_id, variant_id, rarity in cursor:
+        if giver != current_user:
+            flush()
+            current_user, best = giver, {}
+        for receiver, priority in wanters.get((base_card_id, variant_id), ()):
+            if receiver == giver:
+                continue
+            edge = (priority * 10 + rarity * 5, receiver, user_card_id, base_card_id, variant_id)
+            if receiver not in best or edge > best[receiver]:
+                best[receiver] = edge
+    flush()
+
+    return graph
+
+def find_cycles(graph, max_length=DEFAULT_MAX_LENGTH, min_length=2):
+    """Korlátos hosszúságú körök keresése.
+
+    Minden kör egyszer kerül elő: a kiinduló pont a kör legkisebb azonosítójú
+    tagja, a bejárás csak nála nagyobb azonosítójú csúcsokat érint.
+    Visszatérés: generátor (score, [él, ...]) párokkal, score = átlagos élsúly.
+    """
+    # Bejövő él nélküli csúcsból nem indulhat kör
+    has_incoming = {edge[1] for edges in graph.values() for edge in edges}
+
+    for start in sorted(graph):
+        if start not in has_incoming:
+            continue
+
+        stack = [(start, [])]
+        while stack:
+            node, path = stack.pop()
+            for edge in graph.get(node, ()):
+                receiver = edge[1]
+                if receiver == start:
+                    if len(path) + 1 >= min_length:
+                        cycle = path + [edge]
+                        yield sum(e[0] for e in cycle) / len(cycle), cycle
+                elif (receiver > start and len(path) + 1 < max_length
+                      and all(e[1] != receiver for e in path)):
+                    stack.append((receiver, path + [edge]))
+
+def top_cycles_per_user(cycles, top_n=5):
+    """Felhasználónként a legjobb N kör (rövidebb kör előnyben azonos pontszámnál)"""
+    best = {}
+    for sequence, (score, cycle) in enumerate(cycles):
+        entry = (score, -len(cycle), -sequence, cycle)
+        for edge in cycle:
+            heap = best.setdefault(edge[1], [])
+            if len(heap) < top_n:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    return {
+        user_id: [(entry[0], entry[3]) for entry in sorted(heap, reverse=True)]
+        for user_id, heap in best.items()
+    }
+
+def refresh_trade_cycles(top_n=5, max_length=DEFAULT_MAX_LENGTH, **graph_options):
+    """Körök újraszámolása az összes felhasználóra és mentése a trade_cycle_results táblába"""
+    started = time.perf_counter()
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        graph = build_trade_graph(cursor, **graph_options)
+        graph_seconds = time.perf_counter() - started
+
+        cycle_count = 0
+
+        def counted(cycles):
+            nonlocal cycle_count
+            for cycle in cycles:
+                cycle_count += 1
+                yield cycle
+
+        per_user = top_cycles_per_user(counted(find_cycles(graph, max_length=max_length)), top_n=top_n)
+        search_seconds = time.perf_counter() - started - graph_seconds
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("DELETE FROM trade_cycle_results")
+            cursor.executemany("""
+                INSERT INTO trade_cycle_results (user_id, rank, score, cycle_length, cycle)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                (user_id, rank, score, len(cycle), json.dumps(_cycle_steps(cycle)))
+                for user_id, cycles in per_user.items()
+                for rank, (score, cycle) in enumerate(cycles, start=1)
+            ))
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+
+    return {
+        'users_in_graph': len(graph),
+        'edges': sum(len(edges) for edges in graph.values()),
+        'cycles_found': cycle_count,
+        'users_with_cycles': len(per_user),
+        'graph_seconds': graph_seconds,
+        'search_seconds': search_seconds,
+        'total_seconds': time.perf_counter() - started
+    }
+
+def _cycle_steps(cycle):
+    """Kör élei mentéshez - a giver az előző él fogadója"""
+    steps = []
+    for index, edge in enumerate(cycle):
+        steps.append({
+            'giver_id': cycle[index - 1][1],
+            'receiver_id': edge[1],
+            'user_card_id': edge[2],
+            'base_card_id': edge[3],
+            'variant_id': edge[4],
+            'weight': edge[0]
+        })
+    return steps
+
+def get_user_trade_cycles(user_id, limit=5):
+    """Egy felhasználó legjobb mentett csere körei felhasználónevekkel és kártyaadatokkal"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT rank, score, cycle_length, cycle, computed_at
+            FROM trade_cycle_results
+            WHERE user_id = ?
+            ORDER BY rank
+            LIMIT ?
+        """, (user_id, limit))
+        rows = cursor.fetchall()
+        if not rows:
+            return []
+
+        cycles = [(row, json.loads(row[3])) for row in rows]
+        user_ids = {step[key] for _, steps in cycles for step in steps for key in ('giver_id', 'receiver_id')}
+        card_ids = {step['user_card_id'] for _, steps in cycles for step in steps}
+
+        placeholders = ",".join("?" * len(user_ids))
+        cursor.execute(f"SELECT id, username FROM users WHERE id IN ({placeholders})", tuple(user_ids))
+        usernames = dict(cursor.fetchall())
+
+        placeholders = ",".join("?" * len(card_ids))
+        cursor.execute(f"""
+            SELECT uc.id, bc.card_number, bc.player_name, cv.name, s.name
+            FROM user_cards uc
+            JOIN base_cards bc ON uc.base_card_id = bc.id
+            JOIN card_variants cv ON uc.variant_id = cv.id
+            JOIN series s ON bc.series_id = s.id
+            WHERE uc.id IN ({placeholders})
+        """, tuple(card_ids))
+        cards = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    result = []
+    for row, steps in cycles:
+        for step in steps:
+            step['giver'] = usernames.get(step['giver_id'])
+            step['receiver'] = usernames.get(step['receiver_id'])
+            card = cards.get(step['user_card_id'])
+            if card:
+                step['card_number'], step['player_name'], step['variant_name'], step['series_name'] = card
+        result.append({
+            'rank': row[0],
+            'score': row[1],
+            'length': row[2],
+            'steps': steps,
+            'computed_at': row[4]
+        })
+    return result
+
+def main():
+    from database import bootstrap_database
+
+    bootstrap_database()
+    print("🔄 Csere körök újraszámolása...")
+    stats = refresh_trade_cycles()
+    print(f"👥 Gráf: {stats['users_in_graph']} felhasználó, {stats['edges']} él "
+          f"({stats['graph_seconds']:.1f} s)")
+    print(f"🔁 {stats['cycles_found']} kör, {stats['users_with_cycles']} felhasználónak "
+          f"({stats['search_seconds']:.1f} s)")
+    print(f"⏱️  Összesen: {stats['total_seconds']:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,58 @@
 import streamlit as st
+import csv
+import io
 import sqlite3
+import tempfile
 from datetime import datetime, timedelta
-from database import get_connection
+from database import get_db_connection, nocase_prefix_range
+from config import EXPORT_CHUNK_ROWS, USER_SEARCH_LIMIT, USER_SEARCH_MAX_LIMIT
 
 def get_user_stats(user_id):
-    """Felhasználó statisztikáinak lekérése"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    stats = {}
-    
-    # Összes kártya
-    cursor.execute("SELECT COUNT(*) FROM user_cards WHERE user_id = ?", (user_id,))
-    stats['total_cards'] = cursor.fetchone()[0]
-    
-    # Cserélni kívánt kártyák
-    cursor.execute("SELECT COUNT(*) FROM user_cards WHERE user_id = ? AND status = 'trade'", (user_id,))
-    stats['trade_cards'] = cursor.fetchone()[0]
-    
-    # Eladni kívánt kártyák
-    cursor.execute("SELECT COUNT(*) FROM user_cards WHERE user_id = ? AND status = 'sell'", (user_id,))
-    stats['sell_cards'] = cursor.fetchone()[0]
-    
-    # Csak megvan kártyák
-    cursor.execute("SELECT COUNT(*) FROM user_cards WHERE user_id = ? AND status = 'owned'", (user_id,))
-    stats['owned_cards'] = cursor.fetchone()[0]
-    
-    # Kívánságlista
-    cursor.execute("SELECT COUNT(*) FROM wishlists WHERE user_id = ?", (user_id,))
-    stats['wishlist_count'] = cursor.fetchone()[0]
-    
-    # Olvasatlan üzenetek
-    cursor.execute("SELECT COUNT(*) FROM messages WHERE receiver_id = ? AND is_read = 0", (user_id,))
-    stats['unread_messages'] = cursor.fetchone()[0]
-    
-    # Sorozatok száma
-    cursor.execute("""
-        SELECT COUNT(DISTINCT bc.series_id) 
-        FROM user_cards uc
-        JOIN base_cards bc ON uc.base_card_id = bc.id
-        WHERE uc.user_id = ?
-    """, (user_id,))
-    stats['series_count'] = cursor.fetchone()[0]
-    
-    # Legritkább kártyák száma (Epic)
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM user_cards uc
-        JOIN card_variants cv ON uc.variant_id = cv.id
-        WHERE uc.user_id = ? AND cv.name = 'Epic'
-    """, (user_id,))
-    stats['epic_cards'] = cursor.fetchone()[0]
-    
-    conn.close()
-    return stats
+    """Felhasználó statisztikáinak lekérése (triggerekkel karbantartott user_counters sorból)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT
+                COALESCE(c.total_cards, 0),
+                COALESCE(c.trade_cards, 0),
+                COALESCE(c.sell_cards, 0),
+                COALESCE(c.owned_cards, 0),
+                COALESCE(c.wishlist_count, 0),
+                COALESCE(c.unread_messages, 0),
+                COALESCE(c.series_count, 0),
+                COALESCE(c.epic_cards, 0)
+            FROM (SELECT ? AS user_id) u
+            LEFT JOIN user_counters c ON c.user_id = u.user_id
+        """, (user_id,))
+        row = cursor.fetchone()
+    
+    keys = ('total_cards', 'trade_cards', 'sell_cards', 'owned_cards',
+            'wishlist_count', 'unread_messages', 'series_count', 'epic_cards')
+    return dict(zip(keys, row))
 
 def get_recent_activity(user_id, days=7):
     """Legutóbbi aktivitás lekérése"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    since_date = datetime.now() - timedelta(days=days)
-    
-    cursor.execute("""
-        SELECT action, description, created_at
-        FROM activity_log
-        WHERE user_id = ? AND created_at >= ?
-        ORDER BY created_at DESC
-        LIMIT 10
-    """, (user_id, since_date))
-    
-    activities = []
-    for row in cursor.fetchall():
-        activities.append({
-            'action': row[0],
-            'description': row[1],
-            'date': format_datetime(row[2])
-        })
-    
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        since_date = datetime.now() - timedelta(days=days)
+        
+        cursor.execute("""
+            SELECT action, description, created_at
+            FROM activity_log
+            WHERE user_id = ? AND created_at >= ?
+            ORDER BY created_at DESC
+            LIMIT 10
+        """, (user_id, since_date))
+        
+        activities = []
+        for row in cursor.fetchall():
+            activities.append({
+                'action': row[0],
+                'description': row[1],
+                'date': format_datetime(row[2])
+            })
     return activities
 
 def find_potential_matches(user_id):
@@ -368,33 +342,75 @@ def get_quick_reply_templates():
         "Az ár fix, nem alkudok. "
     ]
 
-def search_messages(user_id, query, message_type="all"):
-    """Üzenetek keresése - placeholder funkció"""
-    # Ezt később implementáljuk a database.py-ban
-    pass
+def search_messages(user_id, query, message_type="all", limit=20, after=None):
+    """Üzenetek keresése (FTS5, a database.search_messages-re épül)
+
+    message_type: 'all' | 'received' | 'sent' | 'unread' | 'card'
+    """
+    from database import search_messages as search_user_messages
+    
+    if message_type == "unread":
+        return search_user_messages(user_id, query, unread_only=True, limit=limit, after=after)
+    if message_type == "card":
+        return search_user_messages(user_id, query, card_only=True, limit=limit, after=after)
+    folder = message_type if message_type in ("received", "sent") else "all"
+    return search_user_messages(user_id, query, folder=folder, limit=limit, after=after)
+
+def csv_chunks(header, rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """CSV szöveg darabokban (csv modullal escape-elve) - egyszerre csak egy darab van memóriában"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    yield buffer.getvalue()
+
+def spool_csv(chunks):
+    """CSV darabok összegyűjtése ideiglenes fájlon át, UTF-8 bájtokként.
+
+    Az építés közben csak az aktuális darab van memóriában; a kész exportot
+    egyetlen read() olvassa vissza (nincs sztring összefűzés és extra másolat).
+    A st.download_button a kapott adatot mindenképp bájtokká olvassa
+    (convert_data_to_bytes_and_infer_mime: data.read()), így a csúcs memória az
+    export mérete - ennél kevesebbet a Streamlit nem tesz lehetővé. A fájl a
+    with blokk végén lezárul és törlődik, nem marad nyitott leíró.
+    """
+    with tempfile.TemporaryFile(mode="w+b") as spool:
+        for chunk in chunks:
+            spool.write(chunk.encode("utf-8"))
+        spool.seek(0)
+        return spool.read()
+
+MESSAGE_EXPORT_HEADER = ("Dátum", "Feladó", "Címzett", "Tárgy", "Tartalom", "Olvasott", "Kártya")
+
+def iter_messages_csv(messages):
+    """Beérkezett üzenetek (get_inbox_messages sorai, akár generátorból) CSV darabokként"""
+    rows = (
+        (
+            msg[4],  # sent_at
+            msg[8],  # sender_name
+            "Te",  # beérkezett üzenet - a címzett maga a felhasználó
+            msg[2],  # subject
+            msg[3],  # content
+            "Igen" if msg[5] else "Nem",  # is_read
+            msg[9] or ""  # related_card_info
+        )
+        for msg in messages
+    )
+    return csv_chunks(MESSAGE_EXPORT_HEADER, rows)
 
 def export_messages_to_csv(messages):
-    """Üzenetek exportálása CSV-be"""
-    import io
-    
-    output = io.StringIO()
-    output.write("Dátum,Feladó,Címzett,Tárgy,Tartalom,Olvasott,Kártya\n")
-    
-    for msg in messages:
-        # CSV escape
-        fields = [
-            str(msg[4]),  # sent_at
-            str(msg[8]),  # sender_name
-            "Te" if msg[1] != msg[2] else str(msg[8]),  # receiver
-            f'"{str(msg[2]).replace('"', '""')}"',  # subject
-            f'"{str(msg[3]).replace('"', '""')}"',  # content
-            "Igen" if msg[5] else "Nem",  # is_read
-            str(msg[9]) if msg[9] else ""  # related_card_info
-        ]
-        
-        output.write(",".join(fields) + "\n")
-    
-    return output.getvalue()
+    """Üzenetek exportálása CSV-be (UTF-8 bájtok, lásd spool_csv)"""
+    return spool_csv(iter_messages_csv(messages))
 
 def format_datetime(dt_string):
     """Dátum formázása magyar formátumra"""
@@ -478,98 +494,89 @@ def format_card_display(card_number, player_name, variant_name, color_code, seri
     else:
         return f"#{card_number:03d} {player_name} - {variant_colored}"
 
-def search_users(query=""):
-    """Felhasználók keresése"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    if query:
-        cursor.execute("""
-            SELECT id, username FROM users 
-            WHERE username LIKE ? 
-            ORDER BY username
-        """, (f"%{query}%",))
-    else:
-        cursor.execute("SELECT id, username FROM users ORDER BY username")
-    
-    users = cursor.fetchall()
-    conn.close()
+def search_users(query="", limit=USER_SEARCH_LIMIT):
+    """Felhasználók keresése név eleje alapján (kis/nagybetű független, korlátozott találatszám)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        limit = min(limit, USER_SEARCH_MAX_LIMIT)
+        query = query.strip()
+        if query:
+            # Tartomány a NOCASE indexen (a LIKE '%q%' az egész táblát olvasná)
+            cursor.execute("""
+                SELECT id, username FROM users 
+                WHERE username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE
+                ORDER BY username COLLATE NOCASE
+                LIMIT ?
+            """, (*nocase_prefix_range(query), limit))
+        else:
+            cursor.execute("SELECT id, username FROM users ORDER BY username COLLATE NOCASE LIMIT ?", (limit,))
+        
+        users = cursor.fetchall()
     
     return users
 
-def get_popular_cards(limit=10):
-    """Népszerű kártyák (legtöbbet keresett)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            bc.id,
-            bc.card_number,
-            bc.player_name,
-            bc.team,
-            s.name as series_name,
-            cv.name as variant_name,
-            cv.color_code,
-            COUNT(w.id) as demand,
-            COUNT(uc.id) as supply
-        FROM base_cards bc
-        JOIN series s ON bc.series_id = s.id
-        JOIN card_variants cv ON cv.name = 'Base'  -- Csak Base változatokat nézzük
-        LEFT JOIN wishlists w ON bc.id = w.base_card_id AND cv.id = w.variant_id
-        LEFT JOIN user_cards uc ON bc.id = uc.base_card_id AND cv.id = uc.variant_id 
-            AND uc.status IN ('trade', 'sell')
-        GROUP BY bc.id, bc.card_number, bc.player_name, s.name, cv.name
-        HAVING demand > 0
-        ORDER BY demand DESC, supply ASC
-        LIMIT ?
-    """, (limit,))
-    
-    popular = []
-    for row in cursor.fetchall():
-        popular.append({
-            'id': row[0],
-            'card_number': row[1],
-            'player_name': row[2],
-            'team': row[3],
-            'series_name': row[4],
-            'variant_name': row[5],
-            'color_code': row[6],
-            'demand': row[7],
-            'supply': row[8]
-        })
-    
-    conn.close()
+def get_popular_cards(limit=10, series_id=None, variant_id=None):
+    """Népszerű kártyák (legtöbbet keresett) minden változat és sorozat közül
+
+    A card_market_stats előre aggregált keresletét/kínálatát olvassa a
+    népszerűségi index sorrendjében, így nincs csoportosítás és rendezés.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        filters = ""
+        params = []
+        if series_id:
+            filters += " AND bc.series_id = ?"
+            params.append(series_id)
+        if variant_id:
+            filters += " AND ms.variant_id = ?"
+            params.append(variant_id)
+        
+        cursor.execute(f"""
+            SELECT 
+                bc.id,
+                bc.card_number,
+                bc.player_name,
+                bc.team,
+                s.name as series_name,
+                cv.name as variant_name,
+                cv.color_code,
+                ms.demand_count as demand,
+                ms.supply_count as supply,
+                cv.id as variant_id,
+                cv.rarity_level
+            FROM card_market_stats ms
+            JOIN base_cards bc ON ms.base_card_id = bc.id
+            JOIN series s ON bc.series_id = s.id
+            JOIN card_variants cv ON ms.variant_id = cv.id
+            WHERE ms.demand_count > 0{filters}
+            ORDER BY ms.demand_count DESC, ms.supply_count
+            LIMIT ?
+        """, (*params, limit))
+        
+        popular = []
+        for row in cursor.fetchall():
+            popular.append({
+                'id': row[0],
+                'card_number': row[1],
+                'player_name': row[2],
+                'team': row[3],
+                'series_name': row[4],
+                'variant_name': row[5],
+                'color_code': row[6],
+                'demand': row[7],
+                'supply': row[8],
+                'variant_id': row[9],
+                'rarity_level': row[10]
+            })
     return popular
 
 def get_series_completion(user_id, series_id):
-    """Sorozat teljesítettségének kiszámítása"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Összes kártya a sorozatban (minden változattal)
-    cursor.execute("""
-        SELECT COUNT(*) FROM base_cards bc
-        CROSS JOIN card_variants cv
-        WHERE bc.series_id = ?
-    """, (series_id,))
-    total_possible = cursor.fetchone()[0]
-    
-    # Felhasználó kártyái ebből a sorozatból
-    cursor.execute("""
-        SELECT COUNT(*) FROM user_cards uc
-        JOIN base_cards bc ON uc.base_card_id = bc.id
-        WHERE uc.user_id = ? AND bc.series_id = ?
-    """, (user_id, series_id))
-    user_has = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    if total_possible == 0:
-        return 0, 0, 0
-    
-    percentage = (user_has / total_possible) * 100
-    return user_has, total_possible, percentage
+    """Sorozat teljesítettségének kiszámítása (bitkép alapján)"""
+    from database import get_all_series_completion
+    return get_all_series_completion(user_id).get(series_id, (0, 0, 0))
 
 def validate_card_data(series_id, card_number, player_name):
     """Kártya adatok validálása"""
@@ -591,17 +598,16 @@ def validate_card_data(series_id, card_number, player_name):
 
 def get_card_value_estimate(base_card_id, variant_id):
     """Kártya értékbecslés eladási árak alapján"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT AVG(price), MIN(price), MAX(price), COUNT(*)
-        FROM user_cards
-        WHERE base_card_id = ? AND variant_id = ? AND status = 'sell' AND price IS NOT NULL
-    """, (base_card_id, variant_id))
-    
-    result = cursor.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT AVG(price), MIN(price), MAX(price), COUNT(*)
+            FROM user_cards
+            WHERE base_card_id = ? AND variant_id = ? AND status = 'sell' AND price IS NOT NULL
+        """, (base_card_id, variant_id))
+        
+        result = cursor.fetchone()
     
     if result and result[3] > 0:  # Ha van adat
         return {
@@ -613,108 +619,66 @@ def get_card_value_estimate(base_card_id, variant_id):
     
     return None
 
+COLLECTION_EXPORT_HEADER = ("Sorozat", "Szám", "Játékos", "Csapat", "Változat",
+                            "Státusz", "Ár", "Állapot", "Megjegyzés", "Hozzáadva")
+
+def iter_user_collection_csv(user_id, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Felhasználó gyűjteménye CSV darabokként - a kurzort darabonként olvassuk"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 
+                s.name as sorozat,
+                bc.card_number as szam,
+                bc.player_name as jatekos,
+                bc.team as csapat,
+                cv.name as valtozat,
+                uc.status as statusz,
+                uc.price as ar,
+                uc.condition as allapot,
+                uc.notes as megjegyzes,
+                uc.added_at as hozzaadva
+            FROM user_cards uc
+            JOIN base_cards bc ON uc.base_card_id = bc.id
+            JOIN card_variants cv ON uc.variant_id = cv.id
+            JOIN series s ON bc.series_id = s.id
+            WHERE uc.user_id = ?
+            ORDER BY s.name, bc.card_number, cv.rarity_level
+        """, (user_id,))
+        
+        def rows():
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    return
+                yield from chunk
+        
+        yield from csv_chunks(COLLECTION_EXPORT_HEADER, rows(), chunk_rows)
+
 def export_user_collection(user_id):
-    """Felhasználó gyűjteményének exportálása CSV formátumra"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            s.name as sorozat,
-            bc.card_number as szam,
-            bc.player_name as jatekos,
-            bc.team as csapat,
-            cv.name as valtozat,
-            uc.status as statusz,
-            uc.price as ar,
-            uc.condition as allapot,
-            uc.notes as megjegyzes,
-            uc.added_at as hozzaadva
-        FROM user_cards uc
-        JOIN base_cards bc ON uc.base_card_id = bc.id
-        JOIN card_variants cv ON uc.variant_id = cv.id
-        JOIN series s ON bc.series_id = s.id
-        WHERE uc.user_id = ?
-        ORDER BY s.name, bc.card_number, cv.rarity_level
-    """, (user_id,))
-    
-    cards = cursor.fetchall()
-    conn.close()
-    
-    # CSV formátum készítése
-    csv_data = "Sorozat,Szám,Játékos,Csapat,Változat,Státusz,Ár,Állapot,Megjegyzés,Hozzáadva\n"
-    
-    for card in cards:
-        row = []
-        for item in card:
-            if item is None:
-                row.append("")
-            else:
-                # CSV escape
-                item_str = str(item).replace('"', '""')
-                if ',' in item_str or '"' in item_str:
-                    item_str = f'"{item_str}"'
-                row.append(item_str)
-        csv_data += ",".join(row) + "\n"
-    
-    return csv_data
+    """Felhasználó gyűjteményének exportálása CSV formátumra (UTF-8 bájtok, lásd spool_csv)"""
+    return spool_csv(iter_user_collection_csv(user_id))
 
 def check_duplicate_card(user_id, base_card_id, variant_id):
     """Ellenőrzi, hogy van-e már ilyen kártya a felhasználónál"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM user_cards 
-        WHERE user_id = ? AND base_card_id = ? AND variant_id = ?
-    """, (user_id, base_card_id, variant_id))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM user_cards 
+            WHERE user_id = ? AND base_card_id = ? AND variant_id = ?
+        """, (user_id, base_card_id, variant_id))
+        
+        count = cursor.fetchone()[0]
     
     return count > 0
 
 def get_system_stats():
-    """Rendszer statisztikák"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    stats = {}
-    
-    # Alapstatisztikák
-    cursor.execute("SELECT COUNT(*) FROM users")
-    stats['total_users'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM series")
-    stats['total_series'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM base_cards")
-    stats['total_base_cards'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM user_cards")
-    stats['total_user_cards'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM messages")
-    stats['total_messages'] = cursor.fetchone()[0]
-    
-    # Aktivitás az elmúlt 7 napban
-    week_ago = datetime.now() - timedelta(days=7)
-    cursor.execute("SELECT COUNT(*) FROM activity_log WHERE created_at >= ?", (week_ago,))
-    stats['activity_week'] = cursor.fetchone()[0]
-    
-    # Legnépszerűbb sorozat
-    cursor.execute("""
-        SELECT s.name, COUNT(uc.id) as card_count
-        FROM series s
-        LEFT JOIN base_cards bc ON s.id = bc.series_id
-        LEFT JOIN user_cards uc ON bc.id = uc.base_card_id
-        GROUP BY s.id, s.name
-        ORDER BY card_count DESC
-        LIMIT 1
-    """)
-    
-    popular_series = cursor.fetchone()
-    stats['popular_series'] = popular_series[0] if popular_series else "Nincs adat"
+    """Rendszer statisztikák (a háttérben frissített legutóbbi pillanatképből)"""
+    from database import get_latest_system_stats, refresh_system_stats
     
-    conn.close()
+    stats = get_latest_system_stats()
+    if stats is None:
+        # Még nem készült pillanatkép (pl. első indulás) - most számoljuk ki
+        stats = refresh_system_stats()
     return stats
\ No newline at end of file